@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+"""Benchmarks SimpleKVDiskStore against synthetic data, without touching the Riot API.
+
+    python benchmarks/bench.py --keys 100000 --engine segments --output results.json
+
+Generates matches, timelines, summoners and a static data corpus, then measures put and get throughput and latency
+percentiles per type, summoner lookups by each identifier, static data lookups, expire(), clear(type) and collect(), and the
+store's footprint on disk. Results are printed, and written as JSON with --output; --compare prints how a run
+differs from an earlier run's JSON, e.g. one made before a change to the storage code.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from datapipelines import NotFoundError
+from cassiopeia.dto.match import MatchDto, TimelineDto
+from cassiopeia.dto.summoner import SummonerDto
+from cassiopeia.dto.staticdata.champion import ChampionListDto, ChampionDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+_PLATFORM = "NA1"
+_REGION = "NA"
+_VERSION = "10.1.1"
+_LOCALE = "en_US"
+
+
+def _match(id: int, rng: random.Random) -> MatchDto:
+    return MatchDto({
+        "platformId": _PLATFORM,
+        "gameId": id,
+        "gameCreation": 1500000000000 + id * 1000,
+        "gameDuration": rng.randint(900, 3000),
+        "queueId": 420,
+        "mapId": 11,
+        "seasonId": 13,
+        "gameVersion": _VERSION,
+        "gameMode": "CLASSIC",
+        "gameType": "MATCHED_GAME",
+        "teams": [{"teamId": team, "win": "Win" if team == 100 else "Fail", "towerKills": rng.randint(0, 11),
+                   "bans": [{"championId": rng.randint(1, 150), "pickTurn": turn} for turn in range(5)]} for team in (100, 200)],
+        "participants": [{
+            "participantId": participant,
+            "teamId": 100 if participant <= 5 else 200,
+            "championId": rng.randint(1, 150),
+            "spell1Id": 4,
+            "spell2Id": 14,
+            "stats": {stat: rng.randint(0, 30000) for stat in ("kills", "deaths", "assists", "totalDamageDealt", "goldEarned",
+                                                               "totalMinionsKilled", "visionScore", "item0", "item1", "item2",
+                                                               "item3", "item4", "item5", "item6", "champLevel")},
+            "timeline": {"lane": "MIDDLE", "role": "SOLO", "creepsPerMinDeltas": {"0-10": rng.random() * 10, "10-20": rng.random() * 10}}
+        } for participant in range(1, 11)],
+        "participantIdentities": [{
+            "participantId": participant,
+            "player": {"summonerName": "Player {}".format(rng.randint(0, 10 ** 6)), "summonerId": "sid{}".format(rng.randint(0, 10 ** 6)),
+                       "accountId": "acc{}".format(rng.randint(0, 10 ** 6)), "platformId": _PLATFORM, "profileIcon": rng.randint(0, 4000)}
+        } for participant in range(1, 11)]
+    })
+
+
+def _timeline(id: int, rng: random.Random, frames: int) -> TimelineDto:
+    return TimelineDto({
+        "region": _REGION,
+        "matchId": id,
+        "frameInterval": 60000,
+        "frames": [{
+            "timestamp": frame * 60000,
+            "participantFrames": {str(participant): {
+                "participantId": participant,
+                "position": {"x": rng.randint(0, 15000), "y": rng.randint(0, 15000)},
+                "currentGold": rng.randint(0, 5000),
+                "totalGold": rng.randint(0, 20000),
+                "level": rng.randint(1, 18),
+                "xp": rng.randint(0, 20000),
+                "minionsKilled": rng.randint(0, 300),
+                "jungleMinionsKilled": rng.randint(0, 100)
+            } for participant in range(1, 11)},
+            "events": [{"type": "ITEM_PURCHASED", "timestamp": frame * 60000 + rng.randint(0, 59999),
+                        "participantId": rng.randint(1, 10), "itemId": rng.randint(1000, 4000)} for _ in range(rng.randint(0, 8))]
+        } for frame in range(frames)]
+    })
+
+
+def _summoner(id: int, rng: random.Random) -> SummonerDto:
+    return SummonerDto({
+        "region": _REGION,
+        "id": "sid{}".format(id),
+        "accountId": "acc{}".format(id),
+        "puuid": "puuid{}".format(id),
+        "name": "Summoner {}".format(id),
+        "profileIconId": rng.randint(0, 4000),
+        "summonerLevel": rng.randint(1, 500),
+        "revisionDate": 1500000000000 + id
+    })
+
+
+def _champion_list(count: int, rng: random.Random) -> ChampionListDto:
+    return ChampionListDto({
+        "region": _REGION,
+        "version": _VERSION,
+        "locale": _LOCALE,
+        "includedData": {"all"},
+        "type": "champion",
+        "data": {"Champion{}".format(id): {
+            "id": id,
+            "key": "Champion{}".format(id),
+            "name": "Champion {}".format(id),
+            "title": "the Benchmarked",
+            "blurb": "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(400)),
+            "stats": {stat: rng.random() * 100 for stat in ("hp", "mp", "armor", "spellblock", "attackdamage", "movespeed")},
+            "spells": [{"name": "Spell {}".format(spell), "tooltip": "x" * 300, "cooldown": [rng.random() * 10] * 5} for spell in range(4)]
+        } for id in range(1, count + 1)}
+    })
+
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {}
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+    return {"p50_ms": percentile(0.5), "p90_ms": percentile(0.9), "p99_ms": percentile(0.99), "max_ms": latencies[-1] * 1000}
+
+
+def _measure(function: Callable[[Any], Any], arguments: Iterable[Any]) -> Dict[str, Any]:
+    # Arguments may be generated as they're iterated over, so only the calls themselves are timed.
+    latencies = []
+    misses = 0
+    for argument in arguments:
+        start = time.perf_counter()
+        try:
+            function(argument)
+        except NotFoundError:
+            misses += 1
+        latencies.append(time.perf_counter() - start)
+    elapsed = sum(latencies)
+    result = {"operations": len(latencies), "seconds": elapsed, "ops_per_second": len(latencies) / elapsed if elapsed else None}
+    result.update(_percentiles(latencies))
+    if misses:
+        result["misses"] = misses
+    return result
+
+
+def _timed(function: Callable[[], Any]) -> Dict[str, float]:
+    started = time.perf_counter()
+    function()
+    return {"seconds": time.perf_counter() - started}
+
+
+def _footprint(path: str) -> Dict[str, int]:
+    files, size = 0, 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                size += os.path.getsize(os.path.join(dirpath, filename))
+            except FileNotFoundError:
+                continue
+            files += 1
+    return {"files": files, "bytes": size}
+
+
+def _store_options(args: argparse.Namespace) -> Dict[str, Any]:
+    options = {"engine": args.engine, "serializer": args.serializer, "layout": args.layout, "io_threads": args.io_threads}
+    if args.memory:
+        options["memory"] = {"max_entries": args.memory}
+    if args.compression:
+        options["compression"] = {MatchDto: args.compression, TimelineDto: args.compression}
+    if args.write_behind:
+        options["write_behind"] = {}
+    if args.columnar_timelines:
+        options["columnar_timelines"] = True
+    if args.lazy_matches:
+        options["lazy_matches"] = True
+    return options
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    keys = args.keys
+    timelines = max(1, int(keys * args.timeline_fraction))
+    summoners = keys
+    path = args.path or tempfile.mkdtemp(prefix="cassiopeia-diskstore-bench-")
+    options = _store_options(args)
+    results = {
+        "started": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arguments": {name: value for name, value in vars(args).items() if name != "output"},
+        "results": {}
+    }
+    benchmarks = results["results"]
+
+    store = SimpleKVDiskStore(path, **options)
+    try:
+        def put(type):
+            return lambda item: store.put(type, item)
+
+        # The corpus is generated while it's put, rather than held in memory, since it can be larger than memory.
+        print("Putting {} matches, {} timelines, {} summoners and {} champions...".format(keys, timelines, summoners, args.champions), file=sys.stderr)
+        benchmarks["put_match"] = _measure(put(MatchDto), (_match(id, rng) for id in range(keys)))
+        benchmarks["put_timeline"] = _measure(put(TimelineDto), (_timeline(id, rng, args.frames) for id in range(timelines)))
+        benchmarks["put_summoner"] = _measure(put(SummonerDto), (_summoner(id, rng) for id in range(summoners)))
+        benchmarks["put_champion_list"] = _measure(put(ChampionListDto), [_champion_list(args.champions, rng)])
+        for service in store._by_store():
+            if service._writer is not None:
+                benchmarks["flush_write_behind"] = _timed(service._writer.flush)
+        benchmarks["footprint"] = _footprint(path)
+
+        def get(type, query):
+            return lambda value: store.get(type, query(value))
+
+        reads = args.reads or keys
+        print("Getting...", file=sys.stderr)
+        benchmarks["get_match"] = _measure(get(MatchDto, lambda id: {"platform": _PLATFORM, "id": id}), (rng.randrange(keys) for _ in range(reads)))
+        benchmarks["get_match_miss"] = _measure(get(MatchDto, lambda id: {"platform": _PLATFORM, "id": id}), (keys + rng.randrange(keys) for _ in range(min(reads, 10000))))
+        benchmarks["get_timeline"] = _measure(get(TimelineDto, lambda id: {"platform": _PLATFORM, "id": id}), (rng.randrange(timelines) for _ in range(min(reads, timelines * 4))))
+        for identifier, format in (("id", "sid{}"), ("accountId", "acc{}"), ("puuid", "puuid{}"), ("name", "Summoner {}")):
+            benchmarks["get_summoner_by_" + identifier] = _measure(
+                get(SummonerDto, lambda id: {"platform": _PLATFORM, identifier: format.format(id)}),
+                (rng.randrange(summoners) for _ in range(reads))
+            )
+        static = {"platform": _PLATFORM, "version": _VERSION, "locale": _LOCALE}
+        benchmarks["get_champion_list"] = _measure(get(ChampionListDto, lambda _: dict(static)), range(min(reads, 1000)))
+        benchmarks["get_champion_by_id"] = _measure(get(ChampionDto, lambda id: dict(static, id=id)), (rng.randint(1, args.champions) for _ in range(min(reads, 10000))))
+        benchmarks["get_champion_by_name"] = _measure(get(ChampionDto, lambda id: dict(static, name="Champion {}".format(id))), (rng.randint(1, args.champions) for _ in range(min(reads, 10000))))
+
+        print("Expiring and clearing...", file=sys.stderr)
+        benchmarks["expire"] = _timed(store.expire)
+        benchmarks["clear_summoner"] = _timed(lambda: store.clear(SummonerDto))
+        benchmarks["clear_timeline"] = _timed(lambda: store.clear(TimelineDto))
+        benchmarks["collect"] = _timed(store.collect)
+        benchmarks["footprint_after_clear"] = _footprint(path)
+        stats = store.quota_stats()
+        if stats:
+            benchmarks["quota"] = stats
+    finally:
+        store.close()
+        if args.path is None and not args.keep:
+            shutil.rmtree(path, ignore_errors=True)
+    results["finished"] = datetime.datetime.now().isoformat()
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print("{:<28} {:<16} {:>12} {:>12} {:>8}".format("benchmark", "metric", "baseline", "current", "change"))
+    for name, result in sorted(results["results"].items()):
+        for metric in ("ops_per_second", "p50_ms", "p99_ms", "seconds", "bytes"):
+            before, after = baseline["results"].get(name, {}).get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            print("{:<28} {:<16} {:>12.4g} {:>12.4g} {:>+7.1f}%".format(name, metric, before, after, (after - before) / before * 100))
+
+
+def _count(value: str) -> int:
+    # Also accepts counts like 1e6.
+    try:
+        return int(float(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid count: {!r}".format(value))
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--keys", type=_count, default=10000, help="Number of matches and summoners to generate (e.g. 1e4 to 1e6)")
+    parser.add_argument("--reads", type=_count, default=None, help="Number of random reads per benchmark (defaults to --keys)")
+    parser.add_argument("--timeline-fraction", type=float, default=0.1, help="Timelines to generate, as a fraction of --keys")
+    parser.add_argument("--frames", type=int, default=30, help="Frames per timeline")
+    parser.add_argument("--champions", type=int, default=150, help="Champions in the static data corpus")
+    parser.add_argument("--engine", default="filesystem", choices=("filesystem", "segments"))
+    parser.add_argument("--serializer", default="pickle")
+    parser.add_argument("--layout", default="flat", choices=("flat", "type"))
+    parser.add_argument("--compression", default=None, help="Compression for matches and timelines, e.g. zlib, lz4 or zstd")
+    parser.add_argument("--memory", type=int, default=0, help="Entries in the in-memory tier (0 to disable it)")
+    parser.add_argument("--write-behind", action="store_true", help="Write through a write-behind queue")
+    parser.add_argument("--columnar-timelines", action="store_true", help="Store timelines as typed columns")
+    parser.add_argument("--lazy-matches", action="store_true", help="Decode matches' participant details on first use")
+    parser.add_argument("--io-threads", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--path", default=None, help="Directory for the store (defaults to a temporary directory that is removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory")
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file (- for stdout)")
+    parser.add_argument("--compare", default=None, help="Compare the results with those of an earlier run written with --output")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output == "-":
+        print(text)
+        return
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+        return
+    for name, result in sorted(results["results"].items()):
+        print("{:<28} {}".format(name, ", ".join("{}={:.4g}".format(key, value) if isinstance(value, float) else "{}={}".format(key, value)
+                                                 for key, value in sorted(result.items()) if not isinstance(value, dict))))
+
+
+if __name__ == "__main__":
+    main()
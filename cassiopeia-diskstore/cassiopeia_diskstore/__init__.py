@@ -1,15 +1,47 @@
-from typing import TypeVar, Type, Set, Iterable, Mapping, List
+import asyncio
+import datetime
+import functools
+import itertools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar, Type, Set, Iterable, Mapping, List, Any, Callable, Dict, Union
 
-from datapipelines import CompositeDataSource, CompositeDataSink
+from datapipelines import CompositeDataSource, CompositeDataSink, PipelineContext
 
 from .common import SimpleKVDiskService
+from .memory import MemoryCache
+from .sweeper import ExpirySweeper
+from .writer import WriteBehindQueue
+from .quota import DiskQuota
+from .metrics import Metrics
+from .locking import StripedLock
+from .invalidation import Invalidations
 
 T = TypeVar("T")
 
 
-def _default_services(path: str = None, expirations: Mapping[type, float] = None, plugins: List[str] = None) -> Set[SimpleKVDiskService]:
+def _default_services(path: str = None, expirations: Mapping[type, float] = None, plugins: List[str] = None, engine: str = "filesystem", engine_options: Mapping[str, Any] = None, memory: Mapping[str, Any] = None, compression: Mapping[type, Any] = None, serializer: str = "pickle", layout: str = "flat", io_threads: int = 8, sweeper: Mapping[str, Any] = None, write_behind: Mapping[str, Any] = None, quota: Mapping[str, Any] = None, metrics: Mapping[str, Any] = None, multiprocess: Mapping[str, Any] = None, dedup: Union[bool, Iterable[Any]] = None, columnar_timelines: bool = False, lazy_matches: bool = False, invalidation: Mapping[str, Any] = None) -> Set[SimpleKVDiskService]:
     if plugins is None:
         plugins = []
+    if memory is not None:
+        memory = MemoryCache(**memory)
+    if sweeper is not None:
+        sweeper = ExpirySweeper(**sweeper)
+    writer = None
+    if write_behind is not None:
+        writer = WriteBehindQueue(**write_behind)
+    if quota is not None:
+        quota = DiskQuota(**quota)
+    if metrics is not None:
+        metrics = Metrics(**metrics)
+    locks = None
+    if multiprocess is not None:
+        locks = StripedLock(**multiprocess)
+        if engine == "segments":
+            engine_options = dict(engine_options or {}, shared=True)
+    invalidations = Invalidations(**(invalidation or {}))
+    options = {"expirations": expirations, "plugins": plugins, "engine": engine, "engine_options": engine_options, "memory": memory, "compression": compression, "serializer": serializer, "layout": layout, "io_threads": io_threads, "sweeper": sweeper, "writer": writer, "quota": quota, "metrics": metrics, "locks": locks, "dedup": dedup, "columnar_timelines": columnar_timelines, "lazy_matches": lazy_matches, "invalidations": invalidations}
     from .staticdata import StaticDataDiskService
     from .champion import ChampionDiskService
     from .summoner import SummonerDiskService
@@ -21,41 +53,158 @@ def _default_services(path: str = None, expirations: Mapping[type, float] = None
     from .patch import PatchDiskService
 
     services = {
-        StaticDataDiskService(path, expirations=expirations, plugins=plugins),
-        ChampionDiskService(path, expirations=expirations, plugins=plugins),
-        SummonerDiskService(path, expirations=expirations, plugins=plugins),
-        ChampionMasteryDiskService(path, expirations=expirations, plugins=plugins),
-        MatchDiskService(path, expirations=expirations, plugins=plugins),
-        SpectatorDiskService(path, expirations=expirations, plugins=plugins),
-        ShardStatusDiskService(path, expirations=expirations, plugins=plugins),
-        LeaguesDiskService(path, expirations=expirations, plugins=plugins),
-        PatchDiskService(path, expirations=expirations, plugins=plugins)
+        StaticDataDiskService(path, **options),
+        ChampionDiskService(path, **options),
+        SummonerDiskService(path, **options),
+        ChampionMasteryDiskService(path, **options),
+        MatchDiskService(path, **options),
+        SpectatorDiskService(path, **options),
+        ShardStatusDiskService(path, **options),
+        LeaguesDiskService(path, **options),
+        PatchDiskService(path, **options)
     }
     if "ChampionGG" in plugins:
         from .championgg import ChampionGGDiskService
-        services.add(ChampionGGDiskService(path, expirations=expirations, plugins=plugins))
+        services.add(ChampionGGDiskService(path, **options))
 
     return services
 
 
 class SimpleKVDiskStore(CompositeDataSource, CompositeDataSink):
-    def __init__(self, path: str = None, expirations: Mapping[type, float] = None, services: Iterable[SimpleKVDiskService] = None, plugins: List[str] = None):
+    def __init__(self, path: str = None, expirations: Mapping[type, float] = None, services: Iterable[SimpleKVDiskService] = None, plugins: List[str] = None, engine: str = "filesystem", engine_options: Mapping[str, Any] = None, memory: Mapping[str, Any] = None, compression: Mapping[type, Any] = None, serializer: str = "pickle", layout: str = "flat", io_threads: int = 8, sweeper: Mapping[str, Any] = None, write_behind: Mapping[str, Any] = None, quota: Mapping[str, Any] = None, metrics: Mapping[str, Any] = None, multiprocess: Mapping[str, Any] = None, dedup: Union[bool, Iterable[Any]] = None, columnar_timelines: bool = False, lazy_matches: bool = False, invalidation: Mapping[str, Any] = None, max_in_flight: int = 64):
         if services is None:
-            services = _default_services(path=path, expirations=expirations, plugins=plugins)
+            services = _default_services(path=path, expirations=expirations, plugins=plugins, engine=engine, engine_options=engine_options, memory=memory, compression=compression, serializer=serializer, layout=layout, io_threads=io_threads, sweeper=sweeper, write_behind=write_behind, quota=quota, metrics=metrics, multiprocess=multiprocess, dedup=dedup, columnar_timelines=columnar_timelines, lazy_matches=lazy_matches, invalidation=invalidation)
 
         CompositeDataSource.__init__(self, services)
         CompositeDataSink.__init__(self, services)
 
-    def clear(self, type: Type[T] = None):
-        sinks = [sink for many_sinks in self._sinks.values() for sink in many_sinks]
-        for store in sinks:
-            store.clear(type)
-        store = sinks[0]._store
+        for service in self._by_store():
+            if service._sweeper is not None:
+                service._sweeper.start(service)
+            if service._quota is not None:
+                service._quota.start(service)
+            if service._metrics is not None:
+                service._metrics.start(service)
+            service._invalidations.start(service)
+
+        self._io_threads = io_threads
+        self._max_in_flight = max_in_flight
+        self._async_executor = None
+        self._async_lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _by_store(self) -> List[SimpleKVDiskService]:
+        # Services usually share one underlying store, so maintenance only has to walk each store once.
+        services = {}
+        for many_sinks in self._sinks.values():
+            for sink in many_sinks:
+                services.setdefault(id(sink._store), sink)
+        return list(services.values())
+
+    def clear(self, type: Type[T] = None, platform: Any = None):
+        """Instantly invalidates every record of `type` on `platform` (either may be left out), e.g. after a patch.
+
+        The cleared records are deleted in the background, as configured by `invalidation={...}`, or by `collect()`.
+        """
+        for service in self._by_store():
+            service.clear(type, platform)
+
+    def collect(self) -> int:
+        """Deletes the records invalidated by `clear` now and returns how many there were."""
+        return sum(service._invalidations.collect() for service in self._by_store())
 
     def delete(self, item: Type[T]):
         raise NotImplemented
 
-    def expire(self, type: Type[T] = None):
+    def expire(self, type: Type[T] = None, workers: int = None, processes: bool = False):
+        for service in self._by_store():
+            service.expire(type, workers=workers, processes=processes)
+
+    def export_snapshot(self, filename: str, type: Type[T] = None, compression: Any = "zlib") -> int:
+        """Streams the live records into one compressed snapshot file, e.g. to warm up a new node, and returns how many there were.
+
+        Load it with `import_snapshot`, or serve reads straight from it with `SimpleKVDiskStore(filename, engine="snapshot")`.
+        """
+        from .snapshot import write_snapshot
+        now = datetime.datetime.now().timestamp()
+        prefix = type.__name__ if type is not None else ""
+        records = itertools.chain.from_iterable(service._live_records(prefix, now) for service in self._by_store())
+        return write_snapshot(filename, records, compression)
+
+    def import_snapshot(self, filename: str) -> int:
+        """Loads the records of a snapshot written by `export_snapshot` that are still live, and returns how many there were."""
+        return sum(service.import_snapshot(filename) for service in self._by_store())
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the per-type counters and latency histograms recorded with `metrics={...}`, plus the quota's stats."""
+        stats = {"types": {}, "quota": self.quota_stats()}
+        for service in self._by_store():
+            if service._metrics is not None:
+                stats["types"] = service._metrics.stats()
+        return stats
+
+    def prometheus(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        for service in self._by_store():
+            if service._metrics is not None:
+                return service._metrics.prometheus()
+        return ""
+
+    def quota_stats(self) -> Dict[str, Any]:
+        """Returns the bytes tracked by the disk quota, per type, and what it has evicted so far."""
+        for service in self._by_store():
+            if service._quota is not None:
+                return service._quota.stats()
+        return {}
+
+    def close(self):
+        if self._async_executor is not None:
+            self._async_executor.shutdown()
         sinks = {sink for many_sinks in self._sinks.values() for sink in many_sinks}
         for store in sinks:
-            store.expire(type)
+            store.close()
+
+    #########
+    # Async #
+    #########
+
+    # The a* methods run the blocking calls on a dedicated thread pool so cache reads, writes and decoding don't
+    # stall the event loop. At most `max_in_flight` of them run at a time per event loop. Bulk calls are split into
+    # chunks of `io_threads` items, and cancelling the awaiting task stops them at the next chunk.
+
+    def _async_pool(self) -> ThreadPoolExecutor:
+        with self._async_lock:
+            if self._async_executor is None:
+                self._async_executor = ThreadPoolExecutor(max_workers=self._io_threads, thread_name_prefix="cassiopeia-diskstore-async")
+            return self._async_executor
+
+    async def _offload(self, function: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._max_in_flight)
+        async with semaphore:
+            return await loop.run_in_executor(self._async_pool(), functools.partial(function, *args))
+
+    async def aget(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> T:
+        return await self._offload(self.get, type, query, context)
+
+    async def aget_many(self, type: Type[T], query: Mapping[str, Any], context: PipelineContext = None) -> List[T]:
+        items = iter(await self._offload(self.get_many, type, query, context))
+        results = []
+        while True:
+            chunk = await self._offload(list, itertools.islice(items, self._io_threads))
+            if not chunk:
+                return results
+            results.extend(chunk)
+
+    async def aput(self, type: Type[T], item: T, context: PipelineContext = None) -> None:
+        await self._offload(self.put, type, item, context)
+
+    async def aput_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
+        items = iter(items)
+        while True:
+            chunk = list(itertools.islice(items, self._io_threads))
+            if not chunk:
+                return
+            await self._offload(self.put_many, type, chunk, context)
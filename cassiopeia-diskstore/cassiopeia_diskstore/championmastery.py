@@ -1,4 +1,4 @@
-from typing import Type, TypeVar, MutableMapping, Any, Iterable
+from typing import Type, TypeVar, MutableMapping, Any, Iterable, Generator
 import copy
 
 from datapipelines import DataSource, DataSink, PipelineContext, Query, NotFoundError, validate_query
@@ -32,6 +32,10 @@ class ChampionMasteryDiskService(SimpleKVDiskService):
     # Champion Masteries #
     ######################
 
+    # Putting a summoner's mastery list also stores each mastery on its own and a small record of the champion ids
+    # ordered by points, so single and bulk lookups don't have to decode and scan the whole list. Putting a single
+    # mastery drops that record, since its points may have changed the order.
+
     _validate_get_champion_mastery_query = Query. \
         has("platform").as_(Platform).also. \
         has("summoner.id").as_(str).also. \
@@ -40,6 +44,15 @@ class ChampionMasteryDiskService(SimpleKVDiskService):
     @get.register(ChampionMasteryDto)
     @validate_query(_validate_get_champion_mastery_query, convert_region_to_platform)
     def get_champion_mastery(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> ChampionMasteryDto:
+        key = "{clsname}.{platform}.{summoner_id}.{champion_id}".format(clsname=ChampionMasteryDto.__name__,
+                                                                        platform=query["platform"].value,
+                                                                        summoner_id=query["summoner.id"],
+                                                                        champion_id=query["champion.id"])
+        try:
+            return ChampionMasteryDto(self._get(key))
+        except NotFoundError:
+            pass
+
         champions_query = copy.deepcopy(query)
         champions_query.pop("champion.id")
         try:
@@ -57,8 +70,63 @@ class ChampionMasteryDiskService(SimpleKVDiskService):
         champion = find_matching_attribute(champions["masteries"], "championId", query["champion.id"])
         if champion is None:
             raise NotFoundError
+        # The list was stored before masteries were indexed, so index it now.
+        self._put_masteries(champions)
         return ChampionMasteryDto(champion)
 
+    @put.register(ChampionMasteryDto)
+    def put_champion_mastery(self, item: ChampionMasteryDto, context: PipelineContext = None) -> None:
+        self._put_mastery(item)
+        self._delete(self._top_key(Region(item["region"]).platform.value, item["summonerId"]))
+
+    def _put_mastery(self, item: ChampionMasteryDto) -> None:
+        platform = Region(item["region"]).platform.value
+        key = "{clsname}.{platform}.{summoner_id}.{champion_id}".format(clsname=ChampionMasteryDto.__name__,
+                                                                        platform=platform,
+                                                                        summoner_id=item["summonerId"],
+                                                                        champion_id=item["championId"])
+        self._put(key, item)
+
+    @staticmethod
+    def _top_key(platform: str, summoner_id: str) -> str:
+        return "{clsname}.{platform}.{summoner_id}.top".format(clsname=ChampionMasteryDto.__name__,
+                                                               platform=platform,
+                                                               summoner_id=summoner_id)
+
+    _validate_get_many_champion_mastery_query = Query. \
+        has("platform").as_(Platform).also. \
+        has("summonerId").as_(str).also. \
+        has("championIds").as_(Iterable).or_("top").as_(int)
+
+    @get_many.register(ChampionMasteryDto)
+    @validate_query(_validate_get_many_champion_mastery_query, convert_region_to_platform)
+    def get_many_champion_mastery(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[ChampionMasteryDto, None, None]:
+        """Returns the masteries for `championIds`, or for the summoner's `top` champions by points."""
+        platform = query["platform"].value
+        if "championIds" in query:
+            champion_ids = query["championIds"]
+        else:
+            champion_ids = self._get(self._top_key(platform, query["summonerId"]))[:query["top"]]
+        keys = ["{clsname}.{platform}.{summoner_id}.{champion_id}".format(clsname=ChampionMasteryDto.__name__,
+                                                                          platform=platform,
+                                                                          summoner_id=query["summonerId"],
+                                                                          champion_id=champion_id) for champion_id in champion_ids]
+        return (ChampionMasteryDto(data) for data in self._get_many(keys))
+
+    @put_many.register(ChampionMasteryDto)
+    def put_many_champion_mastery(self, items: Iterable[ChampionMasteryDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_champion_mastery, items)
+
+    def _put_masteries(self, item: ChampionMasteryListDto) -> None:
+        platform = Region(item["region"]).platform.value
+        for mastery in item["masteries"]:
+            mastery = dict(mastery)
+            mastery.setdefault("summonerId", item["summonerId"])
+            mastery["region"] = item["region"]
+            self._put_mastery(ChampionMasteryDto(mastery))
+        top = sorted(item["masteries"], key=lambda mastery: mastery.get("championPoints", 0), reverse=True)
+        self._put(self._top_key(platform, item["summonerId"]), [mastery["championId"] for mastery in top], type=ChampionMasteryDto)
+
     _validate_get_champion_mastery_list_query = Query. \
         has("platform").as_(Platform).also. \
         has("summoner.id").as_(str)
@@ -82,3 +150,20 @@ class ChampionMasteryDiskService(SimpleKVDiskService):
                                                            platform=platform,
                                                            summoner_id=summoner_id)
         self._put(key, item)
+        self._put_masteries(item)
+
+    _validate_get_many_champion_mastery_list_query = Query. \
+        has("platform").as_(Platform).also. \
+        has("summoner.ids").as_(Iterable)
+
+    @get_many.register(ChampionMasteryListDto)
+    @validate_query(_validate_get_many_champion_mastery_list_query, convert_region_to_platform)
+    def get_many_champion_mastery_list(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[ChampionMasteryListDto, None, None]:
+        keys = ["{clsname}.{platform}.{summoner_id}".format(clsname=ChampionMasteryListDto.__name__,
+                                                            platform=query["platform"].value,
+                                                            summoner_id=summoner_id) for summoner_id in query["summoner.ids"]]
+        return (ChampionMasteryListDto(data) for data in self._get_many(keys))
+
+    @put_many.register(ChampionMasteryListDto)
+    def put_many_champion_mastery_list(self, items: Iterable[ChampionMasteryListDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_champion_mastery_list, items)
@@ -1,8 +1,18 @@
 import os
+import hashlib
+import json
+import itertools
+import functools
+import copy
 import pickle
 import datetime
+import struct
+import threading
+import time
 from abc import abstractmethod
-from typing import Mapping, Any, TypeVar, Iterable, Type, Dict, List
+from collections import namedtuple, deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Mapping, Any, TypeVar, Iterable, Type, Dict, List, Tuple, Callable, Generator, Optional, Set, Union
 import simplekv, simplekv.fs
 
 from datapipelines import DataSource, DataSink, PipelineContext, NotFoundError
@@ -12,25 +22,223 @@ from cassiopeia.dto.champion import ChampionRotationDto
 from cassiopeia.dto.championmastery import ChampionMasteryDto, ChampionMasteryListDto
 from cassiopeia.dto.league import MasterLeagueListDto, ChallengerLeagueListDto, GrandmasterLeagueListDto
 from cassiopeia.dto.staticdata import ChampionDto, ChampionListDto, RuneDto, RuneListDto, ItemDto, ItemListDto, SummonerSpellDto, SummonerSpellListDto, MapDto, MapListDto, RealmDto, ProfileIconDataDto, ProfileIconDetailsDto, LanguagesDto, LanguageStringsDto, VersionListDto
-from cassiopeia.dto.match import MatchDto, TimelineDto
+from cassiopeia.dto.match import MatchDto, MatchListDto, TimelineDto
 from cassiopeia.dto.summoner import SummonerDto
 from cassiopeia.dto.status import ShardStatusDto
 from cassiopeia.dto.spectator import CurrentGameInfoDto, FeaturedGamesDto
 from cassiopeia.dto.patch import PatchListDto
 
+from .memory import MemoryCache, DecodedCache
+from .compression import Compressor, NoCompressor, get_compressor, default_compressor
+from .serializers import Serializer, PickleSerializer, get_serializer, serializer_for_id, _plain
+from .sweeper import ExpirySweeper
+from .writer import WriteBehindQueue
+from .quota import DiskQuota
+from .metrics import Metrics
+from .locking import StripedLock, _unlocked
+from .invalidation import Invalidations, _prefix
+
 T = TypeVar("T")
 
+# Services pointed at the same directory must share one store, otherwise their segment indexes would diverge. Each
+# entry also keeps the options it was opened with and how many services are using it.
+_stores = {}  # type: Dict[Tuple[str, str, str], List]
+_stores_lock = threading.Lock()
+# Decoded static data, shared process-wide like the stores it was read from.
+_decoded = DecodedCache()
+
+# Records of deduplicated types keep only their per-platform fields and the digest of the rest of their payload,
+# which is stored once under "Blob.{digest}" along with the list of keys referencing it.
+_BLOB = "__blob__"
+_BLOB_PREFIX = "Blob."
+_REFERENCES_SUFFIX = ".refs"
+_INLINE_FIELDS = ("region", "platform")
+_DEDUP_TYPES = ("ChampionListDto", "ItemListDto", "RuneListDto", "SummonerSpellListDto", "MapListDto", "ProfileIconDataDto", "LanguageStringsDto")
+_references_lock = threading.Lock()
+
+
+# Every record starts with a fixed-size header so expiry checks can skip the payload entirely.
+# magic, format version, serializer, compression, expires at, entered at, type name
+_HEADER = struct.Struct("<3sBBBdd32s")
+_MAGIC = b"CKV"
+_FORMAT_VERSION = 1
+_PICKLE = PickleSerializer.id
+_UNCOMPRESSED = NoCompressor.id
+
+RecordHeader = namedtuple("RecordHeader", ["serializer", "compression", "expires_at", "entered", "type_name"])
+
+
+def _encode_record(item: Any, type_name: str, expire_seconds, compressor: Compressor = None, serializer: Serializer = None) -> bytes:
+    entered = datetime.datetime.now().timestamp()
+    if isinstance(expire_seconds, datetime.timedelta):
+        # Types missing from a custom expirations mapping fall back to the unnormalized defaults.
+        expire_seconds = expire_seconds.total_seconds()
+    expires_at = float("inf") if expire_seconds in (simplekv.FOREVER, -1) else entered + expire_seconds
+    if serializer is None:
+        serializer = get_serializer("pickle")
+    payload = serializer.dumps(item)
+    compression = _UNCOMPRESSED
+    if compressor is not None:
+        payload = compressor.compress(payload)
+        compression = compressor.id
+    header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, serializer.id, compression, expires_at, entered, type_name.encode("utf-8"))
+    return header + payload
+
+
+def _legacy_header(data: Any, timeout, entered: float) -> RecordHeader:
+    # Records written before the header existed are a pickled (data, timeout, entered) tuple.
+    if isinstance(timeout, datetime.timedelta):
+        timeout = timeout.seconds
+    expires_at = float("inf") if timeout == simplekv.FOREVER else entered + timeout
+    return RecordHeader(_PICKLE, _UNCOMPRESSED, expires_at, entered, data.__class__.__name__)
+
+
+def _parse_header(value: bytes) -> RecordHeader:
+    if value[:len(_MAGIC)] == _MAGIC:
+        magic, version, serializer, compression, expires_at, entered, type_name = _HEADER.unpack_from(value)
+        return RecordHeader(serializer, compression, expires_at, entered, type_name.rstrip(b"\0").decode("utf-8"))
+    return _legacy_header(*pickle.loads(value))
+
+
+def _decode_record(value: bytes, compressors: Mapping[str, Compressor] = None) -> Tuple[RecordHeader, Any]:
+    if value[:len(_MAGIC)] == _MAGIC:
+        header = _parse_header(value)
+        payload = value[_HEADER.size:]
+        if header.compression != _UNCOMPRESSED:
+            # Prefer the configured compressor for this type since it may carry a dictionary the record needs.
+            compressor = (compressors or {}).get(header.type_name)
+            if compressor is None or compressor.id != header.compression:
+                compressor = default_compressor(header.compression)
+            payload = compressor.decompress(payload)
+        return header, serializer_for_id(header.serializer).loads(payload, header.type_name)
+    data, timeout, entered = pickle.loads(value)
+    return _legacy_header(data, timeout, entered), data
+
+
+def _read_header(store: simplekv.KeyValueStore, key: str) -> RecordHeader:
+    with store.open(key) as f:
+        prefix = f.read(_HEADER.size)
+        if prefix[:len(_MAGIC)] != _MAGIC:
+            prefix += f.read()
+    return _parse_header(prefix)
+
+
+def _expired_keys(store: simplekv.KeyValueStore, keys: List[str], now: float) -> List[str]:
+    # Runs in worker processes, so it only reports what expired and leaves deleting to the owning service.
+    expired = []
+    for key in keys:
+        try:
+            if now > _read_header(store, key).expires_at:
+                expired.append(key)
+        except KeyError:
+            pass
+    return expired
+
+
+def _map_batches(executor: Executor, fn: Callable[[List[str]], Any], keys: Iterable[str], batch_size: int, max_pending: int) -> Generator[Any, None, None]:
+    # Executor.map submits everything up front, so feed it batches of keys with at most `max_pending` of them queued.
+    keys = iter(keys)
+    pending = deque()
+    for batch in iter(lambda: list(itertools.islice(keys, batch_size)), []):
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, batch))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _is_live(key: str, value: bytes) -> bool:
+    try:
+        return datetime.datetime.now().timestamp() <= _parse_header(value).expires_at
+    except Exception:
+        return False
+
+
+def _digest(payload: Dict) -> str:
+    # Hashes a canonical encoding, since pickled bytes depend on dict order and, for sets, on the process's hash seed.
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=_plain, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+# Misses of records that are stored but no longer live, so metrics can tell them apart.
+class _Expired(NotFoundError):
+    counter = "expired"
+
+
+class _Invalidated(NotFoundError):
+    counter = "invalidated"
+
+
+def _open_store(path: str, engine: str, engine_options: Mapping[str, Any] = None, layout: str = "flat") -> simplekv.KeyValueStore:
+    engine_options = engine_options or {}
+    key = (os.path.abspath(path), engine, layout)
+    with _stores_lock:
+        entry = _stores.get(key)
+        if entry is not None:
+            if entry[1] != engine_options:
+                raise ValueError("The store at \"{}\" is already open with different engine options ({} rather than {})".format(path, entry[1], engine_options))
+            entry[2] += 1
+            return entry[0]
+        if engine == "filesystem" and layout == "flat":
+            from .filesystem import AtomicFilesystemStore
+            store = AtomicFilesystemStore(path, **engine_options)
+        elif engine == "filesystem" and layout in ("type", "type-platform"):
+            from .sharded import ShardedFilesystemStore
+            store = ShardedFilesystemStore(path, by_platform=layout == "type-platform", **engine_options)
+        elif engine == "filesystem":
+            raise ValueError("Unknown disk store layout \"{}\"".format(layout))
+        elif engine == "segments":
+            if layout != "flat":
+                raise ValueError("The segments engine doesn't support directory layouts")
+            from .segments import SegmentStore
+            store = SegmentStore(path, keep=_is_live, **engine_options)
+        elif engine == "snapshot":
+            # Read-only, straight from a snapshot file written by export_snapshot.
+            from .snapshot import SnapshotStore
+            store = SnapshotStore(path, **engine_options)
+        else:
+            raise ValueError("Unknown disk store engine \"{}\"".format(engine))
+        _stores[key] = [store, dict(engine_options), 1]
+        return store
+
+
+def _close_store(store: simplekv.KeyValueStore) -> None:
+    # Only the last service using the store closes it.
+    with _stores_lock:
+        for key, entry in list(_stores.items()):
+            if entry[0] is store:
+                entry[2] -= 1
+                if entry[2] > 0:
+                    return
+                del _stores[key]
+                _decoded.clear(store)
+                if hasattr(store, "close"):
+                    store.close()
+
 
 class SimpleKVDiskService(DataSource, DataSink):
-    def __init__(self, path: str = None, expirations: Mapping[type, float] = None, plugins: List[str] = None):
+    def __init__(self, path: str = None, expirations: Mapping[type, float] = None, plugins: List[str] = None, engine: str = "filesystem", engine_options: Mapping[str, Any] = None, memory: MemoryCache = None, compression: Mapping[type, Any] = None, serializer: str = "pickle", layout: str = "flat", io_threads: int = 8, sweeper: ExpirySweeper = None, writer: WriteBehindQueue = None, quota: DiskQuota = None, metrics: Metrics = None, locks: StripedLock = None, dedup: Union[bool, Iterable[Any]] = None, columnar_timelines: bool = False, lazy_matches: bool = False, invalidations: Invalidations = None):
         self._plugins = plugins or []
         if path is None:
             import tempfile
             path = tempfile.gettempdir()
             path = os.path.join(path, "simplekv_store")
-        if not os.path.exists(path):
+        if engine != "snapshot" and not os.path.exists(path):
             os.mkdir(path)
-        self._store = simplekv.fs.FilesystemStore(path)
+        self._store = _open_store(path, engine, engine_options, layout)
+        self._memory = memory
+        self._sweeper = sweeper
+        self._writer = writer
+        self._quota = quota
+        self._metrics = metrics
+        self._locks = locks
+        if locks is not None:
+            locks.start(self._store)
+        if writer is not None:
+            writer.start(self._store, locks)
+        self._serializer = get_serializer(serializer)
+        self._io_threads = io_threads
+        self._executor = None
+        self._executor_lock = threading.Lock()
         self._expirations = dict(expirations) if expirations is not None else self._default_expirations
         for key, value in self._expirations.copy().items():
             if isinstance(key, str):
@@ -41,6 +249,24 @@ class SimpleKVDiskService(DataSource, DataSink):
                 self._expirations[key] = simplekv.FOREVER
             elif isinstance(value, datetime.timedelta):
                 self._expirations[key] = value.seconds + 24 * 60 * 60 * value.days
+        # Compression is configured per type, e.g. {MatchDto: "zlib", TimelineDto: {"codec": "zstd", "level": 9}}.
+        self._compressors = {}
+        for key, value in (compression or {}).items():
+            if isinstance(key, str):
+                key = globals()[key]
+            self._compressors[key.__name__] = value if isinstance(value, Compressor) else get_compressor(value)
+        # Types whose payloads are stored once however many platforms share them; True means the static data lists.
+        if dedup is True:
+            dedup = _DEDUP_TYPES
+        self._dedup = {type if isinstance(type, str) else type.__name__ for type in dedup or ()}
+        # Store timelines as typed columns (see timeline.py) and matches' heavy parts separately serialized
+        # (see lazymatch.py), both of which are bytes that JSON can't hold.
+        if (columnar_timelines or lazy_matches) and serializer == "json":
+            raise ValueError("Columnar timelines and lazy matches need the pickle or msgpack serializer")
+        self._columnar_timelines = columnar_timelines
+        self._lazy_matches = lazy_matches
+        self._invalidations = invalidations if invalidations is not None else Invalidations()
+        self._invalidations.attach(self)
 
     @property
     def _default_expirations(self) -> Dict:
@@ -68,6 +294,7 @@ class SimpleKVDiskService(DataSource, DataSink):
             GrandmasterLeagueListDto: datetime.timedelta(hours=6),
             MasterLeagueListDto: datetime.timedelta(hours=6),
             MatchDto: -1,
+            MatchListDto: -1,
             TimelineDto: -1,
             SummonerDto: datetime.timedelta(days=1),
             ShardStatusDto: datetime.timedelta(hours=1),
@@ -97,49 +324,326 @@ class SimpleKVDiskService(DataSource, DataSink):
         pass
 
     def _get(self, key: str):
+        if self._metrics is None:
+            return self._read(key)[0]
+        # Keys start with their DTO type's name.
+        type_name = key.partition(".")[0]
+        started = time.perf_counter()
         try:
-            data, timeout, entered = pickle.loads(self._store.get(key))
-            now = datetime.datetime.now().timestamp()
-            if isinstance(timeout, datetime.timedelta):
-                timeout = timeout.seconds
-            if timeout != "forever" and now > entered + timeout:
-                self._store.delete(key)
-                raise NotFoundError
-        except KeyError:
-            raise NotFoundError
+            data, size = self._read(key)
+        except NotFoundError as error:
+            self._metrics.count(type_name, getattr(error, "counter", "misses"))
+            raise
+        finally:
+            self._metrics.observe(type_name, "get", time.perf_counter() - started)
+        if size is None:
+            self._metrics.count(type_name, "memory_hits")
+        else:
+            self._metrics.count(type_name, "disk_hits")
+            self._metrics.count(type_name, "read_bytes", size)
         return data
 
-    def _put(self, key: str, item: DtoObject):
-        expire_seconds = self._expirations.get(item.__class__, self._default_expirations[item.__class__])
+    def _read(self, key: str) -> Tuple[Any, Optional[int]]:
+        """Returns the data for `key` and the size of the record read from disk, or None when it came from memory."""
+        self._invalidations.refresh()
+        now = datetime.datetime.now().timestamp()
+        if self._memory is not None:
+            data = self._memory.get(key, now)
+            if data is not None:
+                if self._quota is not None:
+                    self._quota.touch(key)
+                # Services may modify the top level of what they're handed, so don't give out the cached object itself.
+                return copy.copy(data), None
+        value = self._writer.get(key) if self._writer is not None else None
+        if value is None:
+            try:
+                value = self._store.get(key)
+            except KeyError:
+                raise NotFoundError
+        decoding = time.perf_counter()
+        header, data = _decode_record(value, self._compressors)
+        if self._metrics is not None:
+            self._metrics.observe(key.partition(".")[0], "decode", time.perf_counter() - decoding)
+        if not self._live(key, header, now):
+            self._expire_key(key, now)
+            raise _Expired if now > header.expires_at else _Invalidated
+        if isinstance(data, dict) and _BLOB in data:
+            data = self._resolve(key, data)
+        if self._quota is not None:
+            self._quota.touch(key)
+        if self._memory is not None:
+            self._memory.put(key, data, header.expires_at, header.type_name, len(value))
+            return copy.copy(data), len(value)
+        return data, len(value)
+
+    def _delete(self, key: str) -> None:
+        digest = self._blob_of(key) if key.partition(".")[0] in self._dedup else None
+        if self._memory is not None:
+            self._memory.delete(key)
+        _decoded.delete(self._store, key)
+        if self._quota is not None:
+            self._quota.delete(key)
+        if self._metrics is not None:
+            self._metrics.count(key.partition(".")[0], "deletes")
+        if self._writer is not None:
+            self._writer.delete(key)
+        self._store.delete(key)
+        if digest is not None:
+            self._release(digest, key)
 
-        if expire_seconds != 0 and key not in self._store:
-            item = (item, expire_seconds, datetime.datetime.now().timestamp())
-            pickle_item = pickle.dumps(item)
-            pickle_item = pickle_item
-            self._store.put(key, pickle_item)
+    def _get_header(self, key: str) -> RecordHeader:
+        if self._writer is not None:
+            record = self._writer.get(key)
+            if record is not None:
+                return _parse_header(record)
+        return _read_header(self._store, key)
 
-    def clear(self, type: Type[T] = None):
+    def _put(self, key: str, item: Any, type: Type[T] = None):
         if type is None:
-            for key in self._store:
-                self._store.delete(key)
+            type = item.__class__
+        expire_seconds = self._expirations.get(type, self._default_expirations[type])
+
+        if expire_seconds != 0:
+            started = time.perf_counter() if self._metrics is not None else None
+            previous = None
+            if type.__name__ in self._dedup and isinstance(item, dict):
+                previous = self._blob_of(key)
+                item = self._share(key, item, type)
+            record = _encode_record(item, type.__name__, expire_seconds, self._compressors.get(type.__name__), self._serializer)
+            self._put_records([(key, record)])
+            if previous is not None and previous != item[_BLOB]:
+                self._release(previous, key)
+            if self._metrics is not None:
+                self._metrics.count(type.__name__, "puts")
+                self._metrics.count(type.__name__, "written_bytes", len(record))
+                self._metrics.observe(type.__name__, "put", time.perf_counter() - started)
+
+    def _put_records(self, records: List[Tuple[str, bytes]]) -> None:
+        # Newer data replaces what's stored, so drop anything decoded from the old records.
+        for key, record in records:
+            if self._memory is not None:
+                self._memory.delete(key)
+            _decoded.delete(self._store, key)
+        if self._writer is not None:
+            for key, record in records:
+                self._writer.put(key, record)
         else:
-            typename = type.__name__
-            for key in self._store:
-                if key.startswith(typename):
-                    self._store.delete(key)
+            with self._hold(*(key for key, record in records)):
+                if len(records) > 1 and hasattr(self._store, "put_batch"):
+                    self._store.put_batch(records)
+                else:
+                    for key, record in records:
+                        self._store.put(key, record)
+        for key, record in records:
+            header = _parse_header(record)
+            if self._quota is not None:
+                self._quota.put(key, len(record), header.type_name)
+            if self._sweeper is not None:
+                self._sweeper.schedule(key, header.expires_at)
 
-    def expire(self, type: Any = None):
-        if type is None:
-            for key in self._store.iter_keys():
-                try:
-                    self._get(key)
-                except NotFoundError:
-                    continue
+    ###########################
+    # Content-addressed blobs #
+    ###########################
+
+    def _references(self):
+        return self._locks.hold_references() if self._locks is not None else _references_lock
+
+    def _read_references(self, digest: str) -> Set[str]:
+        key = _BLOB_PREFIX + digest + _REFERENCES_SUFFIX
+        try:
+            header, references = _decode_record(self._store.get(key))
+        except KeyError:
+            return set()
+        # Once cleared, the blob is rewritten by the next put instead of being shared from the old generation.
+        return set() if self._invalidations.is_invalidated(key, header.entered) else set(references)
+
+    def _write_references(self, digest: str, references: Set[str]) -> None:
+        key = _BLOB_PREFIX + digest + _REFERENCES_SUFFIX
+        if references:
+            self._store.put(key, _encode_record(sorted(references), "Blob", -1, serializer=self._serializer))
         else:
-            typename = type.__name__
-            for key in self._store.iter_keys():
-                if key.startswith(typename):
-                    try:
-                        self._get(key)
-                    except NotFoundError:
-                        continue
+            self._delete(key)
+
+    def _share(self, key: str, item: Dict, type: Type[T]) -> Dict:
+        """Stores `item` apart from its per-platform fields under the digest of its payload, and returns what `key` keeps."""
+        inline = {field: item[field] for field in _INLINE_FIELDS if field in item}
+        shared = {field: value for field, value in item.items() if field not in _INLINE_FIELDS}
+        digest = _digest(shared)
+        blob_key = _BLOB_PREFIX + digest
+        with self._references():
+            references = self._read_references(digest)
+            if not references or blob_key not in self._store:
+                record = _encode_record(shared, type.__name__, -1, self._compressors.get(type.__name__), self._serializer)
+                self._store.put(blob_key, record)
+                if self._quota is not None:
+                    self._quota.put(blob_key, len(record), type.__name__)
+            if key not in references:
+                references.add(key)
+                self._write_references(digest, references)
+        inline[_BLOB] = digest
+        return inline
+
+    def _release(self, digest: str, key: str) -> None:
+        with self._references():
+            references = self._read_references(digest)
+            references.discard(key)
+            self._write_references(digest, references)
+            if not references:
+                self._delete(_BLOB_PREFIX + digest)
+
+    def _blob_of(self, key: str) -> Optional[str]:
+        record = self._writer.get(key) if self._writer is not None else None
+        if record is None:
+            try:
+                record = self._store.get(key)
+            except KeyError:
+                return None
+        data = _decode_record(record, self._compressors)[1]
+        return data.get(_BLOB) if isinstance(data, dict) else None
+
+    def _resolve(self, key: str, data: Dict) -> Dict:
+        try:
+            item = dict(_decode_record(self._store.get(_BLOB_PREFIX + data[_BLOB]), self._compressors)[1])
+        except KeyError:
+            # The shared payload is gone (e.g. evicted by the quota), which leaves nothing worth keeping.
+            self._delete(key)
+            raise NotFoundError
+        item.update((field, value) for field, value in data.items() if field != _BLOB)
+        return item
+
+    @property
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._io_threads)
+        return self._executor
+
+    def _get_many(self, keys: Iterable[str]) -> Generator[Any, None, None]:
+        """Returns a generator over the data for `keys`, read concurrently on the I/O pool but yielded in order.
+
+        A pipeline can only fall back to the next source when get_many raises up front, so every key is checked
+        (reading just its header) before the generator is handed out.
+        """
+        keys = list(keys)
+        self._invalidations.refresh()
+        now = datetime.datetime.now().timestamp()
+
+        def available(key: str) -> bool:
+            if self._memory is not None and self._memory.get(key, now) is not None:
+                return True
+            try:
+                header = self._get_header(key)
+            except KeyError:
+                return False
+            return self._live(key, header, now)
+
+        if not all(self._pool.map(available, keys)):
+            raise NotFoundError
+
+        def generator():
+            pending = deque()
+            for key in keys:
+                pending.append(self._pool.submit(self._get, key))
+                if len(pending) >= self._io_threads:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+        return generator()
+
+    def _run_many(self, function: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """Calls `function` on each item concurrently on the I/O pool and returns the results in order."""
+        return list(self._pool.map(function, items))
+
+    def _hold(self, *keys: str):
+        return self._locks.hold(*keys) if self._locks is not None else _unlocked
+
+    def _live(self, key: str, header: RecordHeader, now: float) -> bool:
+        return now <= header.expires_at and not self._invalidations.is_invalidated(key, header.entered)
+
+    def _expire_key(self, key: str, now: float) -> bool:
+        # Check the header again under the key's lock, since another process may have just rewritten the record.
+        with self._hold(key):
+            try:
+                header = self._get_header(key)
+            except KeyError:
+                return False
+            if not self._live(key, header, now):
+                self._delete(key)
+                return True
+            return False
+
+    def clear(self, type: Type[T] = None, platform: Any = None):
+        """Invalidates every record of `type` and/or `platform`, or all of them, without waiting for them to be deleted."""
+        type_name = type.__name__ if type is not None else ""
+        platform = getattr(platform, "value", platform) or ""
+        self._invalidations.invalidate(type_name, platform)
+
+    def _forget(self, scopes: List[Tuple[str, str]]) -> None:
+        # Drops what's cached in memory from the records of newly cleared scopes.
+        if self._memory is not None:
+            for scope in scopes:
+                self._memory.clear(_prefix(scope))
+        _decoded.clear(self._store)
+
+    def expire(self, type: Any = None, workers: int = None, processes: bool = False):
+        """Deletes expired records, optionally spreading the header reads over `workers` threads or processes.
+
+        Worker processes need a store that can be pickled and reopened elsewhere, i.e. the filesystem engine.
+        """
+        now = datetime.datetime.now().timestamp()
+        prefix = type.__name__ if type is not None else ""
+        keys = self._store.iter_keys(prefix)
+        if not workers:
+            for key in keys:
+                self._expire_key(key, now)
+        elif not processes:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for _ in _map_batches(executor, lambda batch: [self._expire_key(key, now) for key in batch], keys, 256, workers * 2):
+                    pass
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for expired in _map_batches(executor, functools.partial(_expired_keys, self._store, now=now), keys, 1000, workers * 2):
+                    for key in expired:
+                        self._expire_key(key, now)
+
+    def _live_records(self, prefix: str, now: float) -> Generator[Tuple[str, bytes], None, None]:
+        if self._writer is not None:
+            self._writer.flush()
+        for key in self._store.iter_keys(prefix):
+            try:
+                record = self._store.get(key)
+            except KeyError:
+                continue
+            if self._live(key, _parse_header(record), now):
+                yield key, record
+
+    def import_snapshot(self, filename: str, batch_size: int = 256) -> int:
+        """Writes the records in a snapshot file that haven't expired since into the store and returns how many there were."""
+        from .snapshot import read_snapshot
+        now = datetime.datetime.now().timestamp()
+        records = ((key, record) for key, record in read_snapshot(filename) if self._live(key, _parse_header(record), now))
+        count = 0
+        while True:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                return count
+            self._put_records(batch)
+            count += len(batch)
+
+    def close(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.stop()
+        self._invalidations.stop()
+        if self._quota is not None:
+            self._quota.stop()
+        if self._metrics is not None:
+            self._metrics.stop()
+        if self._writer is not None:
+            self._writer.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self._locks is not None:
+            self._locks.stop()
+        _close_store(self._store)
@@ -0,0 +1,129 @@
+import threading
+import zlib
+from abc import abstractmethod
+from typing import Any, Mapping, Union
+
+try:
+    import lz4.frame
+except ImportError:
+    pass
+
+try:
+    import zstandard
+except ImportError:
+    pass
+
+
+class Compressor(object):
+    # Written into each record header so a record can be read back regardless of the current configuration.
+    id = None  # type: int
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class NoCompressor(Compressor):
+    id = 0
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCompressor(Compressor):
+    id = 1
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LZ4Compressor(Compressor):
+    id = 2
+
+    def __init__(self, level: int = 0):
+        self.level = level
+        self._frame = lz4.frame
+
+    def compress(self, data: bytes) -> bytes:
+        return self._frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._frame.decompress(data)
+
+
+class ZstdCompressor(Compressor):
+    """Zstandard compression, optionally with a trained dictionary (e.g. from `zstd --train` over sample records).
+
+    Records compressed with a dictionary can only be read back while the same dictionary is configured for their type.
+    """
+    id = 3
+
+    def __init__(self, level: int = 3, dictionary: str = None):
+        self.level = level
+        self._dict_data = None
+        if dictionary is not None:
+            with open(dictionary, "rb") as f:
+                self._dict_data = zstandard.ZstdCompressionDict(f.read())
+        # zstandard's (de)compressors mustn't be used by several threads at once, so each thread gets its own.
+        self._local = threading.local()
+        self._local.compressor = zstandard.ZstdCompressor(level=level, dict_data=self._dict_data)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._dict_data)
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor(dict_data=self._dict_data)
+        return decompressor.decompress(data)
+
+
+_compressors = {
+    "none": NoCompressor,
+    "zlib": ZlibCompressor,
+    "lz4": LZ4Compressor,
+    "zstd": ZstdCompressor
+}
+
+_default_compressors = {}
+
+
+def get_compressor(config: Union[str, Mapping[str, Any]]) -> Compressor:
+    """Builds a compressor from either a codec name or a mapping with a "codec" key plus that codec's options."""
+    if isinstance(config, str):
+        config = {"codec": config}
+    config = dict(config)
+    codec = config.pop("codec")
+    try:
+        cls = _compressors[codec]
+    except KeyError:
+        raise ValueError("Unknown compression codec \"{}\"".format(codec))
+    try:
+        return cls(**config)
+    except NameError:
+        raise ImportError("The \"{}\" compression codec requires an optional dependency that isn't installed".format(codec))
+
+
+def default_compressor(id: int) -> Compressor:
+    """Returns a compressor with default options for the codec `id`, used to read records written under other settings."""
+    compressor = _default_compressors.get(id)
+    if compressor is None:
+        cls = next(cls for cls in _compressors.values() if cls.id == id)
+        compressor = _default_compressors[id] = cls()
+    return compressor
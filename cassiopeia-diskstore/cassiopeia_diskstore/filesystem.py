@@ -0,0 +1,105 @@
+import os
+import tempfile
+from typing import Iterable, List, Tuple
+
+import simplekv.fs
+
+# Records are written here first and renamed into place, so a crash never leaves a partially written record behind.
+_INCOMING = ".incoming"
+# Where the multi-process mode's key locks live (see locking.py).
+_LOCKS = ".locks"
+# When each cleared type and/or platform was last cleared (see invalidation.py).
+_INVALIDATIONS = ".invalidations"
+
+
+class AtomicFilesystemStore(simplekv.fs.FilesystemStore):
+    """A filesystem store whose puts replace a record in a single rename.
+
+    Readers see either the previous record or the new one, never a torn write. With `fsync=True` each record is synced
+    before it is renamed into place; `put_batch` writes several records with one round of syncs.
+    """
+
+    def __init__(self, root: str, fsync: bool = False, **kwargs):
+        super().__init__(root, **kwargs)
+        self.fsync = fsync
+
+    def _write_incoming(self, data: bytes) -> Tuple[int, str]:
+        directory = os.path.join(self.root, _INCOMING)
+        self._ensure_dir_exists(directory)
+        fd, filename = tempfile.mkstemp(dir=directory)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except BaseException:
+            os.close(fd)
+            os.unlink(filename)
+            raise
+        return fd, filename
+
+    def _rename_into_place(self, key: str, filename: str) -> str:
+        # mkstemp creates files as 0600, so always apply the store's (or the umask's) permissions.
+        self._fix_permissions(filename)
+        target = self._build_filename(key)
+        self._ensure_dir_exists(os.path.dirname(target))
+        os.replace(filename, target)
+        return os.path.dirname(target)
+
+    def _put(self, key: str, data: bytes) -> str:
+        fd, filename = self._write_incoming(data)
+        try:
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        directory = self._rename_into_place(key, filename)
+        if self.fsync:
+            _fsync_directory(directory)
+        return key
+
+    def _put_file(self, key: str, file) -> str:
+        return self._put(key, file.read())
+
+    def put_batch(self, items: Iterable[Tuple[str, bytes]], sync: bool = None) -> None:
+        """Writes every record before syncing any of them, then renames them all and syncs each directory once."""
+        sync = self.fsync if sync is None else sync
+        incoming = []
+        try:
+            for key, data in items:
+                incoming.append((key,) + self._write_incoming(data))
+            if sync:
+                for key, fd, filename in incoming:
+                    os.fsync(fd)
+        finally:
+            for key, fd, filename in incoming:
+                os.close(fd)
+        directories = {self._rename_into_place(key, filename) for key, fd, filename in incoming}
+        if sync:
+            for directory in directories:
+                _fsync_directory(directory)
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._build_filename(key))
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def keys(self, prefix: str = "") -> List[str]:
+        root = os.path.abspath(self.root)
+        result = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            if dirpath == root and _INCOMING in dirnames:
+                dirnames.remove(_INCOMING)
+            for filename in filenames:
+                key = os.path.join(dirpath, filename)[len(root) + 1:]
+                if key.startswith(prefix) and key != _LOCKS and not key.startswith(_INVALIDATIONS):
+                    result.append(key)
+        return result
+
+
+def _fsync_directory(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
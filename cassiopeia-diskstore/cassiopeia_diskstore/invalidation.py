@@ -0,0 +1,203 @@
+import datetime
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .filesystem import _INVALIDATIONS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# A scope is a (type name, platform) pair, either of which may be "" for any.
+Scope = Tuple[str, str]
+
+
+def _scope_of(key: str) -> Scope:
+    # Keys start with their DTO type's name, followed by the platform for the types that have one.
+    type_name, _, rest = key.partition(".")
+    return type_name, rest.partition(".")[0]
+
+
+def _prefix(scope: Scope) -> str:
+    type_name, platform = scope
+    if not type_name:
+        return ""
+    return type_name + "." + platform if platform else type_name + "."
+
+
+class Invalidations(object):
+    """Invalidates every record of a DTO type, a platform, or a type on one platform in constant time.
+
+    Clearing a scope starts a new generation of it: the time it was cleared is kept in a small file in the store's
+    directory, and records entered before then are treated as gone. The old generation's records are deleted in the
+    background, at most `max_deletes_per_second`, or right away by `collect()`. Other processes using the store see
+    a new generation within `refresh_interval` seconds. With a `refresh_interval` of None nothing runs in the
+    background: reads check for new generations every time, and old ones are only deleted by `collect()`.
+    """
+
+    def __init__(self, max_deletes_per_second: float = 1000.0, refresh_interval: Optional[float] = 1.0):
+        self.max_deletes_per_second = max_deletes_per_second
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+        self._hurry = threading.Event()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._service = None
+        self._filename = None
+        self._version = None
+        self._refreshed = 0.0
+        self._cleared = {}  # type: Dict[Scope, float]
+        self._pending = []  # type: List[Scope]  # Scopes whose old records may still be on disk.
+
+    def attach(self, service: "SimpleKVDiskService") -> None:
+        if self._service is not None:
+            return
+        self._service = service
+        self._filename = os.path.join(service._store.root, _INVALIDATIONS)
+        self.refresh(force=True)
+
+    def start(self, service: "SimpleKVDiskService") -> None:
+        self.attach(service)
+        if self._thread is not None or self.refresh_interval is None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="cassiopeia-diskstore-invalidations", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+
+    def is_invalidated(self, key: str, entered: float) -> bool:
+        cleared = self._cleared
+        if not cleared:
+            return False
+        type_name, platform = _scope_of(key)
+        return entered <= max(cleared.get(("", ""), 0.0), cleared.get((type_name, ""), 0.0), cleared.get(("", platform), 0.0), cleared.get((type_name, platform), 0.0))
+
+    def invalidate(self, type_name: str = "", platform: str = "") -> None:
+        with self._updating():
+            scopes = self._load()
+            scopes["{}/{}".format(type_name, platform)] = [datetime.datetime.now().timestamp(), False]
+            self._save(scopes)
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> None:
+        """Reloads the clear times if they changed, e.g. in another process, and drops what's cached of the newly cleared scopes."""
+        now = time.monotonic()
+        if not force and self.refresh_interval and now - self._refreshed < self.refresh_interval:
+            return
+        self._refreshed = now
+        try:
+            stat = os.stat(self._filename)
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        if version == self._version:
+            return
+        cleared = []
+        with self._lock:
+            self._version = version
+            new = dict(self._cleared)
+            for name, (cleared_at, collected) in self._load().items():
+                scope = tuple(name.split("/"))
+                if new.get(scope, 0.0) < cleared_at:
+                    new[scope] = cleared_at
+                    cleared.append(scope)
+                    if not collected and scope not in self._pending:
+                        self._pending.append(scope)
+            self._cleared = new
+        if cleared:
+            self._service._forget(cleared)
+        if self._pending:
+            self._wakeup.set()
+
+    def collect(self) -> int:
+        """Deletes the records of old generations now and returns how many there were."""
+        # Don't wait for a rate-limited pass in the background to finish either.
+        self._hurry.set()
+        try:
+            return self._collect_pending()
+        finally:
+            self._hurry.clear()
+
+    def _collect_pending(self) -> int:
+        with self._collect_lock:
+            deleted = 0
+            while self._pending and not self._stopped.is_set():
+                scope = self._pending[0]
+                cleared_at = self._cleared[scope]
+                deleted += self._collect(scope)
+                if self._stopped.is_set():
+                    break
+                with self._updating():
+                    scopes = self._load()
+                    name = "{}/{}".format(*scope)
+                    if scopes.get(name) == [cleared_at, False]:
+                        scopes[name] = [cleared_at, True]
+                        self._save(scopes)
+                    if self._cleared[scope] == cleared_at:
+                        self._pending.remove(scope)
+            return deleted
+
+    def _collect(self, scope: Scope) -> int:
+        deleted = 0
+        delay = 1.0 / self.max_deletes_per_second if self.max_deletes_per_second else 0.0
+        if self._service._writer is not None:
+            # Records still queued were entered before the clear too.
+            self._service._writer.flush()
+        for key in self._service._store.iter_keys(_prefix(scope)):
+            if self._stopped.is_set():
+                break
+            if scope[1] and _scope_of(key)[1] != scope[1]:
+                continue
+            if self._service._expire_key(key, datetime.datetime.now().timestamp()):
+                deleted += 1
+                if delay and threading.current_thread() is self._thread and not self._hurry.is_set():
+                    self._stopped.wait(delay)
+        return deleted
+
+    @contextmanager
+    def _updating(self):
+        # Other stores on the directory, in this process or another, may be updating the file too.
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fd = os.open(self._filename + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _load(self) -> Dict[str, List]:
+        try:
+            with open(self._filename) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save(self, scopes: Dict[str, List]) -> None:
+        with open(self._filename + ".tmp", "w") as f:
+            json.dump(scopes, f)
+        os.replace(self._filename + ".tmp", self._filename)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            # With no refresh interval reads refresh on their own, so only wake up for local clears.
+            self._wakeup.wait(self.refresh_interval or None)
+            self._wakeup.clear()
+            self.refresh()
+            self._collect_pending()
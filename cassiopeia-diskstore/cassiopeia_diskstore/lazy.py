@@ -0,0 +1,129 @@
+from typing import Any, Callable, Dict
+
+
+class LazyDto(object):
+    """Mixin for DtoObject subclasses whose items are only built, by `_build`, the first time they are used.
+
+    Mix it in ahead of the DTO type, e.g. `class LazyTimelineDto(LazyDto, TimelineDto)`, so the instance still is
+    that DTO type. Reading or changing the items in any way builds them first, `**` unpacking and `dict()` included,
+    and pickling or copying produces the plain DTO type. Only code that reads a dict's storage directly, such as
+    `json.dumps`, sees it empty until it's built; `to_json` and `to_bytes` build it first.
+    """
+    _built = False
+
+    def _build(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _ensure_built(self) -> None:
+        if not self._built:
+            self._built = True
+            dict.update(self, self._build())
+
+    def _plain_type(self) -> type:
+        return next(cls for cls in type(self).__mro__ if issubclass(cls, dict) and not issubclass(cls, LazyDto))
+
+    def _plain(self) -> dict:
+        self._ensure_built()
+        return self._plain_type()(dict.items(self))
+
+    def __getitem__(self, key):
+        self._ensure_built()
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self._ensure_built()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._ensure_built()
+        dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        self._ensure_built()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._ensure_built()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._ensure_built()
+        return dict.__len__(self)
+
+    def __eq__(self, other):
+        self._ensure_built()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._ensure_built()
+        return dict.__ne__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._ensure_built()
+        return dict.__repr__(self)
+
+    def __reduce_ex__(self, protocol):
+        self._ensure_built()
+        return self._plain_type(), (dict(dict.items(self)),)
+
+    def get(self, key, default=None):
+        self._ensure_built()
+        return dict.get(self, key, default)
+
+    def keys(self):
+        self._ensure_built()
+        return dict.keys(self)
+
+    def items(self):
+        self._ensure_built()
+        return dict.items(self)
+
+    def values(self):
+        self._ensure_built()
+        return dict.values(self)
+
+    def pop(self, key, *default):
+        self._ensure_built()
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._ensure_built()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._ensure_built()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        self._ensure_built()
+        dict.update(self, *args, **kwargs)
+
+    def clear(self):
+        self._ensure_built()
+        dict.clear(self)
+
+    def copy(self):
+        return self._plain()
+
+    def to_json(self, **kwargs):
+        self._ensure_built()
+        return super().to_json(**kwargs)
+
+    def to_bytes(self, **kwargs):
+        self._ensure_built()
+        return super().to_bytes(**kwargs)
+
+
+class LazyDict(LazyDto, dict):
+    """A dict that is only built, by `loads(data)`, the first time it's used."""
+
+    def __init__(self, data: Any, loads: Callable[[Any], Dict]):
+        super().__init__()
+        self._data = data
+        self._loads = loads
+
+    def _build(self) -> Dict[str, Any]:
+        data, self._data = self._data, None
+        return self._loads(data)
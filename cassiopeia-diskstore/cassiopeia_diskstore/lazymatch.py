@@ -0,0 +1,90 @@
+from typing import Any, Callable, Dict, List
+
+from cassiopeia.dto.match import MatchDto
+
+from .lazy import LazyDict
+from .serializers import Serializer, serializer_for_id
+
+# Marks a record holding a match whose heavy parts are serialized separately, with what's needed to read them.
+_LAZY = "__lazy__"
+# The participants' stats and timelines, and the participant identities, are only decoded when first used.
+_LAZY_PARTICIPANT_FIELDS = ("stats", "timeline")
+
+
+class _Group(object):
+    """One field of every participant, serialized together and decoded (once) when any of them is first used."""
+    __slots__ = ("_data", "_loads", "_values")
+
+    def __init__(self, data: bytes, loads: Callable[[bytes], List]):
+        self._data = data
+        self._loads = loads
+        self._values = None
+
+    def get(self, index: int) -> Dict:
+        if self._values is None:
+            self._values = self._loads(self._data)
+            self._data = None
+        return self._values[index]
+
+
+def encode_match(item: MatchDto, serializer: Serializer) -> Dict[str, Any]:
+    """Returns the form of a match that `decode_match` can read without decoding its heavy parts."""
+    participants = item.get("participants")
+    if not isinstance(participants, list) or not all(isinstance(participant, dict) for participant in participants):
+        return item
+    # A field is only deferred if every participant has it.
+    fields = [field for field in _LAZY_PARTICIPANT_FIELDS if all(isinstance(participant.get(field), dict) for participant in participants)]
+    lazy = {"serializer": serializer.id, "participants": {}}
+    for field in fields:
+        lazy["participants"][field] = serializer.dumps([participant[field] for participant in participants])
+    record = {key: value for key, value in item.items() if key not in ("participants", "participantIdentities")}
+    record["participants"] = [{key: value for key, value in participant.items() if key not in fields} for participant in participants]
+    identities = item.get("participantIdentities")
+    if isinstance(identities, list) and all(isinstance(identity, dict) for identity in identities):
+        lazy["participantIdentities"] = serializer.dumps(identities)
+        lazy["identities"] = len(identities)
+    elif "participantIdentities" in item:
+        record["participantIdentities"] = identities
+    record[_LAZY] = lazy
+    return record
+
+
+def decode_match(data: Dict[str, Any]) -> MatchDto:
+    """Wraps what `encode_match` returned: a LazyMatchDto for the lazy form, otherwise a MatchDto."""
+    if _LAZY not in data:
+        return MatchDto(data)
+    lazy = data[_LAZY]
+    loads = serializer_for_id(lazy["serializer"]).loads_value
+    item = LazyMatchDto({key: value for key, value in data.items() if key != _LAZY})
+    participants = item["participants"] = [dict(participant) for participant in data["participants"]]
+    for field, values in lazy["participants"].items():
+        group = _Group(values, loads)
+        for index, participant in enumerate(participants):
+            participant[field] = LazyDict(index, group.get)
+    if "participantIdentities" in lazy:
+        group = _Group(lazy["participantIdentities"], loads)
+        item["participantIdentities"] = [LazyDict(index, group.get) for index in range(lazy["identities"])]
+    return item
+
+
+class LazyMatchDto(MatchDto):
+    """A MatchDto whose top-level fields are decoded, while the participants' stats and timelines and the participant
+    identities are only decoded when first used. `to_json` and `to_bytes` decode everything first."""
+
+    def _ensure_built(self) -> None:
+        for participant in self.get("participants", ()):
+            for field in _LAZY_PARTICIPANT_FIELDS:
+                value = participant.get(field)
+                if isinstance(value, LazyDict):
+                    participant[field] = value.copy()
+        identities = self.get("participantIdentities")
+        if identities is not None:
+            self["participantIdentities"] = [identity.copy() if isinstance(identity, LazyDict) else identity for identity in identities]
+
+    def to_json(self, **kwargs):
+        self._ensure_built()
+        return super().to_json(**kwargs)
+
+    def to_bytes(self, **kwargs):
+        self._ensure_built()
+        return super().to_bytes(**kwargs)
@@ -1,4 +1,4 @@
-from typing import Type, TypeVar, MutableMapping, Any, Iterable
+from typing import Type, TypeVar, MutableMapping, Any, Iterable, Generator
 
 from datapipelines import DataSource, DataSink, PipelineContext, Query, validate_query
 
@@ -49,6 +49,22 @@ class LeaguesDiskService(SimpleKVDiskService):
                                                     queue=item["queue"])
         self._put(key, item)
 
+    _validate_get_many_challenger_league_query = Query. \
+        has("queues").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(ChallengerLeagueListDto)
+    @validate_query(_validate_get_many_challenger_league_query, convert_region_to_platform)
+    def get_many_challenger_league(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[ChallengerLeagueListDto, None, None]:
+        keys = ["{clsname}.{platform}.{queue}".format(clsname=ChallengerLeagueListDto.__name__,
+                                                      platform=query["platform"].value,
+                                                      queue=Queue(queue).value) for queue in query["queues"]]
+        return (ChallengerLeagueListDto(data) for data in self._get_many(keys))
+
+    @put_many.register(ChallengerLeagueListDto)
+    def put_many_challenger_league(self, items: Iterable[ChallengerLeagueListDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_challenger_league, items)
+
     # Grandmaster
 
     _validate_get_grandmaster_league_query = Query. \
@@ -71,6 +87,22 @@ class LeaguesDiskService(SimpleKVDiskService):
                                                     queue=item["queue"])
         self._put(key, item)
 
+    _validate_get_many_grandmaster_league_query = Query. \
+        has("queues").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(GrandmasterLeagueListDto)
+    @validate_query(_validate_get_many_grandmaster_league_query, convert_region_to_platform)
+    def get_many_grandmaster_league(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[GrandmasterLeagueListDto, None, None]:
+        keys = ["{clsname}.{platform}.{queue}".format(clsname=GrandmasterLeagueListDto.__name__,
+                                                      platform=query["platform"].value,
+                                                      queue=Queue(queue).value) for queue in query["queues"]]
+        return (GrandmasterLeagueListDto(data) for data in self._get_many(keys))
+
+    @put_many.register(GrandmasterLeagueListDto)
+    def put_many_grandmaster_league(self, items: Iterable[GrandmasterLeagueListDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_grandmaster_league, items)
+
     # Master
 
     _validate_get_master_league_query = Query. \
@@ -92,3 +124,19 @@ class LeaguesDiskService(SimpleKVDiskService):
                                                     platform=platform,
                                                     queue=item["queue"])
         self._put(key, item)
+
+    _validate_get_many_master_league_query = Query. \
+        has("queues").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(MasterLeagueListDto)
+    @validate_query(_validate_get_many_master_league_query, convert_region_to_platform)
+    def get_many_master_league(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[MasterLeagueListDto, None, None]:
+        keys = ["{clsname}.{platform}.{queue}".format(clsname=MasterLeagueListDto.__name__,
+                                                      platform=query["platform"].value,
+                                                      queue=Queue(queue).value) for queue in query["queues"]]
+        return (MasterLeagueListDto(data) for data in self._get_many(keys))
+
+    @put_many.register(MasterLeagueListDto)
+    def put_many_master_league(self, items: Iterable[MasterLeagueListDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_master_league, items)
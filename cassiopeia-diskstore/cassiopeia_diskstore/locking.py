@@ -0,0 +1,109 @@
+import os
+import threading
+import zlib
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+import simplekv
+
+from .filesystem import _LOCKS
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_unlocked = nullcontext()
+
+# POSIX record locks belong to the process rather than to the open file, and closing any of the process's files on the
+# lock file drops all of them, so every StripedLock on a directory in this process shares one open file and one set of
+# thread locks: [file descriptor, stripes, thread locks, references lock, users].
+_directories = {}  # type: Dict[str, List]
+_directories_lock = threading.Lock()
+
+
+class StripedLock(object):
+    """Advisory per-key locks shared by every process using a store directory.
+
+    Keys are hashed onto `stripes` byte ranges of one lock file and locked with POSIX record locks, so two processes
+    (or two threads, or two stores in one process) never write, or check and delete, the same key's record at the same
+    time. Without fcntl (e.g. on Windows) the locks only hold within one process.
+    """
+
+    def __init__(self, stripes: int = 256):
+        self.stripes = stripes
+        # POSIX record locks belong to the process, so threads also need to exclude each other.
+        self._thread_locks = [threading.Lock() for _ in range(stripes)]
+        self._references_lock = threading.Lock()
+        self._fd = None
+        self._directory = None
+        self._starts = 0
+
+    def start(self, store: simplekv.KeyValueStore) -> None:
+        # Every service of a composite store starts the same lock, and only the last one to stop releases it.
+        directory = os.path.realpath(store.root)
+        with _directories_lock:
+            if self._directory is not None:
+                if self._directory != directory:
+                    raise ValueError("A StripedLock can't be used for both \"{}\" and \"{}\"".format(self._directory, directory))
+                self._starts += 1
+                _directories[directory][4] += 1
+                return
+            entry = _directories.get(directory)
+            if entry is None:
+                fd = os.open(os.path.join(directory, _LOCKS), os.O_RDWR | os.O_CREAT, 0o666) if fcntl is not None else None
+                entry = _directories[directory] = [fd, self.stripes, self._thread_locks, self._references_lock, 0]
+            elif entry[1] != self.stripes:
+                raise ValueError("The store at \"{}\" is already locked with {} stripes rather than {}".format(directory, entry[1], self.stripes))
+            entry[4] += 1
+            self._fd, _, self._thread_locks, self._references_lock, _ = entry
+            self._directory = directory
+            self._starts = 1
+
+    def stop(self) -> None:
+        with _directories_lock:
+            if self._directory is None:
+                return
+            directory = self._directory
+            entry = _directories[directory]
+            entry[4] -= 1
+            self._starts -= 1
+            if self._starts == 0:
+                self._directory = None
+                self._fd = None
+            if entry[4] == 0:
+                del _directories[directory]
+                if entry[0] is not None:
+                    os.close(entry[0])
+
+    def stripe(self, key: str) -> int:
+        return zlib.crc32(key.encode("utf-8")) % self.stripes
+
+    @contextmanager
+    def hold(self, *keys: str):
+        """Holds the locks for all of `keys`, taking them in stripe order so that holders never deadlock."""
+        held = []
+        try:
+            for stripe in sorted({self.stripe(key) for key in keys}):
+                self._thread_locks[stripe].acquire()
+                held.append(stripe)
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            yield
+        finally:
+            for stripe in reversed(held):
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+                self._thread_locks[stripe].release()
+
+    @contextmanager
+    def hold_references(self):
+        """Holds the lock over shared payloads' reference lists. Nothing else may be locked while holding it."""
+        with self._references_lock:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self.stripes)
+            try:
+                yield
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self.stripes)
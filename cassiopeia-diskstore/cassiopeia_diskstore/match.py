@@ -1,16 +1,35 @@
-from typing import Type, TypeVar, MutableMapping, Any, Iterable
+from typing import Type, TypeVar, MutableMapping, Any, Iterable, Generator, List, Set, Tuple
+import datetime
+import threading
 
-from datapipelines import DataSource, DataSink, PipelineContext, Query, validate_query
+from datapipelines import DataSource, DataSink, PipelineContext, Query, NotFoundError, validate_query
 
-from cassiopeia.data import Platform, Region
+from cassiopeia.data import Platform, Region, Queue, Season, QUEUE_IDS, SEASON_IDS
 from cassiopeia.dto.match import MatchDto, MatchListDto, TimelineDto
 from cassiopeia.datastores.uniquekeys import convert_region_to_platform
 from .common import SimpleKVDiskService
+from .timeline import encode_timeline, decode_timeline
+from .lazymatch import encode_match, decode_match
 
 T = TypeVar("T")
 
 
+def _merge_ranges(ranges: Iterable[List[int]]) -> List[List[int]]:
+    merged = []
+    for begin, end in sorted(ranges):
+        if merged and begin <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([begin, end])
+    return merged
+
+
 class MatchDiskService(SimpleKVDiskService):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._match_list_lock = threading.Lock()
+        self._refreshing = threading.local()
+
     @DataSource.dispatch
     def get(self, type: Type[T], query: MutableMapping[str, Any], context: PipelineContext = None) -> T:
         pass
@@ -39,7 +58,7 @@ class MatchDiskService(SimpleKVDiskService):
         key = "{clsname}.{platform}.{id}".format(clsname=MatchDto.__name__,
                                                  platform=query["platform"].value,
                                                  id=query["id"])
-        return MatchDto(self._get(key))
+        return decode_match(self._get(key))
 
     @put.register(MatchDto)
     def put_match(self, item: MatchDto, context: PipelineContext = None) -> None:
@@ -47,70 +66,176 @@ class MatchDiskService(SimpleKVDiskService):
         key = "{clsname}.{platform}.{id}".format(clsname=MatchDto.__name__,
                                                  platform=platform,
                                                  id=item["gameId"])
-        self._put(key, item)
+        self._put(key, encode_match(item, self._serializer) if self._lazy_matches else item, type=MatchDto)
+
+    _validate_get_many_match_query = Query. \
+        has("ids").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(MatchDto)
+    @validate_query(_validate_get_many_match_query, convert_region_to_platform)
+    def get_many_match(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[MatchDto, None, None]:
+        keys = ["{clsname}.{platform}.{id}".format(clsname=MatchDto.__name__,
+                                                   platform=query["platform"].value,
+                                                   id=id) for id in query["ids"]]
+        return (decode_match(data) for data in self._get_many(keys))
+
+    @put_many.register(MatchDto)
+    def put_many_match(self, items: Iterable[MatchDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_match, items)
 
     # Match list
 
-    # This is cool and useful functionality, but it really only works if we can pull the entire match
-    # history in one go. For now, we just won't save the match history to disk at all.
-    """
+    # Each account's match history is one record holding every match reference seen so far, newest first, plus the
+    # time ranges (in ms) that are known to be complete, kept per combination of queue/season/champion filters.
+    # Queries are answered from the references when the ranges cover them. When only the newest part of the history
+    # is missing, just that slice is fetched through the pipeline and merged in.
+
+    # How far behind now a history can be and still count as current.
+    _match_history_refresh = datetime.timedelta(minutes=30)
+    # The largest page Riot returns, which the pipeline's match history paging expects.
+    _match_history_page = 100
+
     _validate_get_match_list_query = Query. \
-        has("account.id").as_(int).also. \
+        has("accountId").as_(str).also. \
         has("platform").as_(Platform).also. \
-        can_have("beginTime").as_(int).also. \
+        can_have("beginTime").with_default(0).also. \
         can_have("endTime").as_(int).also. \
-        can_have("beginIndex").as_(int).also. \
-        can_have("endIndex").as_(int).also. \
+        can_have("beginIndex").with_default(0).also. \
+        can_have("maxNumberOfMatches").with_default(float("inf")).also. \
         can_have("seasons").as_(Iterable).also. \
         can_have("champion.ids").as_(Iterable).also. \
-        can_have("queues").as_(Iterable).also. \
-        can_have("forceRefresh").with_default(False)
+        can_have("queues").as_(Iterable)
+
+    @staticmethod
+    def _match_list_filters(queues: Iterable, seasons: Iterable, champions: Iterable) -> Tuple[Set[int], Set[int], Set[int]]:
+        return {QUEUE_IDS[Queue(queue)] for queue in queues}, {SEASON_IDS[Season(season)] for season in seasons}, {int(champion) for champion in champions}
+
+    @staticmethod
+    def _match_list_signature(queues: Set[int], seasons: Set[int], champions: Set[int]) -> str:
+        return ".".join("|".join(str(id) for id in sorted(ids)) for ids in (queues, seasons, champions))
+
+    @staticmethod
+    def _match_list_ranges(history: MutableMapping[str, Any], signature: str) -> List[List[int]]:
+        # Unfiltered ranges are complete for every filter too.
+        ranges = history["ranges"].get("..", []) + (history["ranges"].get(signature, []) if signature != ".." else [])
+        return _merge_ranges(ranges)
 
     @get.register(MatchListDto)
+    @validate_query(_validate_get_match_list_query, convert_region_to_platform)
     def get_match_list(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> MatchListDto:
-        MatchDiskService._validate_get_match_list_query(query, context)
         platform = query["platform"].value
-        queues = "|".join(sorted({queue.value for queue in query.get("queues", {})}))
-        seasons = "|".join(sorted({season.value for season in query.get("seasons", {})}))
-        champions = "|".join(sorted({champion.value for champion in query.get("champion.ids", {})}))
-        key = "{clsname}.{platform}.{account_id}.{queues}.{seasons}.{champions}".format(clsname=MatchListDto.__name__,
-                                                                                        platform=platform,
-                                                                                        account_id=query["account.id"],
-                                                                                        queues=queues,
-                                                                                        seasons=seasons,
-                                                                                        champions=champions)
-        data = self._get(key)
-
-        # The above line will throw a NotFoundError if the matchlist for this summoner doesn't exist at all.
-        # However, if it does exist, let's try to be smart about pulling the remaining data.
-        most_recent = data["matches"][0]["timestamp"]
-        # Choose 30 minutes to refresh match history
-        refresh_from_expiration = datetime.datetime.fromtimestamp(most_recent/1000) < datetime.datetime.now() - datetime.timedelta(minutes=30)
-        if query["forceRefresh"] or refresh_from_expiration:
-            new_query = copy.deepcopy(query)
-            new_query.pop("beginTime", None)
-            new_query.pop("endTime", None)
-            new_query.pop("beginIndex", None)
-            new_query.pop("endIndex", None)
-            new_query["beginTime"] = most_recent + 1  # Add 1 ms so we don't get the last game we have.
-            new_data = context[context.Keys.PIPELINE].get(MatchListDto, query=new_query, context=context)
-            data["matches"].extend(new_data["matches"])
-        return MatchListDto(self._get(key))
+        key = "{clsname}.{platform}.{account_id}".format(clsname=MatchListDto.__name__,
+                                                         platform=platform,
+                                                         account_id=query["accountId"])
+        if key in getattr(self._refreshing, "keys", ()):
+            # This is the pipeline asking for the slice we're refreshing, which has to come from further down.
+            raise NotFoundError
+        history = self._get(key)
+
+        queues, seasons, champions = self._match_list_filters(query.get("queues", ()), query.get("seasons", ()), query.get("champion.ids", ()))
+        signature = self._match_list_signature(queues, seasons, champions)
+        now = int(datetime.datetime.now().timestamp() * 1000)
+        begin = query["beginTime"]
+        end = min(query["endTime"], now) if "endTime" in query else now
+        tolerance = self._match_history_refresh.total_seconds() * 1000
+
+        begin_index = query["beginIndex"]
+        end_index = begin_index + int(min(self._match_history_page, query["maxNumberOfMatches"]))
+
+        def page(history):
+            matches = [ref for ref in history["matches"] if begin <= ref["timestamp"] <= end and
+                       (not queues or ref["queue"] in queues) and
+                       (not seasons or ref["season"] in seasons) and
+                       (not champions or ref["champion"] in champions)]
+            # The page has to come out of one complete range, reaching down to its oldest match (or to the start of
+            # the window if it runs out) and up to (close enough to) the end of the window.
+            oldest = matches[end_index - 1]["timestamp"] if len(matches) >= end_index else begin
+            ranges = [range for range in self._match_list_ranges(history, signature) if range[0] <= oldest and range[1] >= oldest]
+            return matches[begin_index:end_index], ranges[0] if ranges else None
+
+        refs, covering = page(history)
+        if covering is None:
+            raise NotFoundError
+        if covering[1] < end - tolerance:
+            if context is None:
+                raise NotFoundError
+            # Only the newest part is missing, so fetch just that and try again.
+            refs, covering = page(self._refresh_match_list(key, query, covering[1], context))
+            if covering is None or covering[1] < end - tolerance:
+                raise NotFoundError
+
+        return MatchListDto({
+            "matches": [dict(ref) for ref in refs],
+            "accountId": query["accountId"],
+            "region": query["platform"].region.value,
+            "season": {Season(season) for season in query.get("seasons", ())},
+            "champion": set(query.get("champion.ids", ())),
+            "queue": {Queue(queue) for queue in query.get("queues", ())},
+            "beginIndex": begin_index,
+            "endIndex": end_index,
+            "maxNumberOfMatches": query["maxNumberOfMatches"]
+        })
+
+    def _refresh_match_list(self, key: str, query: MutableMapping[str, Any], since: int, context: PipelineContext) -> MutableMapping[str, Any]:
+        """Fetches the matches played since `since` through the pipeline, which puts them back into this service."""
+        new_query = {name: value for name, value in query.items() if name in ("accountId", "platform", "queues", "seasons", "champion.ids")}
+        new_query["beginTime"] = since
+        new_query["beginIndex"] = 0
+        new_query["maxNumberOfMatches"] = float(self._match_history_page)
+        refreshing = getattr(self._refreshing, "keys", set())
+        self._refreshing.keys = refreshing | {key}
+        try:
+            context[context.Keys.PIPELINE].get(MatchListDto, query=new_query)
+        finally:
+            self._refreshing.keys = refreshing
+        return self._get(key)
 
     @put.register(MatchListDto)
     def put_match_list(self, item: MatchListDto, context: PipelineContext = None) -> None:
         platform = Region(item["region"]).platform.value
-        queues = "|".join(sorted({queue.value for queue in item["queue"]}))
-        seasons = "|".join(sorted({season.value for season in item["season"]}))
-        champions = "|".join(sorted({champion.value for champion in item["champion"]}))
-        key = "{clsname}.{platform}.{account_id}.{queues}.{seasons}.{champions}".format(clsname=MatchListDto.__name__,
-                                                                                        platform=platform,
-                                                                                        account_id=item["accountId"],
-                                                                                        queues=queues,
-                                                                                        seasons=seasons,
-                                                                                        champions=champions)
-        self._put(key, item)
-    """
+        key = "{clsname}.{platform}.{account_id}".format(clsname=MatchListDto.__name__,
+                                                         platform=platform,
+                                                         account_id=item["accountId"])
+        now = int(datetime.datetime.now().timestamp() * 1000)
+        refs = sorted(item["matches"], key=lambda ref: (ref["timestamp"], ref["gameId"]), reverse=True)
+        queues, seasons, champions = self._match_list_filters(item.get("queue", ()), item.get("season", ()), item.get("champion", ()))
+        signature = self._match_list_signature(queues, seasons, champions)
+
+        with self._match_list_lock:
+            try:
+                history = self._get(key)
+            except NotFoundError:
+                history = {"matches": [], "ranges": {}}
+
+            # Work out which time range this list is complete for.
+            covered = None
+            if "beginTime" in item and "endTime" in item:
+                # A full page may have been cut off before it reached beginTime, so then it only reaches its oldest match.
+                limit = item["endIndex"] - item["beginIndex"] if "beginIndex" in item and "endIndex" in item else self._match_history_page
+                lower = refs[-1]["timestamp"] if refs and len(refs) >= limit else item["beginTime"]
+                covered = [lower, min(item["endTime"], now)]
+            elif "beginIndex" in item and "endIndex" in item and (refs or item["beginIndex"] == 0):
+                # A short page reaches the start of the history.
+                lower = refs[-1]["timestamp"] if refs and len(refs) >= item["endIndex"] - item["beginIndex"] else 0
+                if item["beginIndex"] == 0:
+                    upper = now
+                else:
+                    # A later page continues from the oldest reference of the page before it, if we have that page.
+                    upper = refs[0]["timestamp"]
+                    newer = [ref["timestamp"] for ref in history["matches"] if ref["timestamp"] > upper]
+                    if newer and any(range[0] == newer[-1] for range in history["ranges"].get(signature, [])):
+                        upper = newer[-1]
+                covered = [lower, upper]
+
+            by_id = {ref["gameId"]: ref for ref in history["matches"]}
+            for ref in refs:
+                by_id[ref["gameId"]] = dict(ref)
+            history["matches"] = sorted(by_id.values(), key=lambda ref: (ref["timestamp"], ref["gameId"]), reverse=True)
+            if covered is not None:
+                history["ranges"] = dict(history["ranges"])
+                history["ranges"][signature] = _merge_ranges(history["ranges"].get(signature, []) + [covered])
+            self._put(key, history, type=MatchListDto)
 
     # Timeline
 
@@ -124,7 +249,7 @@ class MatchDiskService(SimpleKVDiskService):
         key = "{clsname}.{platform}.{id}".format(clsname=TimelineDto.__name__,
                                                  platform=query["platform"].value,
                                                  id=query["id"])
-        return TimelineDto(self._get(key))
+        return decode_timeline(self._get(key))
 
     @put.register(TimelineDto)
     def put_timeline(self, item: TimelineDto, context: PipelineContext = None) -> None:
@@ -132,4 +257,20 @@ class MatchDiskService(SimpleKVDiskService):
         key = "{clsname}.{platform}.{id}".format(clsname=TimelineDto.__name__,
                                                  platform=platform,
                                                  id=item["matchId"])
-        self._put(key, item)
+        self._put(key, encode_timeline(item) if self._columnar_timelines else item, type=TimelineDto)
+
+    _validate_get_many_timeline_query = Query. \
+        has("ids").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(TimelineDto)
+    @validate_query(_validate_get_many_timeline_query, convert_region_to_platform)
+    def get_many_timeline(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[TimelineDto, None, None]:
+        keys = ["{clsname}.{platform}.{id}".format(clsname=TimelineDto.__name__,
+                                                   platform=query["platform"].value,
+                                                   id=id) for id in query["ids"]]
+        return (decode_timeline(data) for data in self._get_many(keys))
+
+    @put_many.register(TimelineDto)
+    def put_many_timeline(self, items: Iterable[TimelineDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_timeline, items)
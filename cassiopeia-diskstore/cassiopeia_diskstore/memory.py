@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+class MemoryCache(object):
+    """An in-process LRU tier of decoded records that sits in front of the disk.
+
+    The cache is bounded by entry count (`max_entries`), by the encoded size of the records (`max_bytes`), or both.
+    `budgets` optionally caps individual DTO types, measured in bytes if `max_bytes` is set and in entries otherwise;
+    a budget of 0 keeps that type out of memory entirely. Cached values are shared between readers, so nested data
+    must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, budgets: Mapping[Any, int] = None):
+        if max_entries is None and max_bytes is None:
+            raise ValueError("A memory cache needs max_entries, max_bytes, or both.")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.budgets = {(key if isinstance(key, str) else key.__name__): value for key, value in (budgets or {}).items()}
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # type: OrderedDict[str, Tuple[Any, float, int, str]]
+        self._by_type = {}  # type: Dict[str, OrderedDict]
+        self._type_sizes = {}  # type: Dict[str, int]
+        self._bytes = 0
+
+    def _weight(self, size: int) -> int:
+        return size if self.max_bytes is not None else 1
+
+    def get(self, key: str, now: float) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires_at, size, type_name = entry
+            if now > expires_at:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self._by_type[type_name].move_to_end(key)
+            return data
+
+    def put(self, key: str, data: Any, expires_at: float, type_name: str, size: int) -> None:
+        budget = self.budgets.get(type_name)
+        weight = self._weight(size)
+        if budget is not None and weight > budget:
+            return
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (data, expires_at, size, type_name)
+            self._by_type.setdefault(type_name, OrderedDict())[key] = None
+            self._type_sizes[type_name] = self._type_sizes.get(type_name, 0) + weight
+            self._bytes += size
+
+            if budget is not None:
+                of_type = self._by_type[type_name]
+                while self._type_sizes[type_name] > budget:
+                    self._remove(next(iter(of_type)))
+            while (self.max_entries is not None and len(self._entries) > self.max_entries) or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            data, expires_at, size, type_name = entry
+            del self._by_type[type_name][key]
+            self._type_sizes[type_name] -= self._weight(size)
+            self._bytes -= size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DecodedCache(object):
+    """Fully decoded records that never expire (i.e. static data), shared by every service in the process.
+
+    Unlike `MemoryCache`, every reader is handed the same instance, so cached items must never be modified. Items
+    that are identical except for their platform also share a single copy of their "data" entry.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # type: Dict[Tuple[int, str], Tuple[Any, Tuple]]
+        self._shared = {}  # type: Dict[Tuple[int, Tuple], Any]
+
+    def get(self, store: Any, key: str) -> Optional[Any]:
+        entry = self._entries.get((id(store), key))
+        return entry[0] if entry is not None else None
+
+    def get_shared(self, store: Any, shared_key: Tuple) -> Optional[Any]:
+        return self._shared.get((id(store), shared_key))
+
+    def put(self, store: Any, key: str, item: Any, shared_key: Tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get((id(store), key))
+            if entry is not None:
+                return entry[0]
+            self._shared.setdefault((id(store), shared_key), item["data"])
+            self._entries[(id(store), key)] = (item, shared_key)
+            return item
+
+    def delete(self, store: Any, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop((id(store), key), None)
+            if entry is not None and not any(shared_key == entry[1] for (store_id, _), (_, shared_key) in self._entries.items() if store_id == id(store)):
+                self._shared.pop((id(store), entry[1]), None)
+
+    def clear(self, store: Any) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == id(store)]:
+                del self._entries[key]
+            for key in [key for key in self._shared if key[0] == id(store)]:
+                del self._shared[key]
@@ -0,0 +1,147 @@
+import bisect
+import os
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds.
+_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_COUNTERS = (
+    ("memory_hits", "Reads served from the in-memory tier"),
+    ("disk_hits", "Reads served from disk"),
+    ("misses", "Reads of records that weren't stored"),
+    ("expired", "Reads of records that had expired"),
+    ("invalidated", "Reads of records that had been cleared"),
+    ("puts", "Records written"),
+    ("deletes", "Records deleted"),
+    ("read_bytes", "Record bytes read from disk"),
+    ("written_bytes", "Record bytes written")
+)
+
+
+class _Histogram(object):
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+class Metrics(object):
+    """Counts hits, misses, expirations and bytes per DTO type, and keeps latency histograms of gets, puts and decodes.
+
+    Read them with `stats()` or as Prometheus text with `prometheus()`. With `export_path` and/or `export_callback`,
+    the Prometheus text is also written to that file (atomically) or handed to that callable every `export_interval`
+    seconds, e.g. for node_exporter's textfile collector. Services only pay for metrics when they're configured.
+    """
+
+    def __init__(self, export_path: str = None, export_callback: Callable[[str], None] = None, export_interval: float = 15.0, prefix: str = "cassiopeia_diskstore"):
+        self.export_path = export_path
+        self.export_callback = export_callback
+        self.export_interval = export_interval
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = {}  # type: Dict[str, Dict[str, int]]
+        self._histograms = {}  # type: Dict[Tuple[str, str], _Histogram]
+        self._stopped = threading.Event()
+        self._thread = None
+        self._service = None
+
+    def start(self, service: "SimpleKVDiskService") -> None:
+        self._service = service
+        if self._thread is not None or (self.export_path is None and self.export_callback is None):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="cassiopeia-diskstore-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.export()
+
+    def count(self, type_name: str, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            counters = self._counters.get(type_name)
+            if counters is None:
+                counters = self._counters[type_name] = dict.fromkeys((name for name, _ in _COUNTERS), 0)
+            counters[counter] += amount
+
+    def observe(self, type_name: str, operation: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((type_name, operation))
+            if histogram is None:
+                histogram = self._histograms[(type_name, operation)] = _Histogram()
+            histogram.observe(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {type_name: dict(counters) for type_name, counters in self._counters.items()}
+            for (type_name, operation), histogram in self._histograms.items():
+                stats.setdefault(type_name, {})[operation + "_seconds"] = {
+                    "count": sum(histogram.counts),
+                    "sum": histogram.sum,
+                    "buckets": dict(zip(_BUCKETS + (float("inf"),), _cumulative(histogram.counts)))
+                }
+        return stats
+
+    def prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, description in _COUNTERS:
+                metric = "{}_{}_total".format(self.prefix, name)
+                lines.append("# HELP {} {}".format(metric, description))
+                lines.append("# TYPE {} counter".format(metric))
+                for type_name, counters in sorted(self._counters.items()):
+                    lines.append("{}{{type=\"{}\"}} {}".format(metric, type_name, counters[name]))
+            metric = "{}_operation_seconds".format(self.prefix)
+            lines.append("# HELP {} Latency of gets, puts and record decoding".format(metric))
+            lines.append("# TYPE {} histogram".format(metric))
+            for (type_name, operation), histogram in sorted(self._histograms.items()):
+                labels = "type=\"{}\",operation=\"{}\"".format(type_name, operation)
+                for bound, count in zip(_BUCKETS + (float("inf"),), _cumulative(histogram.counts)):
+                    lines.append("{}_bucket{{{},le=\"{}\"}} {}".format(metric, labels, "+Inf" if bound == float("inf") else repr(bound), count))
+                lines.append("{}_sum{{{}}} {!r}".format(metric, labels, histogram.sum))
+                lines.append("{}_count{{{}}} {}".format(metric, labels, sum(histogram.counts)))
+        quota = self._service._quota if self._service is not None else None
+        if quota is not None:
+            stats = quota.stats()
+            lines.append("# TYPE {}_quota_bytes gauge".format(self.prefix))
+            lines.append("{}_quota_bytes {}".format(self.prefix, stats["bytes"]))
+            lines.append("# TYPE {}_quota_max_bytes gauge".format(self.prefix))
+            lines.append("{}_quota_max_bytes {}".format(self.prefix, stats["max_bytes"]))
+            lines.append("# TYPE {}_evicted_total counter".format(self.prefix))
+            for type_name, evicted in sorted(stats["evicted"].items()):
+                lines.append("{}_evicted_total{{type=\"{}\"}} {}".format(self.prefix, type_name, evicted["count"]))
+            lines.append("# TYPE {}_evicted_bytes_total counter".format(self.prefix))
+            for type_name, evicted in sorted(stats["evicted"].items()):
+                lines.append("{}_evicted_bytes_total{{type=\"{}\"}} {}".format(self.prefix, type_name, evicted["bytes"]))
+        return "\n".join(lines) + "\n"
+
+    def export(self) -> None:
+        text = self.prometheus()
+        if self.export_path is not None:
+            with open(self.export_path + ".tmp", "w") as f:
+                f.write(text)
+            os.replace(self.export_path + ".tmp", self.export_path)
+        if self.export_callback is not None:
+            self.export_callback(text)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.export_interval):
+            self.export()
+
+
+def _cumulative(counts: List[int]) -> List[int]:
+    total, cumulative = 0, []
+    for count in counts:
+        total += count
+        cumulative.append(total)
+    return cumulative
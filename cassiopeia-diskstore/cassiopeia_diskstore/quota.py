@@ -0,0 +1,195 @@
+import datetime
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+class DiskQuota(object):
+    """Keeps the records in a store under `max_bytes` by evicting the least recently (`policy="lru"`) or least
+    frequently (`policy="lfu"`) used ones in the background.
+
+    Once the store goes over its quota, records are evicted until it's back under `low_water` of it. `weights` scale
+    how readily each DTO type is evicted relative to the others (a weight of 0 means never), and `reservations` set a
+    number of bytes per type that is never evicted, e.g. `weights={ChampionListDto: 0}` keeps static data while
+    timelines go. Sizes count record bytes; the segments engine only gives the space back when it compacts.
+    """
+
+    def __init__(self, max_bytes: int, policy: str = "lru", weights: Mapping[Any, float] = None, reservations: Mapping[Any, int] = None, low_water: float = 0.9):
+        if policy not in ("lru", "lfu"):
+            raise ValueError("Unknown eviction policy \"{}\"".format(policy))
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.weights = {(key if isinstance(key, str) else key.__name__): value for key, value in (weights or {}).items()}
+        self.reservations = {(key if isinstance(key, str) else key.__name__): value for key, value in (reservations or {}).items()}
+        self.low_water = low_water
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._service = None
+        self._entries = {}  # type: Dict[str, List]  # key -> [size, type name, last access, access count]
+        self._recency = {}  # type: Dict[str, OrderedDict]
+        self._frequency = {}  # type: Dict[str, List[Tuple[int, float, str]]]
+        self._type_bytes = {}  # type: Dict[str, int]
+        self._bytes = 0
+        self._evicted = {}  # type: Dict[str, List[int]]
+
+    def start(self, service: "SimpleKVDiskService") -> None:
+        if self._thread is not None:
+            return
+        self._service = service
+        # Records can also go without a delete, e.g. when segment compaction drops expired ones.
+        if hasattr(service._store, "on_drop"):
+            service._store.on_drop.append(self.delete)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="cassiopeia-diskstore-quota", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        if hasattr(self._service._store, "on_drop") and self.delete in self._service._store.on_drop:
+            self._service._store.on_drop.remove(self.delete)
+
+    def put(self, key: str, size: int, type_name: str, now: float = None) -> None:
+        now = datetime.datetime.now().timestamp() if now is None else now
+        with self._lock:
+            self._remove(key)
+            self._add(key, size, type_name, now)
+            if self._bytes > self.max_bytes:
+                self._wakeup.set()
+
+    def touch(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[2] = datetime.datetime.now().timestamp()
+            entry[3] += 1
+            if self.policy == "lru":
+                self._recency[entry[1]].move_to_end(key)
+            else:
+                self._push(key, entry)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "bytes_by_type": dict(self._type_bytes),
+                "evicted": {type_name: {"count": count, "bytes": size} for type_name, (count, size) in self._evicted.items()}
+            }
+
+    def _add(self, key: str, size: int, type_name: str, accessed: float) -> None:
+        entry = self._entries[key] = [size, type_name, accessed, 1]
+        self._recency.setdefault(type_name, OrderedDict())[key] = None
+        self._type_bytes[type_name] = self._type_bytes.get(type_name, 0) + size
+        self._bytes += size
+        if self.policy == "lfu":
+            self._push(key, entry)
+
+    def _push(self, key: str, entry: List) -> None:
+        # Entries are pushed again on every access and the outdated ones are skipped later, so rebuild now and then.
+        heap = self._frequency.setdefault(entry[1], [])
+        heapq.heappush(heap, (entry[3], entry[2], key))
+        if len(heap) > 2 * len(self._recency[entry[1]]) + 64:
+            self._frequency[entry[1]] = self._rebuild_heap(entry[1])
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            size, type_name = entry[0], entry[1]
+            del self._recency[type_name][key]
+            self._type_bytes[type_name] -= size
+            self._bytes -= size
+
+    def _rebuild_heap(self, type_name: str) -> List[Tuple[int, float, str]]:
+        heap = [(self._entries[key][3], self._entries[key][2], key) for key in self._recency[type_name]]
+        heapq.heapify(heap)
+        return heap
+
+    def _candidate(self, type_name: str) -> Optional[Tuple[str, List]]:
+        if self.policy == "lru":
+            key = next(iter(self._recency[type_name]), None)
+            return (key, self._entries[key]) if key is not None else None
+        heap = self._frequency[type_name]
+        while heap:
+            count, accessed, key = heap[0]
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] == count and entry[2] == accessed:
+                return key, entry
+            heapq.heappop(heap)  # Stale: the key was used or removed since this was pushed.
+        return None
+
+    def _victim(self, now: float) -> Optional[str]:
+        best, best_score = None, 0.0
+        for type_name, size in self._type_bytes.items():
+            weight = self.weights.get(type_name, 1.0)
+            if weight <= 0 or size <= self.reservations.get(type_name, 0):
+                continue
+            candidate = self._candidate(type_name)
+            if candidate is None:
+                continue
+            key, (_, _, accessed, count) = candidate
+            if self.policy == "lru":
+                score = weight * (now - accessed + 1e-6)
+            else:
+                score = weight / count
+            if best is None or score > best_score:
+                best, best_score = key, score
+        return best
+
+    def _evict(self) -> None:
+        target = self.max_bytes * self.low_water
+        while not self._stopped.is_set():
+            with self._lock:
+                if self._bytes <= target:
+                    return
+                key = self._victim(datetime.datetime.now().timestamp())
+                if key is None:
+                    return
+                size, type_name = self._entries[key][0], self._entries[key][1]
+                self._remove(key)
+                evicted = self._evicted.setdefault(type_name, [0, 0])
+                evicted[0] += 1
+                evicted[1] += size
+            self._service._delete(key)
+
+    def _seed(self) -> None:
+        # Tracking starts from what's already on disk, using when each record was written as its last access.
+        store = self._service._store
+        for key in store.iter_keys():
+            if self._stopped.is_set():
+                return
+            if key in self._entries:
+                continue
+            try:
+                header = self._service._get_header(key)
+                size = store.size(key)
+            except KeyError:
+                continue
+            with self._lock:
+                if key not in self._entries:
+                    self._add(key, size, header.type_name, header.entered)
+
+    def _run(self) -> None:
+        self._seed()
+        for type_name in list(self._recency):
+            # Seeded records were added in directory order, so put them in access order.
+            with self._lock:
+                self._recency[type_name] = OrderedDict((key, None) for key in sorted(self._recency[type_name], key=lambda key: self._entries[key][2]))
+        self._wakeup.set()
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._bytes > self.max_bytes:
+                self._evict()
@@ -0,0 +1,490 @@
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Set, Tuple, Iterable, Iterator, Optional
+
+import simplekv
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# crc32 of key + value, key length, value length
+_RECORD = struct.Struct("<IHI")
+_TOMBSTONE = 0xFFFFFFFF
+_SEGMENT_SUFFIX = ".seg"
+_INDEX_FILENAME = "index"
+# Shared stores serialize appends with a lock on this file, and compactions append a byte to the generation file
+# so other processes know to reload their index.
+_LOCK_FILENAME = "lock"
+_GENERATION_FILENAME = "generation"
+
+
+class _SegmentReader(object):
+    """A read-only file-like view over one value inside a segment file, which stays open until the view is closed."""
+
+    def __init__(self, store: "SegmentStore", fd: int, offset: int, length: int):
+        self._store = store
+        self._fd = fd
+        self._offset = offset
+        self._end = offset + length
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._end - self._offset
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = os.pread(self._fd, size, self._offset)
+        self._offset += len(data)
+        return data
+
+    def close(self) -> None:
+        if self._store is not None:
+            self._store._release(self._fd)
+            self._store = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SegmentStore(simplekv.KeyValueStore):
+    """Packs values into large append-only segment files instead of one file per key.
+
+    An in-memory index maps each key to the location of its latest value, so a get is a single pread.
+    Deletes append tombstones, and `compact` rewrites sealed segments to reclaim the space held by stale
+    records. The index is persisted on `flush` and `close`; on startup only the records written after the
+    last persisted position are replayed.
+
+    Records that `keep` rejects are dropped by compaction, and each callable in `on_drop` is then called with
+    their key, e.g. so a disk quota stops counting them.
+
+    With `shared=True` several processes can use the same segments: appends take an exclusive lock on the directory
+    and first catch up on what other processes appended, and reads catch up on the log (at most every
+    `refresh_interval` seconds, and on every miss) before consulting the index.
+    """
+
+    def __init__(self, root: str, segment_size: int = 256 * 1024 * 1024, compaction_interval: float = None,
+                 compaction_threshold: float = 0.5, keep: Callable[[str, bytes], bool] = None, shared: bool = False,
+                 refresh_interval: float = 0.0):
+        super().__init__()
+        if shared and fcntl is None:
+            raise ValueError("Shared segments need fcntl file locks, which aren't available on this platform")
+        self.root = root
+        self.segment_size = segment_size
+        self.compaction_threshold = compaction_threshold
+        self.shared = shared
+        self.refresh_interval = refresh_interval
+        self._keep = keep
+        self.on_drop = []  # type: List[Callable[[str], None]]
+        self._lock = threading.RLock()
+        self._index = {}  # type: Dict[str, Tuple[int, int, int]]
+        self._sizes = {}  # type: Dict[int, int]
+        self._dead = {}  # type: Dict[int, int]
+        self._fds = {}  # type: Dict[int, int]
+        # Reads pread outside the lock, so descriptors that are still being read from are only closed by the last reader.
+        self._readers = {}  # type: Dict[int, int]
+        self._retired_fds = set()  # type: Set[int]
+        self._lock_fd = None
+        self._exclusive_depth = 0
+        self._refreshed = 0.0
+        if not os.path.exists(root):
+            os.makedirs(root)
+        if shared:
+            self._lock_fd = os.open(os.path.join(root, _LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o666)
+        with self._exclusive():
+            self._generation = self._read_generation()
+            self._load()
+            self._active = max(self._sizes) if self._sizes else self._new_segment()
+
+        self._closed = threading.Event()
+        self._compactor = None
+        if compaction_interval:
+            self._compactor = threading.Thread(target=self._compact_periodically, args=(compaction_interval,), daemon=True)
+            self._compactor.start()
+
+    def _segment_filename(self, segment: int) -> str:
+        return os.path.join(self.root, "{:08d}{}".format(segment, _SEGMENT_SUFFIX))
+
+    def _new_segment(self) -> int:
+        segment = max(self._sizes) + 1 if self._sizes else 0
+        fd = os.open(self._segment_filename(segment), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o666)
+        self._fds[segment] = fd
+        self._sizes[segment] = 0
+        self._dead[segment] = 0
+        return segment
+
+    def _fd(self, segment: int) -> int:
+        fd = self._fds.get(segment)
+        if fd is None:
+            fd = os.open(self._segment_filename(segment), os.O_RDWR | os.O_APPEND)
+            self._fds[segment] = fd
+        return fd
+
+    ###########
+    # Locking #
+    ###########
+
+    @contextmanager
+    def _exclusive(self):
+        """Holds the store against other threads and, for shared stores, other processes."""
+        with self._lock:
+            if self._lock_fd is not None and self._exclusive_depth == 0:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._exclusive_depth += 1
+            try:
+                yield
+            finally:
+                self._exclusive_depth -= 1
+                if self._lock_fd is not None and self._exclusive_depth == 0:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _shared(self):
+        # Keeps appends out while reading the log so a record that is still being written is never seen.
+        with self._lock:
+            if self._exclusive_depth > 0:
+                yield
+                return
+            fcntl.flock(self._lock_fd, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _read_generation(self) -> int:
+        try:
+            return os.stat(os.path.join(self.root, _GENERATION_FILENAME)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _bump_generation(self) -> None:
+        fd = os.open(os.path.join(self.root, _GENERATION_FILENAME), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o666)
+        try:
+            os.write(fd, b"\0")
+        finally:
+            os.close(fd)
+
+    def _refresh(self, force: bool = False) -> None:
+        """Catches up on what other processes appended, unless that was done less than `refresh_interval` ago."""
+        if not self.shared or (not force and time.monotonic() - self._refreshed < self.refresh_interval):
+            return
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self) -> None:
+        self._refreshed = time.monotonic()
+        generation = self._read_generation()
+        if generation != self._generation:
+            # Another process compacted, so segments we know of may be gone; start over from the directory.
+            with self._shared():
+                self._reload()
+            self._generation = generation
+            return
+        if os.fstat(self._fd(self._active)).st_size == self._sizes[self._active] and \
+                not os.path.exists(self._segment_filename(self._active + 1)):
+            return
+        with self._shared():
+            while True:
+                # Segments another process started since are new to us, so they're replayed from the start.
+                self._replay(self._active, self._sizes.get(self._active, 0))
+                if not os.path.exists(self._segment_filename(self._active + 1)):
+                    break
+                self._active += 1
+
+    def _reload(self) -> None:
+        for fd in self._fds.values():
+            self._retire(fd)
+        self._index, self._sizes, self._dead, self._fds = {}, {}, {}, {}
+        self._load()
+        self._active = max(self._sizes) if self._sizes else self._new_segment()
+
+    ###########
+    # Startup #
+    ###########
+
+    def _load(self) -> None:
+        segments = sorted(int(filename[:-len(_SEGMENT_SUFFIX)]) for filename in os.listdir(self.root)
+                          if filename.endswith(_SEGMENT_SUFFIX))
+        persisted = self._load_index(segments)
+        for segment in segments:
+            self._replay(segment, persisted.get(segment, 0))
+
+    def _load_index(self, segments) -> Dict[int, int]:
+        try:
+            with open(os.path.join(self.root, _INDEX_FILENAME), "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return {}
+        sizes = state["sizes"]
+        for segment, size in sizes.items():
+            if segment not in segments or os.path.getsize(self._segment_filename(segment)) < size:
+                # The segments changed underneath the index, so it can't be trusted.
+                return {}
+        self._index = state["index"]
+        self._sizes = dict(sizes)
+        self._dead = dict(state["dead"])
+        return sizes
+
+    def _scan(self, segment: int, position: int, end: int) -> Iterator[Tuple[int, str, int, int]]:
+        """Yields the position, key, value length (or _TOMBSTONE) and length of each intact record from `position`."""
+        fd = self._fd(segment)
+        while position < end:
+            header = os.pread(fd, _RECORD.size, position)
+            if len(header) < _RECORD.size:
+                return
+            crc, key_length, value_length = _RECORD.unpack(header)
+            body_length = key_length + (0 if value_length == _TOMBSTONE else value_length)
+            body = os.pread(fd, body_length, position + _RECORD.size)
+            if len(body) < body_length or zlib.crc32(body) != crc:
+                return
+            record_length = _RECORD.size + body_length
+            yield position, body[:key_length].decode("utf-8"), value_length, record_length
+            position += record_length
+
+    def _replay(self, segment: int, position: int) -> None:
+        self._sizes.setdefault(segment, 0)
+        self._dead.setdefault(segment, 0)
+        end = os.fstat(self._fd(segment)).st_size
+        for position, key, value_length, record_length in self._scan(segment, position, end):
+            self._forget(key)
+            if value_length == _TOMBSTONE:
+                self._dead[segment] += record_length
+            else:
+                self._index[key] = (segment, position + _RECORD.size + len(key.encode("utf-8")), value_length)
+            position += record_length
+        if position < end and (not self.shared or self._exclusive_depth > 0):
+            # A torn write from a crash; drop it so the next append starts on a record boundary.
+            os.ftruncate(self._fd(segment), position)
+        self._sizes[segment] = position
+
+    ##########
+    # Writes #
+    ##########
+
+    def _forget(self, key: str) -> None:
+        location = self._index.pop(key, None)
+        if location is not None:
+            segment, offset, length = location
+            self._dead[segment] += _RECORD.size + len(key.encode("utf-8")) + length
+
+    def _append(self, key: str, value: Optional[bytes]) -> None:
+        encoded_key = key.encode("utf-8")
+        body = encoded_key + value if value is not None else encoded_key
+        record = _RECORD.pack(zlib.crc32(body), len(encoded_key), len(value) if value is not None else _TOMBSTONE) + body
+        if self._sizes[self._active] + len(record) > self.segment_size and self._sizes[self._active] > 0:
+            # Sealed segments are trusted as they are by the persisted index, so they have to be complete on disk.
+            os.fsync(self._fd(self._active))
+            self._active = self._new_segment()
+        position = self._sizes[self._active]
+        os.write(self._fd(self._active), record)
+        self._sizes[self._active] = position + len(record)
+        self._forget(key)
+        if value is None:
+            self._dead[self._active] += len(record)
+        else:
+            self._index[key] = (self._active, position + _RECORD.size + len(encoded_key), len(value))
+
+    def _put(self, key: str, data: bytes) -> str:
+        with self._exclusive():
+            if self.shared:
+                self._catch_up()
+            self._append(key, data)
+        return key
+
+    def _put_file(self, key: str, file) -> str:
+        return self._put(key, file.read())
+
+    def put_batch(self, items: Iterable[Tuple[str, bytes]], sync: bool = False) -> None:
+        with self._exclusive():
+            if self.shared:
+                self._catch_up()
+            written = set()
+            for key, data in items:
+                self._append(key, data)
+                written.add(self._active)
+            if sync:
+                for segment in written:
+                    os.fsync(self._fd(segment))
+
+    def _delete(self, key: str) -> None:
+        with self._exclusive():
+            if self.shared:
+                self._catch_up()
+            if key in self._index:
+                self._append(key, None)
+
+    #########
+    # Reads #
+    #########
+
+    def _locate(self, key: str) -> Tuple[int, int, int]:
+        self._refresh()
+        with self._lock:
+            location = self._index.get(key)
+            if location is None and self.shared:
+                # Another process may have just written it.
+                self._refresh(force=True)
+                location = self._index.get(key)
+            if location is None:
+                raise KeyError(key)
+            return location
+
+    def _acquire(self, key: str) -> Tuple[int, int, int]:
+        """Locates `key` and holds its segment's descriptor open until it's passed to `_release`."""
+        with self._lock:
+            segment, offset, length = self._locate(key)
+            fd = self._fd(segment)
+            self._readers[fd] = self._readers.get(fd, 0) + 1
+            return fd, offset, length
+
+    def _release(self, fd: int) -> None:
+        with self._lock:
+            if fd not in self._readers:
+                # The store was closed in the meantime, which closed every descriptor.
+                return
+            self._readers[fd] -= 1
+            if self._readers[fd] == 0:
+                del self._readers[fd]
+                if fd in self._retired_fds:
+                    self._retired_fds.remove(fd)
+                    os.close(fd)
+
+    def _retire(self, fd: int) -> None:
+        # Compaction or a reload is done with the descriptor, but readers may still be using it.
+        if self._readers.get(fd):
+            self._retired_fds.add(fd)
+        else:
+            os.close(fd)
+
+    def _get(self, key: str) -> bytes:
+        fd, offset, length = self._acquire(key)
+        try:
+            return os.pread(fd, length, offset)
+        finally:
+            self._release(fd)
+
+    def _open(self, key: str) -> _SegmentReader:
+        return _SegmentReader(self, *self._acquire(key))
+
+    def size(self, key: str) -> int:
+        return self._locate(key)[2]
+
+    def _has_key(self, key: str) -> bool:
+        try:
+            self._locate(key)
+        except KeyError:
+            return False
+        return True
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        self._refresh()
+        with self._lock:
+            keys = list(self._index)
+        return (key for key in keys if key.startswith(prefix))
+
+    def keys(self, prefix: str = ""):
+        return list(self.iter_keys(prefix))
+
+    ##############
+    # Compaction #
+    ##############
+
+    def compact(self, threshold: float = None) -> None:
+        """Rewrites the live records of sealed segments whose stale fraction is at least `threshold`."""
+        if threshold is None:
+            threshold = self.compaction_threshold
+        with self._exclusive():
+            if self.shared:
+                self._catch_up()
+            candidates = [segment for segment, size in self._sizes.items()
+                          if segment != self._active and size > 0 and self._dead[segment] / size >= threshold]
+            dropped = []
+            for segment in candidates:
+                dropped.extend(self._compact_segment(segment))
+            if candidates:
+                self.flush()
+                if self.shared:
+                    self._bump_generation()
+                    self._generation = self._read_generation()
+        for key in dropped:
+            for callback in list(self.on_drop):
+                callback(key)
+
+    def _compact_segment(self, segment: int) -> List[str]:
+        with self._lock:
+            if self._closed.is_set():
+                return []
+            dropped = []
+            keys = [key for key, location in self._index.items() if location[0] == segment]
+            for key in keys:
+                _, offset, length = self._index[key]
+                value = os.pread(self._fds[segment], length, offset)
+                if self._keep is None or self._keep(key, value):
+                    self._append(key, value)
+                else:
+                    self._forget(key)
+                    dropped.append(key)
+            if any(older < segment for older in self._sizes):
+                # An older segment may still hold a value the tombstones here deleted, which rebuilding the index
+                # from the segments would bring back without them.
+                deleted = {key for position, key, value_length, record_length in self._scan(segment, 0, self._sizes[segment])
+                           if value_length == _TOMBSTONE}
+                for key in deleted:
+                    if key not in self._index:
+                        self._append(key, None)
+            self._retire(self._fds.pop(segment))
+            del self._sizes[segment]
+            del self._dead[segment]
+            # The copies must be durable before the originals go away. If we crash before the index is
+            # persisted, the old index references a missing segment and is rebuilt from the segments.
+            os.fsync(self._fd(self._active))
+            os.unlink(self._segment_filename(segment))
+            self._persist_index()
+            return dropped
+
+    def _compact_periodically(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            self.compact()
+
+    ###############
+    # Persistence #
+    ###############
+
+    def _persist_index(self) -> None:
+        filename = os.path.join(self.root, _INDEX_FILENAME)
+        with open(filename + ".tmp", "wb") as f:
+            pickle.dump({"sizes": self._sizes, "dead": self._dead, "index": self._index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(filename + ".tmp", filename)
+
+    def flush(self) -> None:
+        with self._exclusive():
+            if self._closed.is_set():
+                return
+            if self.shared:
+                self._catch_up()
+            os.fsync(self._fd(self._active))
+            self._persist_index()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._closed.set()
+            for fd in set(self._fds.values()) | self._retired_fds:
+                os.close(fd)
+            self._fds = {}
+            self._readers = {}
+            self._retired_fds = set()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+        if self._compactor is not None:
+            self._compactor.join()
@@ -0,0 +1,145 @@
+import json
+import pickle
+from abc import abstractmethod
+from typing import Any, Dict
+
+from cassiopeia.dto.common import DtoObject
+
+try:
+    import msgpack
+except ImportError:
+    pass
+
+try:
+    import orjson
+except ImportError:
+    pass
+
+
+def _dto_types() -> Dict[str, type]:
+    types = {}
+    pending = [DtoObject]
+    while pending:
+        cls = pending.pop()
+        types[cls.__name__] = cls
+        pending.extend(cls.__subclasses__())
+    return types
+
+
+def _plain(obj: Any) -> Any:
+    # Query parameters such as includedData are stored as sets, which neither format supports.
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError("Can't serialize {}".format(obj.__class__.__name__))
+
+
+class Serializer(object):
+    # Written into each record header so a record can be read back regardless of the current configuration.
+    id = None  # type: int
+
+    @abstractmethod
+    def dumps(self, item: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def loads(self, data: bytes, type_name: str) -> Any:
+        pass
+
+    def loads_value(self, data: bytes) -> Any:
+        """Loads a nested value, without rebuilding a DTO around it."""
+        return self.loads(data, None)
+
+
+class PickleSerializer(Serializer):
+    id = 0
+
+    def dumps(self, item: Any) -> bytes:
+        return pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes, type_name: str) -> Any:
+        return pickle.loads(data)
+
+
+class _PlainDataSerializer(Serializer):
+    """Stores only plain data and rebuilds the top-level DtoObject from the type name in the record header.
+
+    Nested DTOs come back as plain dicts, which the services re-wrap where they need to. Because the payload
+    doesn't depend on Python class layouts, other tools can read these records too.
+    """
+
+    def __init__(self):
+        self._types = {}
+
+    def _wrap(self, data: Any, type_name: str) -> Any:
+        if not isinstance(data, dict) or type_name is None:
+            return data
+        cls = self._types.get(type_name)
+        if cls is None:
+            # Plugins can add DTO types at any time, so rescan on a miss.
+            self._types = _dto_types()
+            cls = self._types.get(type_name, dict)
+        return cls(data)
+
+
+class MsgpackSerializer(_PlainDataSerializer):
+    id = 1
+
+    def __init__(self):
+        super().__init__()
+        self._msgpack = msgpack
+
+    def dumps(self, item: Any) -> bytes:
+        return self._msgpack.packb(item, default=_plain, use_bin_type=True)
+
+    def loads(self, data: bytes, type_name: str) -> Any:
+        return self._wrap(self._msgpack.unpackb(data, raw=False, strict_map_key=False), type_name)
+
+
+class JSONSerializer(_PlainDataSerializer):
+    """JSON via orjson when it is installed, otherwise the standard library. Non-string dict keys come back as strings."""
+    id = 2
+
+    def __init__(self):
+        super().__init__()
+        self._orjson = globals().get("orjson")
+
+    def dumps(self, item: Any) -> bytes:
+        if self._orjson is not None:
+            return self._orjson.dumps(item, default=_plain, option=self._orjson.OPT_NON_STR_KEYS)
+        return json.dumps(item, default=_plain, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes, type_name: str) -> Any:
+        if self._orjson is not None:
+            return self._wrap(self._orjson.loads(data), type_name)
+        return self._wrap(json.loads(data), type_name)
+
+
+_serializers = {
+    "pickle": PickleSerializer,
+    "msgpack": MsgpackSerializer,
+    "json": JSONSerializer
+}
+
+_instances = {}
+
+
+def get_serializer(name: str) -> Serializer:
+    try:
+        cls = _serializers[name]
+    except KeyError:
+        raise ValueError("Unknown serializer \"{}\"".format(name))
+    return _instance(cls)
+
+
+def serializer_for_id(id: int) -> Serializer:
+    return _instance(next(cls for cls in _serializers.values() if cls.id == id))
+
+
+def _instance(cls: type) -> Serializer:
+    serializer = _instances.get(cls)
+    if serializer is None:
+        try:
+            serializer = _instances[cls] = cls()
+        except NameError:
+            raise ImportError("The {} serializer requires an optional dependency that isn't installed".format(cls.__name__))
+    return serializer
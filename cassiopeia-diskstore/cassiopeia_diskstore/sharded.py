@@ -0,0 +1,68 @@
+import os
+import hashlib
+from typing import Iterator, List
+
+from .filesystem import AtomicFilesystemStore, _INCOMING
+
+
+class ShardedFilesystemStore(AtomicFilesystemStore):
+    """A filesystem store that files each key under its DTO type (and optionally its platform) instead of one flat directory.
+
+    Keys are fanned out below that by a hash prefix, e.g. `MatchDto/NA1/3f/a2/MatchDto.NA1.123`, so no directory grows
+    past a few thousand entries. Listing keys with a prefix naming a type only walks that type's subtree.
+    """
+
+    def __init__(self, root: str, by_platform: bool = False, depth: int = 2, **kwargs):
+        super().__init__(root, **kwargs)
+        self.by_platform = by_platform
+        self.depth = depth
+
+    def _subtree(self, key: str) -> List[str]:
+        parts = key.split(".")
+        subtree = [parts[0]]
+        if self.by_platform:
+            subtree.append(parts[1] if len(parts) > 1 else "_")
+        return subtree
+
+    def _build_filename(self, key: str) -> str:
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        fanout = [digest[2 * i:2 * i + 2] for i in range(self.depth)]
+        return os.path.abspath(os.path.join(self.root, *self._subtree(key), *fanout, key))
+
+    def _delete(self, key: str) -> None:
+        # Unlike the flat store, leave the (soon to be reused) shard directories in place.
+        try:
+            os.unlink(self._build_filename(key))
+        except FileNotFoundError:
+            pass
+
+    def _walk(self, directory: str) -> Iterator[str]:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from self._walk(entry.path)
+            else:
+                yield entry.name
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        root = os.path.abspath(self.root)
+        if "." in prefix:
+            subtree = self._subtree(prefix)
+            if self.by_platform and prefix.count(".") < 2:
+                subtree = subtree[:1]
+            directories = [os.path.join(root, *subtree)]
+        else:
+            try:
+                directories = [entry.path for entry in os.scandir(root) if entry.is_dir() and entry.name.startswith(prefix) and entry.name != _INCOMING]
+            except FileNotFoundError:
+                directories = []
+        for directory in directories:
+            for key in self._walk(directory):
+                if key.startswith(prefix):
+                    yield key
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return list(self.iter_keys(prefix))
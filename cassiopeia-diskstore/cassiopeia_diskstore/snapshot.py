@@ -0,0 +1,169 @@
+import argparse
+import io
+import os
+import struct
+import zlib
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import simplekv
+
+from .common import _parse_header
+from .compression import Compressor, NoCompressor, get_compressor, default_compressor
+
+# A snapshot is a preamble, then every record (each compressed on its own, so one can be read without the others),
+# then a zlib-compressed index of where each record is, then a footer pointing at the index.
+_MAGIC = b"CKVSNAP"
+_VERSION = 1
+_PREAMBLE = struct.Struct("<7sB")
+# key length, offset, stored length, record length, compression
+_ENTRY = struct.Struct("<HQIIB")
+# index offset, index length, magic
+_FOOTER = struct.Struct("<QQ7s")
+
+
+def write_snapshot(filename: str, records: Iterable[Tuple[str, bytes]], compression: Union[str, Compressor] = "zlib") -> int:
+    """Writes `records` (key, record pairs) to a snapshot at `filename`, replacing it atomically, and returns how many were written."""
+    compressor = compression if isinstance(compression, Compressor) else get_compressor(compression)
+    uncompressed = NoCompressor()
+    index = bytearray()
+    count = 0
+    with open(filename + ".tmp", "wb") as f:
+        f.write(_PREAMBLE.pack(_MAGIC, _VERSION))
+        offset = _PREAMBLE.size
+        for key, record in records:
+            # Records of types configured with compression are stored as they are.
+            codec = compressor if _parse_header(record).compression == NoCompressor.id else uncompressed
+            data = codec.compress(record)
+            encoded_key = key.encode("utf-8")
+            index += _ENTRY.pack(len(encoded_key), offset, len(data), len(record), codec.id) + encoded_key
+            f.write(data)
+            offset += len(data)
+            count += 1
+        index = zlib.compress(bytes(index))
+        f.write(index)
+        f.write(_FOOTER.pack(offset, len(index), _MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(filename + ".tmp", filename)
+    return count
+
+
+def _read_index(fd: int) -> Dict[str, Tuple[int, int, int, int]]:
+    size = os.fstat(fd).st_size
+    magic, version = _PREAMBLE.unpack(os.pread(fd, _PREAMBLE.size, 0))
+    if magic != _MAGIC or size < _PREAMBLE.size + _FOOTER.size:
+        raise ValueError("Not a disk store snapshot")
+    if version != _VERSION:
+        raise ValueError("Unsupported snapshot version {}".format(version))
+    index_offset, index_length, magic = _FOOTER.unpack(os.pread(fd, _FOOTER.size, size - _FOOTER.size))
+    if magic != _MAGIC:
+        raise ValueError("The snapshot is truncated")
+    data = zlib.decompress(os.pread(fd, index_length, index_offset))
+    index = {}
+    position = 0
+    while position < len(data):
+        key_length, offset, length, record_length, compression = _ENTRY.unpack_from(data, position)
+        position += _ENTRY.size
+        index[data[position:position + key_length].decode("utf-8")] = (offset, length, record_length, compression)
+        position += key_length
+    return index
+
+
+def _read_record(fd: int, location: Tuple[int, int, int, int]) -> bytes:
+    offset, length, record_length, compression = location
+    return default_compressor(compression).decompress(os.pread(fd, length, offset))
+
+
+def read_snapshot(filename: str) -> Iterator[Tuple[str, bytes]]:
+    """Yields the (key, record) pairs in a snapshot, in the order they were written."""
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        index = _read_index(fd)
+        for key, location in sorted(index.items(), key=lambda item: item[1][0]):
+            yield key, _read_record(fd, location)
+    finally:
+        os.close(fd)
+
+
+class SnapshotStore(simplekv.KeyValueStore):
+    """Serves reads straight from a snapshot file, for `engine="snapshot"`.
+
+    The store is read-only: puts and deletes are accepted but ignored, so a pipeline can still offer it what it
+    fetched elsewhere. The whole index is loaded up front and each get is a single pread.
+    """
+
+    def __init__(self, filename: str):
+        super().__init__()
+        self.filename = filename
+        self.root = os.path.dirname(os.path.abspath(filename))
+        self._fd = os.open(filename, os.O_RDONLY)
+        self._index = _read_index(self._fd)
+
+    def _location(self, key: str) -> Tuple[int, int, int, int]:
+        try:
+            return self._index[key]
+        except KeyError:
+            raise KeyError(key)
+
+    def _get(self, key: str) -> bytes:
+        return _read_record(self._fd, self._location(key))
+
+    def _open(self, key: str) -> io.BytesIO:
+        return io.BytesIO(self._get(key))
+
+    def size(self, key: str) -> int:
+        return self._location(key)[2]
+
+    def _has_key(self, key: str) -> bool:
+        return key in self._index
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        return (key for key in list(self._index) if key.startswith(prefix))
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return list(self.iter_keys(prefix))
+
+    def _put(self, key: str, data: bytes) -> str:
+        return key
+
+    def _put_file(self, key: str, file) -> str:
+        return key
+
+    def put_batch(self, items: Iterable[Tuple[str, bytes]], sync: bool = None) -> None:
+        pass
+
+    def _delete(self, key: str) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def main(argv: List[str] = None) -> None:
+    from . import SimpleKVDiskStore
+
+    parser = argparse.ArgumentParser(prog="python -m cassiopeia_diskstore.snapshot",
+                                     description="Exports a disk store's live records to a snapshot, or imports one into a disk store.")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="The disk store's directory")
+    parser.add_argument("snapshot", help="The snapshot file")
+    parser.add_argument("--engine", default="filesystem", choices=("filesystem", "segments"))
+    parser.add_argument("--layout", default="flat")
+    parser.add_argument("--compression", default="zlib", help="Compression for records that aren't already compressed")
+    args = parser.parse_args(argv)
+
+    store = SimpleKVDiskStore(args.path, engine=args.engine, layout=args.layout)
+    try:
+        if args.command == "export":
+            count = store.export_snapshot(args.snapshot, compression=args.compression)
+        else:
+            count = store.import_snapshot(args.snapshot)
+    finally:
+        store.close()
+    print("{}ed {} records".format(args.command.capitalize(), count))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
-from typing import Type, TypeVar, MutableMapping, Any, Iterable
+from typing import Type, TypeVar, MutableMapping, Any, Iterable, List, Optional, Callable, Tuple
 import copy
+import hashlib
 
 from datapipelines import DataSource, DataSink, PipelineContext, Query, NotFoundError, validate_query
 
@@ -15,11 +16,17 @@ from cassiopeia.dto.staticdata.language import LanguagesDto, LanguageStringsDto
 from cassiopeia.dto.staticdata.profileicon import ProfileIconDataDto
 from cassiopeia.datastores.riotapi.common import _get_default_locale, _get_latest_version
 from cassiopeia.datastores.uniquekeys import convert_region_to_platform
-from .common import SimpleKVDiskService
+from .common import SimpleKVDiskService, _decoded
 
 T = TypeVar("T")
 
 
+def _find_matching_attribute(list_of_dtos: Iterable[MutableMapping[str, Any]], attrname: str, attrvalue: Any) -> Optional[MutableMapping[str, Any]]:
+    for dto in list_of_dtos:
+        if dto.get(attrname, None) == attrvalue:
+            return copy.copy(dto)
+
+
 class StaticDataDiskService(SimpleKVDiskService):
 
     @DataSource.dispatch
@@ -38,6 +45,74 @@ class StaticDataDiskService(SimpleKVDiskService):
     def put_many(self, type: Type[T], items: Iterable[T], context: PipelineContext = None) -> None:
         pass
 
+    # Putting a list also stores each entity on its own under its id, plus a small index record per name that points at it,
+    # so single-entity gets are a direct lookup instead of a pipeline round trip and a linear scan of the list. The keys
+    # of those records are kept too, so that putting the list again deletes the ones of entities it no longer has.
+
+    @staticmethod
+    def _entity_prefix(type: Type[T], platform: str, version: str, locale: str, included_data: Optional[str]) -> List[str]:
+        return [type.__name__, platform, version, locale] + ([included_data] if included_data is not None else [])
+
+    @staticmethod
+    def _entity_key(type: Type[T], platform: str, version: str, locale: str, included_data: Optional[str], attribute: str, value: Any) -> str:
+        value = str(value)
+        if attribute == "name":
+            # Need to hash the name because it can have invalid characters.
+            value = hashlib.sha1(value.encode("utf-8")).hexdigest()
+        return ".".join(StaticDataDiskService._entity_prefix(type, platform, version, locale, included_data) + [attribute, value])
+
+    def _put_entities(self, type: Type[T], entities: Iterable[MutableMapping[str, Any]], platform: str, version: str, locale: str, included_data: Optional[str], id_attribute: str, name_attribute: str) -> None:
+        keys = set()
+        for entity in entities:
+            key = self._entity_key(type, platform, version, locale, included_data, "id", entity[id_attribute])
+            self._put(key, dict(entity), type=type)
+            keys.add(key)
+            if entity.get(name_attribute) is not None:
+                name_key = self._entity_key(type, platform, version, locale, included_data, "name", entity[name_attribute])
+                self._put(name_key, key, type=type)
+                keys.add(name_key)
+        entities_key = ".".join(self._entity_prefix(type, platform, version, locale, included_data) + ["entities"])
+        try:
+            previous = set(self._get(entities_key))
+        except NotFoundError:
+            previous = set()
+        for key in previous - keys:
+            self._delete(key)
+        self._put(entities_key, sorted(keys), type=type)
+
+    def _get_entity(self, type: Type[T], query: MutableMapping[str, Any], included_data: Optional[str]) -> MutableMapping[str, Any]:
+        attribute = "id" if "id" in query else "name"
+        key = self._entity_key(type, query["platform"].value, query["version"], query["locale"], included_data, attribute, query[attribute])
+        if attribute == "name":
+            key = self._get(key)
+        return self._get(key)
+
+    def _get_decoded(self, type: Type[T], key: str, shared_key: Tuple, wrap: Callable[[Any], Any] = None) -> T:
+        """Returns the process-wide decoded instance for `key`, reading and caching it on a miss.
+
+        `shared_key` identifies the record apart from its platform, so the "data" of the same version on another
+        platform is reused when it is equal instead of being wrapped again. The result must be treated as read-only.
+        """
+        # Another process may have cleared it, which drops the decoded copies.
+        self._invalidations.refresh()
+        item = _decoded.get(self._store, key)
+        if item is not None:
+            return item
+        data = self._get(key)
+        shared_key = (type.__name__,) + shared_key
+        shared = _decoded.get_shared(self._store, shared_key)
+        if shared is not None and shared == data["data"]:
+            data["data"] = shared
+        elif wrap is not None:
+            data["data"] = wrap(data["data"])
+        item = type(data)
+        try:
+            if self._get_header(key).expires_at == float("inf"):
+                item = _decoded.put(self._store, key, item, shared_key)
+        except KeyError:
+            pass
+        return item
+
     ############
     # Versions #
     ############
@@ -88,26 +163,26 @@ class StaticDataDiskService(SimpleKVDiskService):
     @get.register(ChampionDto)
     @validate_query(_validate_get_champion_query, convert_region_to_platform)
     def get_champion(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> ChampionDto:
-        champions_query = copy.deepcopy(query)
-        if "id" in champions_query:
-            champions_query.pop("id")
-        if "name" in champions_query:
-            champions_query.pop("name")
-        champions = context[context.Keys.PIPELINE].get(ChampionListDto, query=champions_query)
-
-        def find_matching_attribute(list_of_dtos, attrname, attrvalue):
-            for dto in list_of_dtos:
-                if dto.get(attrname, None) == attrvalue:
-                    return dto
-
-        if "id" in query:
-            champion = find_matching_attribute(champions["data"].values(), "id", query["id"])
-        elif "name" in query:
-            champion = find_matching_attribute(champions["data"].values(), "name", query["name"])
-        else:
-            raise ValueError("Impossible!")
-        if champion is None:
-            raise NotFoundError
+        included_data = "|".join(sorted(query["includedData"]))
+        try:
+            champion = self._get_entity(ChampionDto, query, included_data)
+        except NotFoundError:
+            champions_query = copy.deepcopy(query)
+            if "id" in champions_query:
+                champions_query.pop("id")
+            if "name" in champions_query:
+                champions_query.pop("name")
+            champions = context[context.Keys.PIPELINE].get(ChampionListDto, query=champions_query)
+
+            if "id" in query:
+                champion = _find_matching_attribute(champions["data"].values(), "id", query["id"])
+            elif "name" in query:
+                champion = _find_matching_attribute(champions["data"].values(), "name", query["name"])
+            else:
+                raise ValueError("Impossible!")
+            if champion is None:
+                raise NotFoundError
+            self._put_entities(ChampionDto, champions["data"].values(), query["platform"].value, query["version"], query["locale"], included_data, "id", "name")
         champion["region"] = query["platform"].region.value
         champion["version"] = query["version"]
         champion["locale"] = query["locale"]
@@ -132,9 +207,8 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                             version=version,
                                                                                             locale=locale,
                                                                                             included_data=included_data)
-        data = self._get(key)
-        data["data"] = {key: ChampionDto(champion) for key, champion in data["data"].items()}
-        return ChampionListDto(data)
+        return self._get_decoded(ChampionListDto, key, (version, locale, included_data),
+                                 lambda data: {key: ChampionDto(champion) for key, champion in data.items()})
 
     @put.register(ChampionListDto)
     def put_champion_list(self, item: ChampionListDto, context: PipelineContext = None) -> None:
@@ -146,6 +220,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                             locale=item["locale"],
                                                                                             included_data=included_data)
         self._put(key, item)
+        self._put_entities(ChampionDto, item["data"].values(), platform, item["version"], item["locale"], included_data, "id", "name")
 
     #########
     # Items #
@@ -161,26 +236,26 @@ class StaticDataDiskService(SimpleKVDiskService):
     @get.register(ItemDto)
     @validate_query(_validate_get_item_query, convert_region_to_platform)
     def get_item(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> ItemDto:
-        items_query = copy.deepcopy(query)
-        if "id" in items_query:
-            items_query.pop("id")
-        if "name" in items_query:
-            items_query.pop("name")
-        items = context[context.Keys.PIPELINE].get(ItemListDto, query=items_query)
-
-        def find_matching_attribute(list_of_dtos, attrname, attrvalue):
-            for dto in list_of_dtos:
-                if dto.get(attrname, None) == attrvalue:
-                    return dto
-
-        if "id" in query:
-            item = find_matching_attribute(items["data"].values(), "id", query["id"])
-        elif "name" in query:
-            item = find_matching_attribute(items["data"].values(), "name", query["name"])
-        else:
-            raise ValueError("Impossible!")
-        if item is None:
-            raise NotFoundError
+        included_data = "|".join(sorted(query["includedData"]))
+        try:
+            item = self._get_entity(ItemDto, query, included_data)
+        except NotFoundError:
+            items_query = copy.deepcopy(query)
+            if "id" in items_query:
+                items_query.pop("id")
+            if "name" in items_query:
+                items_query.pop("name")
+            items = context[context.Keys.PIPELINE].get(ItemListDto, query=items_query)
+
+            if "id" in query:
+                item = _find_matching_attribute(items["data"].values(), "id", query["id"])
+            elif "name" in query:
+                item = _find_matching_attribute(items["data"].values(), "name", query["name"])
+            else:
+                raise ValueError("Impossible!")
+            if item is None:
+                raise NotFoundError
+            self._put_entities(ItemDto, items["data"].values(), query["platform"].value, query["version"], query["locale"], included_data, "id", "name")
         item["region"] = query["platform"].region.value
         item["version"] = query["version"]
         item["locale"] = query["locale"]
@@ -205,11 +280,8 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                version=version,
                                                                                locale=locale,
                                                                                included_data=included_data)
-        data = self._get(key)
-        for key, item in data["data"].items():
-            item = ItemDto(item)
-            data["data"][key] = item
-        return ItemListDto(data)
+        return self._get_decoded(ItemListDto, key, (version, locale, included_data),
+                                 lambda data: {key: ItemDto(item) for key, item in data.items()})
 
     @put.register(ItemListDto)
     def put_item_list(self, item: ItemListDto, context: PipelineContext = None) -> None:
@@ -221,6 +293,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                locale=item["locale"],
                                                                                included_data=included_data)
         self._put(key, item)
+        self._put_entities(ItemDto, item["data"].values(), platform, item["version"], item["locale"], included_data, "id", "name")
 
     ##################
     # SummonerSpells #
@@ -236,26 +309,26 @@ class StaticDataDiskService(SimpleKVDiskService):
     @get.register(SummonerSpellDto)
     @validate_query(_validate_get_summoner_spell_query, convert_region_to_platform)
     def get_summoner_spell(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> SummonerSpellDto:
-        summoner_spells_query = copy.deepcopy(query)
-        if "id" in summoner_spells_query:
-            summoner_spells_query.pop("id")
-        if "name" in summoner_spells_query:
-            summoner_spells_query.pop("name")
-        summoner_spells = context[context.Keys.PIPELINE].get(SummonerSpellListDto, query=summoner_spells_query)
-
-        def find_matching_attribute(list_of_dtos, attrname, attrvalue):
-            for dto in list_of_dtos:
-                if dto.get(attrname, None) == attrvalue:
-                    return dto
-
-        if "id" in query:
-            summoner_spell = find_matching_attribute(summoner_spells["data"].values(), "id", query["id"])
-        elif "name" in query:
-            summoner_spell = find_matching_attribute(summoner_spells["data"].values(), "name", query["name"])
-        else:
-            raise ValueError("Impossible!")
-        if summoner_spell is None:
-            raise NotFoundError
+        included_data = "|".join(sorted(query["includedData"]))
+        try:
+            summoner_spell = self._get_entity(SummonerSpellDto, query, included_data)
+        except NotFoundError:
+            summoner_spells_query = copy.deepcopy(query)
+            if "id" in summoner_spells_query:
+                summoner_spells_query.pop("id")
+            if "name" in summoner_spells_query:
+                summoner_spells_query.pop("name")
+            summoner_spells = context[context.Keys.PIPELINE].get(SummonerSpellListDto, query=summoner_spells_query)
+
+            if "id" in query:
+                summoner_spell = _find_matching_attribute(summoner_spells["data"].values(), "id", query["id"])
+            elif "name" in query:
+                summoner_spell = _find_matching_attribute(summoner_spells["data"].values(), "name", query["name"])
+            else:
+                raise ValueError("Impossible!")
+            if summoner_spell is None:
+                raise NotFoundError
+            self._put_entities(SummonerSpellDto, summoner_spells["data"].values(), query["platform"].value, query["version"], query["locale"], included_data, "id", "name")
         summoner_spell["region"] = query["platform"].region.value
         summoner_spell["version"] = query["version"]
         summoner_spell["locale"] = query["locale"]
@@ -280,7 +353,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                version=version,
                                                                                locale=locale,
                                                                                included_data=included_data)
-        return SummonerSpellListDto(self._get(key))
+        return self._get_decoded(SummonerSpellListDto, key, (version, locale, included_data))
 
     @put.register(SummonerSpellListDto)
     def put_summoner_spell_list(self, item: SummonerSpellListDto, context: PipelineContext = None) -> None:
@@ -292,6 +365,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                                locale=item["locale"],
                                                                                included_data=included_data)
         self._put(key, item)
+        self._put_entities(SummonerSpellDto, item["data"].values(), platform, item["version"], item["locale"], included_data, "id", "name")
 
     ########
     # Maps #
@@ -306,26 +380,26 @@ class StaticDataDiskService(SimpleKVDiskService):
     @get.register(MapDto)
     @validate_query(_validate_get_map_query, convert_region_to_platform)
     def get_map(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> MapDto:
-        maps_query = copy.deepcopy(query)
-        if "id" in maps_query:
-            maps_query.pop("id")
-        if "name" in maps_query:
-            maps_query.pop("name")
-        maps = context[context.Keys.PIPELINE].get(MapListDto, query=maps_query)
-
-        def find_matching_attribute(list_of_dtos, attrname, attrvalue):
-            for dto in list_of_dtos:
-                if dto.get(attrname, None) == attrvalue:
-                    return dto
-
-        if "id" in query:
-            map = find_matching_attribute(maps["data"].values(), "mapId", str(query["id"]))
-        elif "name" in query:
-            map = find_matching_attribute(maps["data"].values(), "mapName", query["name"])
-        else:
-            raise ValueError("Impossible!")
-        if map is None:
-            raise NotFoundError
+        included_data = None
+        try:
+            map = self._get_entity(MapDto, query, included_data)
+        except NotFoundError:
+            maps_query = copy.deepcopy(query)
+            if "id" in maps_query:
+                maps_query.pop("id")
+            if "name" in maps_query:
+                maps_query.pop("name")
+            maps = context[context.Keys.PIPELINE].get(MapListDto, query=maps_query)
+
+            if "id" in query:
+                map = _find_matching_attribute(maps["data"].values(), "mapId", str(query["id"]))
+            elif "name" in query:
+                map = _find_matching_attribute(maps["data"].values(), "mapName", query["name"])
+            else:
+                raise ValueError("Impossible!")
+            if map is None:
+                raise NotFoundError
+            self._put_entities(MapDto, maps["data"].values(), query["platform"].value, query["version"], query["locale"], included_data, "mapId", "mapName")
         map["region"] = query["platform"].region.value
         map["version"] = query["version"]
         map["locale"] = query["locale"]
@@ -346,7 +420,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                platform=platform,
                                                                version=version,
                                                                locale=locale)
-        return MapListDto(self._get(key))
+        return self._get_decoded(MapListDto, key, (version, locale))
 
     @put.register(MapListDto)
     def put_map_list(self, item: MapListDto, context: PipelineContext = None) -> None:
@@ -356,6 +430,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                version=item["version"],
                                                                locale=item["locale"])
         self._put(key, item)
+        self._put_entities(MapDto, item["data"].values(), platform, item["version"], item["locale"], None, "mapId", "mapName")
 
     #################
     # Profile Icons #
@@ -376,7 +451,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                platform=platform,
                                                                version=version,
                                                                locale=locale)
-        return ProfileIconDataDto(self._get(key))
+        return self._get_decoded(ProfileIconDataDto, key, (version, locale))
 
     @put.register(ProfileIconDataDto)
     def put_profile_icons(self, item: ProfileIconDataDto, context: PipelineContext = None) -> None:
@@ -429,7 +504,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                platform=platform,
                                                                version=version,
                                                                locale=locale)
-        return LanguageStringsDto(self._get(key))
+        return self._get_decoded(LanguageStringsDto, key, (version, locale))
 
     _validate_get_many_language_strings_query = Query. \
         has("platforms").as_(Iterable).also. \
@@ -459,26 +534,26 @@ class StaticDataDiskService(SimpleKVDiskService):
     @get.register(RuneDto)
     @validate_query(_validate_get_rune_query, convert_region_to_platform)
     def get_rune(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> RuneDto:
-        runes_query = copy.deepcopy(query)
-        if "id" in runes_query:
-            runes_query.pop("id")
-        if "name" in runes_query:
-            runes_query.pop("name")
-        runes = context[context.Keys.PIPELINE].get(RuneListDto, query=runes_query)
-
-        def find_matching_attribute(list_of_dtos, attrname, attrvalue):
-            for dto in list_of_dtos:
-                if dto.get(attrname, None) == attrvalue:
-                    return dto
-
-        if "id" in query:
-            rune = find_matching_attribute(runes["data"], "runeId", str(query["id"]))
-        elif "name" in query:
-            rune = find_matching_attribute(runes["data"], "runeName", query["name"])
-        else:
-            raise ValueError("Impossible!")
-        if rune is None:
-            raise NotFoundError
+        included_data = None
+        try:
+            rune = self._get_entity(RuneDto, query, included_data)
+        except NotFoundError:
+            runes_query = copy.deepcopy(query)
+            if "id" in runes_query:
+                runes_query.pop("id")
+            if "name" in runes_query:
+                runes_query.pop("name")
+            runes = context[context.Keys.PIPELINE].get(RuneListDto, query=runes_query)
+
+            if "id" in query:
+                rune = _find_matching_attribute(runes["data"], "runeId", str(query["id"]))
+            elif "name" in query:
+                rune = _find_matching_attribute(runes["data"], "runeName", query["name"])
+            else:
+                raise ValueError("Impossible!")
+            if rune is None:
+                raise NotFoundError
+            self._put_entities(RuneDto, runes["data"], query["platform"].value, query["version"], query["locale"], included_data, "runeId", "runeName")
         rune["region"] = query["platform"].region.value
         rune["version"] = query["version"]
         rune["locale"] = query["locale"]
@@ -499,7 +574,7 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                platform=platform,
                                                                version=version,
                                                                locale=locale)
-        return RuneListDto(self._get(key))
+        return self._get_decoded(RuneListDto, key, (version, locale))
 
     @put.register(RuneListDto)
     def put_rune_list(self, item: RuneListDto, context: PipelineContext = None) -> None:
@@ -509,3 +584,4 @@ class StaticDataDiskService(SimpleKVDiskService):
                                                                version=item["version"],
                                                                locale=item["locale"])
         self._put(key, item)
+        self._put_entities(RuneDto, item["data"], platform, item["version"], item["locale"], None, "runeId", "runeName")
@@ -1,4 +1,5 @@
-from typing import Type, TypeVar, MutableMapping, Any, Iterable
+from typing import Type, TypeVar, MutableMapping, Any, Iterable, Generator, Optional
+import hashlib
 
 from datapipelines import DataSource, DataSink, PipelineContext, Query, NotFoundError, validate_query
 
@@ -38,44 +39,76 @@ class SummonerDiskService(SimpleKVDiskService):
         or_("name").as_(str).also. \
         has("platform").as_(Platform)
 
+    # Summoners are stored once under their id. The other identifiers are small index records that
+    # point at that key, so every lookup is a direct get no matter how large the store grows.
+    _summoner_identifiers = ("id", "accountId", "puuid", "name")
+
+    @staticmethod
+    def _summoner_key(platform: str, identifier: str, value: str) -> str:
+        if identifier == "name":
+            # Need to hash the name because it can have invalid characters.
+            value = hashlib.sha1(value.replace(" ", "").lower().encode("utf-8")).hexdigest()
+        return "{clsname}.{platform}.{identifier}.{value}".format(clsname=SummonerDto.__name__,
+                                                                  platform=platform,
+                                                                  identifier=identifier,
+                                                                  value=value)
+
+    def _get_summoner(self, platform: str, identifier: str, value: str) -> SummonerDto:
+        key = self._summoner_key(platform, identifier, value)
+        if identifier == "id":
+            return SummonerDto(self._get(key))
+
+        summoner_key = self._get(key)
+        try:
+            dto = SummonerDto(self._get(summoner_key))
+        except NotFoundError:
+            self._delete(key)
+            raise
+        if self._summoner_key(platform, identifier, dto[identifier]) != key:
+            # The summoner changed since this index record was written (e.g. a name change).
+            self._delete(key)
+            raise NotFoundError
+        return dto
+
     @get.register(SummonerDto)
     @validate_query(_validate_get_summoner_query, convert_region_to_platform)
     def get_summoner(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> SummonerDto:
-        platform_str  = query["platform"].value
-        summoner_name = query.get("name", "").replace(" ", "").lower()
-        # Need to hash the name because it can have invalid characters.
-        summoner_name = str(summoner_name.encode("utf-8"))
-        for key in self._store:
-            if key.startswith("SummonerDto."):
-                _, platform, id_, account_id, puuid, name = key.split(".")
-                if platform == platform_str and any([
-                    str(query.get("id", None)).startswith(id_),
-                    str(query.get("account_id", None)).startswith(account_id),
-                    str(query.get("puuid", None)).startswith(puuid),
-                    name == summoner_name
-                ]):
-                    dto = SummonerDto(self._get(key))
-                    dto_name = dto["name"].replace(" ", "").lower()
-                    dto_name = str(dto_name.encode("utf-8"))
-                    if any([
-                        dto["id"] == str(query.get("id", None)),
-                        dto["accountId"] == str(query.get("account_id", None)),
-                        dto["puuid"] == str(query.get("puuid", None)),
-                        dto_name == summoner_name
-                    ]):
-                        return dto
-        else:
+        identifier = next(identifier for identifier in self._summoner_identifiers if identifier in query)
+        return self._get_summoner(query["platform"].value, identifier, query[identifier])
+
+    _validate_get_many_summoner_query = Query. \
+        has("ids").as_(Iterable). \
+        or_("accountIds").as_(Iterable). \
+        or_("puuids").as_(Iterable). \
+        or_("names").as_(Iterable).also. \
+        has("platform").as_(Platform)
+
+    @get_many.register(SummonerDto)
+    @validate_query(_validate_get_many_summoner_query, convert_region_to_platform)
+    def get_many_summoner(self, query: MutableMapping[str, Any], context: PipelineContext = None) -> Generator[SummonerDto, None, None]:
+        platform = query["platform"].value
+        identifier = next(identifier for identifier in self._summoner_identifiers if identifier + "s" in query)
+
+        def get_summoner(value: str) -> Optional[SummonerDto]:
+            try:
+                return self._get_summoner(platform, identifier, value)
+            except NotFoundError:
+                return None
+
+        # Summoners are small, so resolve them all up front; that also lets us raise before returning if one is missing.
+        summoners = self._run_many(get_summoner, query[identifier + "s"])
+        if any(summoner is None for summoner in summoners):
             raise NotFoundError
+        return (summoner for summoner in summoners)
 
     @put.register(SummonerDto)
     def put_summoner(self, item: SummonerDto, context: PipelineContext = None) -> None:
         platform = Region(item["region"]).platform.value
-        name = item["name"].replace(" ", "").lower()
-        name = name.encode("utf-8")
-        key = "{clsname}.{platform}.{id}.{account_id}.{puuid}.{name}".format(clsname=SummonerDto.__name__,
-                                                                     platform=platform,
-                                                                     id=item["id"][:8],
-                                                                     account_id=item["accountId"][:8],
-                                                                     puuid=item["puuid"][:8],
-                                                                     name=name)
-        self._put(key, item)
+        summoner_key = self._summoner_key(platform, "id", item["id"])
+        self._put(summoner_key, item)
+        for identifier in self._summoner_identifiers[1:]:
+            self._put(self._summoner_key(platform, identifier, item[identifier]), summoner_key, type=SummonerDto)
+
+    @put_many.register(SummonerDto)
+    def put_many_summoner(self, items: Iterable[SummonerDto], context: PipelineContext = None) -> None:
+        self._run_many(self.put_summoner, items)
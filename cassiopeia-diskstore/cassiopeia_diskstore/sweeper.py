@@ -0,0 +1,72 @@
+import datetime
+import heapq
+import threading
+from typing import List, Optional, Tuple
+
+
+class ExpirySweeper(object):
+    """Deletes expired records in the background, in expiry order, instead of waiting for a read or `expire()`.
+
+    Records are tracked in a heap keyed by their expiry time. The heap is seeded by scanning the record headers
+    once when the sweeper starts and is kept up to date by every put. Records that never expire are not tracked.
+    Deletes are limited to `max_deletes_per_second` so sweeping doesn't compete with foreground I/O; 0 or None means
+    no limit.
+    """
+
+    def __init__(self, max_deletes_per_second: Optional[float] = 100.0, max_sleep: float = 60.0):
+        self.max_deletes_per_second = max_deletes_per_second
+        self.max_sleep = max_sleep
+        self._heap = []  # type: List[Tuple[float, str]]
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._service = None
+
+    def schedule(self, key: str, expires_at: float) -> None:
+        if expires_at == float("inf"):
+            return
+        with self._condition:
+            heapq.heappush(self._heap, (expires_at, key))
+            if self._heap[0][1] == key:
+                self._condition.notify()
+
+    def start(self, service: "SimpleKVDiskService") -> None:
+        if self._thread is not None:
+            return
+        self._service = service
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="cassiopeia-diskstore-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+
+    def _seed(self) -> None:
+        for key in self._service._store.iter_keys():
+            if self._stopped.is_set():
+                return
+            try:
+                self.schedule(key, self._service._get_header(key).expires_at)
+            except KeyError:
+                pass
+
+    def _run(self) -> None:
+        self._seed()
+        while not self._stopped.is_set():
+            with self._condition:
+                now = datetime.datetime.now().timestamp()
+                if not self._heap or self._heap[0][0] > now:
+                    timeout = self.max_sleep if not self._heap else min(self.max_sleep, self._heap[0][0] - now)
+                    self._condition.wait(timeout)
+                    continue
+                expires_at, key = heapq.heappop(self._heap)
+            # The record may have been rewritten with a later expiry since it was scheduled, so check its header again.
+            self._service._expire_key(key, datetime.datetime.now().timestamp())
+            if self.max_deletes_per_second:
+                self._stopped.wait(1.0 / self.max_deletes_per_second)
@@ -0,0 +1,155 @@
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+from cassiopeia.dto.match import TimelineDto
+
+from .lazy import LazyDto
+
+# Marks a record holding a timeline in columns rather than as the TimelineDto itself.
+_COLUMNAR = "__columnar__"
+
+
+# Signed typecodes from narrowest to widest, with the range each holds.
+_INT_TYPECODES = [(typecode, -2 ** (8 * array(typecode).itemsize - 1), 2 ** (8 * array(typecode).itemsize - 1) - 1) for typecode in "bhiq"]
+
+
+def _column(values: List[Any]) -> List:
+    # Ints and floats become the narrowest typed array that holds them (stored as its raw bytes), anything else a plain list.
+    if values and all(type(value) is int for value in values):
+        low, high = min(values), max(values)
+        for typecode, minimum, maximum in _INT_TYPECODES:
+            if minimum <= low and high <= maximum:
+                return [typecode, array(typecode, values).tobytes()]
+    elif values and all(type(value) is float for value in values):
+        return ["d", array("d", values).tobytes()]
+    return ["", values]
+
+
+def _values(column: List, byteorder: str) -> Sequence:
+    typecode, data = column
+    if not typecode:
+        return data
+    values = array(typecode)
+    values.frombytes(data)
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+
+def _encode_table(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turns a list of dicts into one column per key. Dict values become nested tables, e.g. position -> x, y."""
+    keys = {}
+    for row in rows:
+        for key in row:
+            keys.setdefault(key, None)
+    columns = {}
+    for key in keys:
+        indices = [index for index, row in enumerate(rows) if key in row]
+        values = [rows[index][key] for index in indices]
+        # Only keys missing from some rows need to record which rows have them.
+        column = {"rows": _column(indices) if len(indices) < len(rows) else None}
+        if all(type(value) is dict for value in values):
+            column["table"] = _encode_table(values)
+        else:
+            column["values"] = _column(values)
+        columns[key] = column
+    return {"length": len(rows), "columns": columns}
+
+
+def _decode_table(table: Dict[str, Any], byteorder: str) -> List[Dict[str, Any]]:
+    rows = [{} for _ in range(table["length"])]
+    for key, column in table["columns"].items():
+        if "table" in column:
+            values = _decode_table(column["table"], byteorder)
+        else:
+            values = _values(column["values"], byteorder)
+        if column["rows"] is None:
+            for row, value in zip(rows, values):
+                row[key] = value
+        else:
+            for index, value in zip(_values(column["rows"], byteorder), values):
+                rows[index][key] = value
+    return rows
+
+
+def encode_timeline(item: TimelineDto) -> Dict[str, Any]:
+    """Returns the columnar form of a timeline, or the timeline itself if its frames aren't regular enough.
+
+    Each frame's participant frames are flattened into one table in frame order and then participant order, so
+    `column("participantFrames", "totalGold")[frame * len(participants) + participant]` is one participant's gold.
+    """
+    frames = item.get("frames")
+    if not isinstance(frames, list) or not frames:
+        return item
+    participants = None
+    for frame in frames:
+        if not isinstance(frame.get("participantFrames"), dict) or not isinstance(frame.get("events"), list):
+            return item
+        if participants is None:
+            participants = list(frame["participantFrames"])
+        elif list(frame["participantFrames"]) != participants:
+            return item
+    return {
+        _COLUMNAR: 1,
+        "byteorder": sys.byteorder,
+        "fields": {key: value for key, value in item.items() if key != "frames"},
+        "participants": participants,
+        "frames": _encode_table([{key: value for key, value in frame.items() if key not in ("participantFrames", "events")} for frame in frames]),
+        "participantFrames": _encode_table([frame["participantFrames"][participant] for frame in frames for participant in participants]),
+        "eventCounts": _column([len(frame["events"]) for frame in frames]),
+        "events": _encode_table([event for frame in frames for event in frame["events"]])
+    }
+
+
+def decode_timeline(data: Dict[str, Any]) -> TimelineDto:
+    """Wraps what `encode_timeline` returned: a LazyTimelineDto for the columnar form, otherwise a TimelineDto."""
+    if _COLUMNAR in data:
+        return LazyTimelineDto(data)
+    return TimelineDto(data)
+
+
+class LazyTimelineDto(LazyDto, TimelineDto):
+    """A TimelineDto read from columns. Its frames are only rebuilt when its items are first used, while `column`
+    hands out the typed arrays directly, e.g. for gold and xp curves."""
+
+    def __init__(self, columns: Dict[str, Any]):
+        super().__init__()
+        self._columns = columns
+
+    @property
+    def participants(self) -> List[str]:
+        return self._columns["participants"]
+
+    def column(self, table: str, *path: str) -> Sequence:
+        """Returns the values of a column of the "frames", "participantFrames" or "events" table, e.g.
+        `column("participantFrames", "position", "x")`. Values of keys that some rows lack only cover the rows in `rows`."""
+        column = {"table": self._columns[table]}
+        for key in path:
+            column = column["table"]["columns"][key]
+        return _values(column["values"], self._columns["byteorder"])
+
+    def rows(self, table: str, *path: str) -> Optional[Sequence]:
+        """Returns which rows have the column at `path`, or None if all of them do."""
+        column = {"table": self._columns[table]}
+        for key in path:
+            column = column["table"]["columns"][key]
+        return _values(column["rows"], self._columns["byteorder"]) if column["rows"] is not None else None
+
+    @property
+    def event_counts(self) -> Sequence:
+        return _values(self._columns["eventCounts"], self._columns["byteorder"])
+
+    def _build(self) -> Dict[str, Any]:
+        columns = self._columns
+        byteorder = columns["byteorder"]
+        frames = _decode_table(columns["frames"], byteorder)
+        participants = columns["participants"]
+        participant_frames = iter(_decode_table(columns["participantFrames"], byteorder))
+        events = iter(_decode_table(columns["events"], byteorder))
+        for frame, count in zip(frames, _values(columns["eventCounts"], byteorder)):
+            frame["participantFrames"] = {participant: next(participant_frames) for participant in participants}
+            frame["events"] = [next(events) for _ in range(count)]
+        item = dict(columns["fields"])
+        item["frames"] = frames
+        return item
@@ -0,0 +1,124 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import simplekv
+
+from .locking import StripedLock, _unlocked
+
+
+class WriteBehindQueue(object):
+    """Moves record writes off the calling thread onto a background writer.
+
+    Puts only encode the record and queue it; the writer drains the queue in batches of up to `batch_size` records,
+    writing each batch with one round of syncs when `fsync` is set. A key that is put again before it's written is
+    only written once, with its newest record. At most `max_pending` records wait at a time, after which puts block
+    until the writer catches up. Queued records are visible to reads, and deleting a key drops its queued record.
+    """
+
+    def __init__(self, max_pending: int = 10000, batch_size: int = 256, fsync: bool = False):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()  # type: OrderedDict[str, bytes]
+        self._writing = {}  # type: Dict[str, bytes]
+        self._error = None  # type: Optional[BaseException]
+        self._stopped = threading.Event()
+        self._thread = None
+        self._store = None
+        self._locks = None
+
+    def start(self, store: simplekv.KeyValueStore, locks: StripedLock = None) -> None:
+        if self._thread is not None:
+            return
+        self._store = store
+        self._locks = locks
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="cassiopeia-diskstore-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self.flush()
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def put(self, key: str, record: bytes) -> None:
+        with self._condition:
+            self._raise_error()
+            if key not in self._pending:
+                while len(self._pending) >= self.max_pending:
+                    self._condition.wait()
+                    self._raise_error()
+            self._pending[key] = record
+            self._condition.notify_all()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._condition:
+            record = self._pending.get(key)
+            return record if record is not None else self._writing.get(key)
+
+    def delete(self, key: str) -> None:
+        """Drops `key`'s queued record and waits out a batch that is writing it, so a delete can't be undone by it."""
+        with self._condition:
+            self._pending.pop(key, None)
+            while key in self._writing:
+                self._condition.wait()
+
+    def clear(self, prefix: str = "") -> List[str]:
+        """Drops the queued records whose keys start with `prefix` and returns their keys."""
+        with self._condition:
+            keys = [key for key in self._pending if key.startswith(prefix)]
+            for key in keys:
+                del self._pending[key]
+            while any(key.startswith(prefix) for key in self._writing):
+                self._condition.wait()
+            return keys
+
+    def flush(self) -> None:
+        """Blocks until every record queued so far has been written."""
+        with self._condition:
+            while (self._pending or self._writing) and self._error is None and self._thread is not None:
+                self._condition.wait()
+            self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped.is_set():
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                keys = list(itertools.islice(self._pending, self.batch_size))
+            # Lock the batch's keys before claiming its records, so whoever holds one of them never waits on this batch.
+            with self._locks.hold(*keys) if self._locks is not None else _unlocked:
+                with self._condition:
+                    for key in keys:
+                        record = self._pending.pop(key, None)
+                        if record is not None:
+                            self._writing[key] = record
+                    self._condition.notify_all()
+                try:
+                    if hasattr(self._store, "put_batch"):
+                        self._store.put_batch(self._writing.items(), sync=self.fsync)
+                    else:
+                        for key, record in self._writing.items():
+                            self._store.put(key, record)
+                except Exception as error:
+                    # Surfaced to the next put or flush; the failed batch is dropped like any other cache write.
+                    with self._condition:
+                        self._error = error
+            with self._condition:
+                self._writing = {}
+                self._condition.notify_all()
@@ -7,6 +7,13 @@ install_requires = [
     "simplekv"
 ]
 
+extras_require = {
+    "lz4": ["lz4"],
+    "zstd": ["zstandard"],
+    "msgpack": ["msgpack"],
+    "json": ["orjson"]
+}
+
 setup(
     name="cassiopeia-diskstore",
     version="1.1.3",
@@ -26,5 +33,6 @@ setup(
     packages=find_packages(),
     zip_safe=True,
     install_requires=install_requires,
+    extras_require=extras_require,
     include_package_data=True
 )
@@ -0,0 +1,10 @@
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+
+
+def match(i, platform="NA1"):
+    return MatchDto({"platformId": platform, "gameId": i, "gameDuration": 1000 + i, "participants": [], "participantIdentities": []})
+
+
+def summoner(i):
+    return SummonerDto({"region": "NA", "id": "sid{}".format(i), "accountId": "acc{}".format(i), "puuid": "puuid{}".format(i), "name": "Name {}".format(i), "summonerLevel": i})
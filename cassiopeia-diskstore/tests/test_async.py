@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), io_threads=4, max_in_flight=2)
+    yield store
+    store.close()
+
+
+def test_async_calls_round_trip(store):
+    async def main():
+        await store.aput(MatchDto, match(1))
+        await store.aput_many(MatchDto, [match(i) for i in range(2, 12)])
+        one = await store.aget(MatchDto, {"platform": "NA1", "id": 1})
+        many = await store.aget_many(MatchDto, {"platform": "NA1", "ids": [11, 2, 7]})
+        return one, many
+
+    one, many = asyncio.run(main())
+    assert one["gameDuration"] == 1001
+    assert [dto["gameId"] for dto in many] == [11, 2, 7]
+
+
+def test_async_misses_raise(store):
+    with pytest.raises(NotFoundError):
+        asyncio.run(store.aget(MatchDto, {"platform": "NA1", "id": 1}))
+
+
+def test_the_event_loop_keeps_running_during_calls(store, monkeypatch):
+    get = store.get
+    monkeypatch.setattr(store, "get", lambda *args: time.sleep(0.2) or get(*args))
+    store.put(MatchDto, match(1))
+    ticks = []
+
+    async def tick():
+        while True:
+            ticks.append(None)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        ticker = asyncio.ensure_future(tick())
+        await store.aget(MatchDto, {"platform": "NA1", "id": 1})
+        ticker.cancel()
+
+    asyncio.run(main())
+    assert len(ticks) > 5
+
+
+def test_at_most_max_in_flight_calls_run_at_once(store, monkeypatch):
+    lock = threading.Lock()
+    running = [0, 0]  # Now, and the most at once.
+    get = store.get
+
+    def slow_get(*args):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return get(*args)
+
+    monkeypatch.setattr(store, "get", slow_get)
+    store.put_many(MatchDto, [match(i) for i in range(8)])
+
+    async def main():
+        return await asyncio.gather(*(store.aget(MatchDto, {"platform": "NA1", "id": i}) for i in range(8)))
+
+    assert [dto["gameId"] for dto in asyncio.run(main())] == list(range(8))
+    assert running[1] == 2
@@ -0,0 +1,32 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location("bench", os.path.join(os.path.dirname(__file__), "..", "benchmarks", "bench.py"))
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+def test_a_small_run_writes_and_compares_its_results(tmp_path, capsys):
+    output = str(tmp_path / "results.json")
+    arguments = ["--keys", "5e1", "--reads", "20", "--frames", "3", "--champions", "5", "--path", str(tmp_path / "store"), "--output", output]
+    bench.main(arguments)
+    with open(output) as f:
+        results = json.load(f)["results"]
+    assert results["put_match"]["operations"] == 50 and results["put_timeline"]["operations"] == 5
+    assert results["get_match"]["operations"] == 20 and "misses" not in results["get_match"]
+    assert results["get_match_miss"]["misses"] == 20
+    for identifier in ("id", "accountId", "puuid", "name"):
+        assert "misses" not in results["get_summoner_by_" + identifier]
+    assert "misses" not in results["get_champion_by_name"]
+    capsys.readouterr()
+
+    bench.main(arguments[:-2] + ["--compare", output])
+    assert "put_match" in capsys.readouterr().out
+
+
+def test_counts_must_be_numbers():
+    with pytest.raises(SystemExit):
+        bench.main(["--keys", "many"])
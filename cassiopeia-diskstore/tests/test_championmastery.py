@@ -0,0 +1,48 @@
+import pytest
+from cassiopeia.dto.championmastery import ChampionMasteryDto, ChampionMasteryListDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+_POINTS = {1: 500, 2: 9000, 3: 120, 4: 7000}
+
+
+def _masteries():
+    return ChampionMasteryListDto({"region": "NA", "summonerId": "sid1", "masteries": [
+        {"championId": champion, "championPoints": points, "summonerId": "sid1"} for champion, points in _POINTS.items()
+    ]})
+
+
+def _top(store, count):
+    return [mastery["championId"] for mastery in store.get_many(ChampionMasteryDto, {"platform": "NA1", "summonerId": "sid1", "top": count})]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_top_champions_are_ordered_by_points(store):
+    store.put(ChampionMasteryListDto, _masteries())
+    assert _top(store, 2) == [2, 4]
+    assert _top(store, 10) == [2, 4, 1, 3]
+    assert store.get(ChampionMasteryDto, {"platform": "NA1", "summoner.id": "sid1", "champion.id": 3})["championPoints"] == 120
+
+
+def test_masteries_can_be_looked_up_by_champion_ids(store):
+    store.put(ChampionMasteryListDto, _masteries())
+    masteries = store.get_many(ChampionMasteryDto, {"platform": "NA1", "summonerId": "sid1", "championIds": [4, 1]})
+    assert [mastery["championPoints"] for mastery in masteries] == [7000, 500]
+
+
+def test_putting_one_mastery_drops_the_stale_top_champions(store):
+    store.put(ChampionMasteryListDto, _masteries())
+    store.put(ChampionMasteryDto, ChampionMasteryDto({"region": "NA", "summonerId": "sid1", "championId": 3, "championPoints": 20000}))
+    with pytest.raises(NotFoundError):
+        _top(store, 2)
+    assert store.get(ChampionMasteryDto, {"platform": "NA1", "summoner.id": "sid1", "champion.id": 3})["championPoints"] == 20000
+    # Putting the whole list again brings them back.
+    store.put(ChampionMasteryListDto, _masteries())
+    assert _top(store, 1) == [2]
@@ -0,0 +1,60 @@
+import threading
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.compression import get_compressor
+
+from conftest import match
+
+
+def _compressor(config):
+    try:
+        return get_compressor(config)
+    except ImportError as error:
+        pytest.skip(str(error))
+
+
+@pytest.mark.parametrize("config", ["none", "zlib", {"codec": "zlib", "level": 9}, "lz4", "zstd", {"codec": "zstd", "level": 19}])
+def test_records_round_trip_through_each_codec(tmp_path, config):
+    _compressor(config)
+    store = SimpleKVDiskStore(str(tmp_path), compression={MatchDto: config})
+    try:
+        for i in range(10):
+            store.put(MatchDto, match(i))
+    finally:
+        store.close()
+    # Reading them back doesn't depend on the current configuration, since each record names its codec.
+    store = SimpleKVDiskStore(str(tmp_path))
+    try:
+        for i in range(10):
+            assert store.get(MatchDto, {"platform": "NA1", "id": i})["gameDuration"] == 1000 + i
+    finally:
+        store.close()
+
+
+def test_unknown_codecs_are_refused():
+    with pytest.raises(ValueError):
+        get_compressor("snappy")
+
+
+@pytest.mark.parametrize("codec", ["zlib", "lz4", "zstd"])
+def test_one_compressor_can_be_used_by_several_threads(codec):
+    compressor = _compressor(codec)
+    payloads = [str(list(range(i, i + 2000))).encode() for i in range(8)]
+    errors = []
+
+    def work(payload):
+        try:
+            for _ in range(50):
+                assert compressor.decompress(compressor.compress(payload)) == payload
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=work, args=(payload,)) for payload in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
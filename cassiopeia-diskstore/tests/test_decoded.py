@@ -0,0 +1,56 @@
+from cassiopeia.dto.staticdata import ChampionListDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+
+def _champions(region, names=("Annie", "Ahri")):
+    return ChampionListDto({"region": region, "version": "10.1.1", "locale": "en_US", "includedData": {"all"},
+                            "data": {name: {"id": i, "name": name} for i, name in enumerate(names)}})
+
+
+def _query(platform):
+    return {"platform": platform, "version": "10.1.1", "locale": "en_US", "includedData": {"all"}}
+
+
+def test_static_data_is_decoded_once_and_shared_across_platforms(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path))
+    try:
+        store.put(ChampionListDto, _champions("NA"))
+        store.put(ChampionListDto, _champions("EUW"))
+        store.put(ChampionListDto, _champions("KR", names=("Zed",)))
+        na = store.get(ChampionListDto, _query("NA1"))
+        assert store.get(ChampionListDto, _query("NA1")) is na
+        euw = store.get(ChampionListDto, _query("EUW1"))
+        assert euw is not na and euw["region"] == "EUW" and euw["data"] is na["data"]
+        kr = store.get(ChampionListDto, _query("KR"))
+        assert list(kr["data"]) == ["Zed"] and kr["data"] is not na["data"]
+
+        # Putting new data replaces the decoded copy.
+        store.put(ChampionListDto, _champions("NA", names=("Lux",)))
+        assert list(store.get(ChampionListDto, _query("NA1"))["data"]) == ["Lux"]
+        assert store.get(ChampionListDto, _query("EUW1")) is euw
+    finally:
+        store.close()
+
+
+def test_static_data_that_expires_is_not_shared(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={ChampionListDto: 3600})
+    try:
+        store.put(ChampionListDto, _champions("NA"))
+        first = store.get(ChampionListDto, _query("NA1"))
+        assert store.get(ChampionListDto, _query("NA1")) is not first
+    finally:
+        store.close()
+
+
+def test_stores_on_other_directories_do_not_share(tmp_path):
+    first = SimpleKVDiskStore(str(tmp_path / "first"))
+    second = SimpleKVDiskStore(str(tmp_path / "second"))
+    try:
+        first.put(ChampionListDto, _champions("NA"))
+        second.put(ChampionListDto, _champions("NA", names=("Zed",)))
+        assert list(first.get(ChampionListDto, _query("NA1"))["data"]) == ["Annie", "Ahri"]
+        assert list(second.get(ChampionListDto, _query("NA1"))["data"]) == ["Zed"]
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+
+from cassiopeia.dto.staticdata import ChampionListDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.common import _BLOB_PREFIX, _REFERENCES_SUFFIX, _decode_record
+
+_REGIONS = {"NA": "NA1", "EUW": "EUW1", "KR": "KR"}
+
+
+def _champions(region, names=("Annie", "Ahri")):
+    return ChampionListDto({"region": region, "version": "10.1.1", "locale": "en_US", "includedData": {"all"},
+                            "data": {name: {"id": i, "name": name, "tags": {"Mage", "Support", "Assassin"}} for i, name in enumerate(names)}})
+
+
+def _query(platform):
+    return {"platform": platform, "version": "10.1.1", "locale": "en_US", "includedData": {"all"}}
+
+
+def _blobs(store):
+    inner = store._by_store()[0]._store
+    blobs = {}
+    for key in inner.iter_keys(_BLOB_PREFIX):
+        if key.endswith(_REFERENCES_SUFFIX):
+            blobs[key[len(_BLOB_PREFIX):-len(_REFERENCES_SUFFIX)]] = set(_decode_record(inner.get(key))[1])
+    return blobs
+
+
+def test_platforms_share_one_blob_until_it_is_released(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), dedup=True)
+    try:
+        for region in _REGIONS:
+            store.put(ChampionListDto, _champions(region))
+        (digest, references), = _blobs(store).items()
+        assert len(references) == 3
+        for region, platform in _REGIONS.items():
+            champions = store.get(ChampionListDto, _query(platform))
+            assert champions["region"] == region and champions["data"]["Ahri"]["id"] == 1
+
+        # Overwriting one platform with other data moves its reference to a second blob.
+        store.put(ChampionListDto, _champions("KR", names=("Zed",)))
+        blobs = _blobs(store)
+        assert len(blobs) == 2 and len(blobs[digest]) == 2
+        assert list(store.get(ChampionListDto, _query("KR"))["data"]) == ["Zed"]
+
+        # Putting the same data back releases the second blob entirely.
+        store.put(ChampionListDto, _champions("KR"))
+        assert _blobs(store) == {digest: references}
+        assert not any(key.startswith(_BLOB_PREFIX) and digest not in key for key in store._by_store()[0]._store.iter_keys())
+
+        store.clear(ChampionListDto)
+        store.collect()
+        assert list(store._by_store()[0]._store.iter_keys(_BLOB_PREFIX)) == []
+    finally:
+        store.close()
+
+
+def test_digests_do_not_depend_on_the_process(tmp_path):
+    code = """
+import sys
+from cassiopeia.dto.staticdata import ChampionListDto
+from cassiopeia_diskstore import SimpleKVDiskStore
+names = ("Annie", "Ahri", "Zed") if sys.argv[2] == "0" else ("Zed", "Ahri", "Annie")
+store = SimpleKVDiskStore(sys.argv[1], dedup=True)
+store.put(ChampionListDto, ChampionListDto({"region": "NA", "version": "10.1.1", "locale": "en_US", "includedData": {"all"},
+                                            "data": {name: {"id": len(name), "tags": {"Mage", "Support", "Assassin", "Fighter"}} for name in names}}))
+print(sorted(key for key in store._by_store()[0]._store.iter_keys("Blob.")))
+store.close()
+"""
+    outputs = set()
+    for seed in range(4):
+        path = str(tmp_path / str(seed))
+        os.mkdir(path)
+        environment = dict(os.environ, PYTHONHASHSEED=str(seed), PYTHONPATH=os.getcwd())
+        outputs.add(subprocess.run([sys.executable, "-c", code, path, str(seed % 2)], env=environment, check=True, capture_output=True, text=True).stdout)
+    assert len(outputs) == 1
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+@pytest.mark.parametrize("workers, processes", [(None, False), (4, False), (3, True)])
+def test_expire_deletes_only_expired_records(tmp_path, workers, processes):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 0.05})
+    try:
+        # More keys than fit in the batches that are in flight at once.
+        for i in range(3000):
+            store.put(SummonerDto, summoner(i))
+        for i in range(10):
+            store.put(MatchDto, match(i))
+        time.sleep(0.1)
+        store.expire(workers=workers, processes=processes)
+        assert sorted(store._by_store()[0]._store.iter_keys()) == sorted("MatchDto.NA1.{}".format(i) for i in range(10))
+    finally:
+        store.close()
+
+
+def test_expire_can_be_limited_to_one_type(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 0.05, MatchDto: 0.05})
+    try:
+        store.put(SummonerDto, summoner(1))
+        store.put(MatchDto, match(1))
+        time.sleep(0.1)
+        store.expire(MatchDto, workers=2)
+        keys = list(store._by_store()[0]._store.iter_keys())
+        assert keys and all(key.startswith("SummonerDto.") for key in keys)
+    finally:
+        store.close()
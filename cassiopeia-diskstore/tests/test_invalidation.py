@@ -0,0 +1,121 @@
+import subprocess
+import sys
+import time
+
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.staticdata import ChampionListDto
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+import pytest
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.invalidation import Invalidations
+from cassiopeia_diskstore.staticdata import StaticDataDiskService
+
+from conftest import match, summoner
+
+_QUERY = {"platform": "NA1", "version": "10.1.1", "locale": "en_US", "includedData": {"all"}}
+
+
+def _has_match(store, i, platform):
+    try:
+        return store.get(MatchDto, {"platform": platform, "id": i})["gameDuration"] == 1000 + i
+    except NotFoundError:
+        return False
+
+
+def _keys(store):
+    return sorted(store._by_store()[0]._store.iter_keys())
+
+
+def _champions(region="NA"):
+    return ChampionListDto({"region": region, "version": "10.1.1", "locale": "en_US", "includedData": {"all"}, "data": {"Annie": {"id": 1, "name": "Annie"}}})
+
+
+def test_a_clear_in_another_process_drops_decoded_static_data(tmp_path):
+    # Without a background thread, only reads notice clears.
+    store = StaticDataDiskService(str(tmp_path), invalidations=Invalidations(refresh_interval=0.0))
+    try:
+        store.put(ChampionListDto, _champions())
+        assert store.get(ChampionListDto, dict(_QUERY))["data"]["Annie"]["id"] == 1
+        assert store.get(ChampionListDto, dict(_QUERY))["data"]["Annie"]["id"] == 1
+        code = "from cassiopeia_diskstore import SimpleKVDiskStore; from cassiopeia.dto.staticdata import ChampionListDto; " \
+               "store = SimpleKVDiskStore({!r}); store.clear(ChampionListDto); store.close()".format(str(tmp_path))
+        subprocess.run([sys.executable, "-c", code], check=True)
+        with pytest.raises(NotFoundError):
+            store.get(ChampionListDto, dict(_QUERY))
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("engine", ["filesystem", "segments"])
+def test_clears_are_seen_by_every_store_on_the_directory(tmp_path, engine):
+    options = {"engine": engine, "memory": {"max_entries": 100}, "invalidation": {"refresh_interval": 0.0}}
+    first = SimpleKVDiskStore(str(tmp_path), **options)
+    second = SimpleKVDiskStore(str(tmp_path), **options)
+    try:
+        for i in range(5):
+            first.put(MatchDto, match(i, "NA1"))
+            first.put(MatchDto, match(i, "KR"))
+        first.put(SummonerDto, summoner(1))
+        assert _has_match(second, 1, "KR")  # and into the second store's memory tier
+
+        first.clear(MatchDto, "KR")
+        assert not _has_match(second, 1, "KR") and not _has_match(first, 1, "KR")
+        assert _has_match(second, 1, "NA1")
+        second.put(MatchDto, match(1, "KR"))
+        assert _has_match(first, 1, "KR")
+
+        second.clear(platform="NA1")
+        assert not _has_match(first, 2, "NA1")
+        with pytest.raises(NotFoundError):
+            first.get(SummonerDto, {"platform": "NA1", "id": "sid1"})
+
+        first.collect()
+        assert _keys(first) == ["MatchDto.KR.1"]
+        first.clear()
+        assert not _has_match(second, 1, "KR")
+        second.collect()
+        assert _keys(second) == []
+    finally:
+        first.close()
+        second.close()
+
+
+def test_clears_survive_a_restart_and_are_collected_in_the_background(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), invalidation={"max_deletes_per_second": 0})
+    for i in range(50):
+        store.put(MatchDto, match(i, "NA1"))
+    store._by_store()[0]._invalidations.stop()
+    store.clear(MatchDto)
+    store.close()
+    assert len(_keys(store)) == 50
+
+    store = SimpleKVDiskStore(str(tmp_path), invalidation={"max_deletes_per_second": 0})
+    try:
+        assert not _has_match(store, 3, "NA1")
+        deadline = time.monotonic() + 10
+        while _keys(store) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert _keys(store) == []
+    finally:
+        store.close()
+
+
+def test_without_a_refresh_interval_clears_wait_for_collect(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), invalidation={"refresh_interval": None})
+    other = SimpleKVDiskStore(str(tmp_path), invalidation={"refresh_interval": None})
+    try:
+        store.put(MatchDto, match(1))
+        store.put(MatchDto, match(2))
+        assert _has_match(other, 1, "NA1")
+        other.clear(MatchDto)
+        # Reads still notice clears from other stores right away.
+        assert not _has_match(store, 1, "NA1")
+        time.sleep(0.1)
+        assert _keys(store) == ["MatchDto.NA1.2"]
+        assert store.collect() == 1
+        assert _keys(store) == []
+    finally:
+        other.close()
+        store.close()
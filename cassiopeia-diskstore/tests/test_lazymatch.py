@@ -0,0 +1,87 @@
+import json
+import pickle
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.lazy import LazyDict
+from cassiopeia_diskstore.lazymatch import LazyMatchDto
+from cassiopeia_diskstore.serializers import get_serializer
+
+from conftest import match
+
+
+def _serializer(name):
+    try:
+        return get_serializer(name)
+    except ImportError as error:
+        pytest.skip(str(error))
+
+
+def _full_match(i):
+    item = match(i)
+    item["participants"] = [{
+        "participantId": participant,
+        "championId": 10 + participant,
+        "stats": {"kills": participant, "deaths": 2, "win": participant % 2 == 0},
+        "timeline": {"lane": "MIDDLE", "creepsPerMinDeltas": {"0-10": 7.5}}
+    } for participant in range(1, 11)]
+    item["participantIdentities"] = [{"participantId": participant, "player": {"summonerName": "Name {}".format(participant)}} for participant in range(1, 11)]
+    return item
+
+
+@pytest.mark.parametrize("name", ["pickle", "msgpack"])
+def test_lazy_matches_round_trip(tmp_path, name):
+    _serializer(name)
+    store = SimpleKVDiskStore(str(tmp_path), serializer=name, lazy_matches=True)
+    try:
+        store.put(MatchDto, _full_match(1))
+        item = store.get(MatchDto, {"platform": "NA1", "id": 1})
+        assert isinstance(item, LazyMatchDto)
+        assert item == _full_match(1)
+        assert json.loads(item.to_json()) == _full_match(1)
+    finally:
+        store.close()
+
+
+def test_heavy_parts_are_decoded_when_first_used(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), lazy_matches=True)
+    try:
+        store.put(MatchDto, _full_match(1))
+        item = store.get(MatchDto, {"platform": "NA1", "id": 1})
+        stats = [participant["stats"] for participant in item["participants"]]
+        assert all(isinstance(value, LazyDict) and not value._built for value in stats)
+        assert item["participants"][3]["stats"]["kills"] == 4
+        assert stats[3]._built and not stats[4]._built
+        assert item["participantIdentities"][9]["player"]["summonerName"] == "Name 10"
+    finally:
+        store.close()
+
+
+def test_lazy_matches_can_be_pickled(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), lazy_matches=True)
+    try:
+        store.put(MatchDto, _full_match(1))
+        item = store.get(MatchDto, {"platform": "NA1", "id": 1})
+        copy = pickle.loads(pickle.dumps(item))
+        assert copy == _full_match(1)
+        assert type(copy["participants"][0]["stats"]) is dict
+    finally:
+        store.close()
+
+
+def test_matches_without_participants_are_stored_as_they_are(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), lazy_matches=True)
+    try:
+        item = match(1)
+        del item["participants"]
+        store.put(MatchDto, item)
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1}) == item
+    finally:
+        store.close()
+
+
+def test_lazy_matches_need_a_binary_serializer(tmp_path):
+    with pytest.raises(ValueError):
+        SimpleKVDiskStore(str(tmp_path), serializer="json", lazy_matches=True)
@@ -0,0 +1,48 @@
+import random
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto, TimelineDto
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+def _timeline(i):
+    return TimelineDto({"region": "NA", "matchId": i, "frameInterval": 60000, "frames": []})
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), io_threads=4, expirations={SummonerDto: 0.05})
+    yield store
+    store.close()
+
+
+def test_get_many_returns_items_in_the_order_asked_for(store):
+    store.put_many(MatchDto, [match(i) for i in range(50)])
+    ids = random.Random(0).sample(range(50), 30) + [7, 7]
+    assert [dto["gameId"] for dto in store.get_many(MatchDto, {"platform": "NA1", "ids": ids})] == ids
+    store.put_many(TimelineDto, [_timeline(i) for i in range(10)])
+    assert [dto["matchId"] for dto in store.get_many(TimelineDto, {"platform": "NA1", "ids": [9, 0, 4]})] == [9, 0, 4]
+
+
+def test_get_many_raises_before_returning_anything_if_one_is_missing(store):
+    store.put_many(MatchDto, [match(i) for i in range(10)])
+    with pytest.raises(NotFoundError):
+        store.get_many(MatchDto, {"platform": "NA1", "ids": [1, 2, 10, 3]})
+
+
+def test_expired_records_count_as_missing(store):
+    store.put_many(SummonerDto, [summoner(i) for i in range(3)])
+    assert len(list(store.get_many(SummonerDto, {"platform": "NA1", "ids": ["sid0", "sid1", "sid2"]}))) == 3
+    time.sleep(0.1)
+    with pytest.raises(NotFoundError):
+        store.get_many(SummonerDto, {"platform": "NA1", "ids": ["sid0", "sid1"]})
+
+
+def test_get_many_of_nothing_is_empty(store):
+    assert list(store.get_many(MatchDto, {"platform": "NA1", "ids": []})) == []
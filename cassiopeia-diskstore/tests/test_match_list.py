@@ -0,0 +1,73 @@
+import pytest
+from cassiopeia.data import Queue
+from cassiopeia.dto.match import MatchListDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+_DAY = 24 * 60 * 60 * 1000
+_START = 1500000000000
+
+
+def _ref(i, queue=420):
+    return {"gameId": i, "timestamp": _START + i * 1000, "queue": queue, "season": 13, "champion": 1, "platformId": "NA1"}
+
+
+def _by_date(refs, begin, end, queues=()):
+    return MatchListDto({"accountId": "acc1", "region": "NA", "matches": sorted(refs, key=lambda ref: -ref["timestamp"]),
+                         "beginTime": begin, "endTime": end, "queue": set(queues), "season": set(), "champion": set()})
+
+
+def _game_ids(store, begin, end, begin_index=0, queues=()):
+    query = {"accountId": "acc1", "platform": "NA1", "beginTime": begin, "endTime": end, "beginIndex": begin_index}
+    if queues:
+        query["queues"] = queues
+    return [ref["gameId"] for ref in store.get(MatchListDto, query)["matches"]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_a_short_page_covers_the_whole_window(store):
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(10, 20)], _START, _START + _DAY))
+    assert _game_ids(store, _START, _START + _DAY) == list(range(19, 9, -1))
+    assert _game_ids(store, _START + 15000, _START + _DAY) == list(range(19, 14, -1))
+    # The window before it wasn't covered.
+    with pytest.raises(NotFoundError):
+        _game_ids(store, _START - _DAY, _START + _DAY)
+
+
+def test_a_full_page_only_covers_down_to_its_oldest_match(store):
+    # Riot caps a page at 100 matches, so there may be older ones in the window.
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(100, 200)], _START, _START + _DAY))
+    assert _game_ids(store, _START, _START + _DAY) == list(range(199, 99, -1))
+    with pytest.raises(NotFoundError):
+        _game_ids(store, _START, _START + _DAY, begin_index=100)
+    # Once the older part of the window is put too, the ranges merge and the second page is served.
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(50)], _START, _START + 100000))
+    assert _game_ids(store, _START, _START + _DAY, begin_index=100) == list(range(49, -1, -1))
+
+
+def test_windows_with_a_gap_between_them_are_not_merged(store):
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(10)], _START, _START + 10000))
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(20, 30)], _START + 20000, _START + _DAY))
+    assert _game_ids(store, _START + 20000, _START + _DAY) == list(range(29, 19, -1))
+    with pytest.raises(NotFoundError):
+        _game_ids(store, _START, _START + _DAY)
+    store.put(MatchListDto, _by_date([_ref(i) for i in range(10, 20)], _START + 10001, _START + 19999))
+    assert _game_ids(store, _START, _START + _DAY) == list(range(29, -1, -1))
+
+
+def test_unfiltered_windows_serve_filtered_queries_but_not_the_other_way_around(store):
+    refs = [_ref(i, queue=420 if i % 2 else 440) for i in range(10)]
+    store.put(MatchListDto, _by_date([ref for ref in refs if ref["queue"] == 420], _START, _START + _DAY, queues=[Queue.ranked_solo_fives]))
+    assert _game_ids(store, _START, _START + _DAY, queues=[Queue.ranked_solo_fives]) == [9, 7, 5, 3, 1]
+    with pytest.raises(NotFoundError):
+        _game_ids(store, _START, _START + _DAY)
+    store.put(MatchListDto, _by_date(refs, _START, _START + _DAY))
+    assert _game_ids(store, _START, _START + _DAY) == list(range(9, -1, -1))
+    assert _game_ids(store, _START, _START + _DAY, queues=[Queue.ranked_flex_fives]) == [8, 6, 4, 2, 0]
@@ -0,0 +1,69 @@
+import pytest
+from cassiopeia.dto.match import MatchDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.memory import MemoryCache
+
+from conftest import match
+
+
+def test_the_least_recently_used_entry_is_evicted_first():
+    cache = MemoryCache(max_entries=2)
+    cache.put("a", 1, float("inf"), "MatchDto", 10)
+    cache.put("b", 2, float("inf"), "MatchDto", 10)
+    assert cache.get("a", 0.0) == 1
+    cache.put("c", 3, float("inf"), "MatchDto", 10)
+    assert cache.get("b", 0.0) is None and cache.get("a", 0.0) == 1 and cache.get("c", 0.0) == 3
+
+
+def test_the_byte_budget_counts_record_sizes():
+    cache = MemoryCache(max_bytes=100)
+    cache.put("a", 1, float("inf"), "MatchDto", 60)
+    cache.put("b", 2, float("inf"), "MatchDto", 30)
+    cache.put("c", 3, float("inf"), "MatchDto", 30)
+    assert cache.get("a", 0.0) is None and len(cache) == 2
+    # Records larger than the whole budget aren't cached at all.
+    cache.put("d", 4, float("inf"), "MatchDto", 101)
+    assert cache.get("d", 0.0) is None and len(cache) == 2
+
+
+def test_per_type_budgets_only_evict_that_type():
+    cache = MemoryCache(max_entries=10, budgets={MatchDto: 1, "TimelineDto": 0})
+    cache.put("summoner", 0, float("inf"), "SummonerDto", 10)
+    cache.put("match1", 1, float("inf"), "MatchDto", 10)
+    cache.put("match2", 2, float("inf"), "MatchDto", 10)
+    cache.put("timeline", 3, float("inf"), "TimelineDto", 10)
+    assert cache.get("match1", 0.0) is None and cache.get("match2", 0.0) == 2
+    assert cache.get("summoner", 0.0) == 0 and cache.get("timeline", 0.0) is None
+
+
+def test_expired_entries_are_not_served():
+    cache = MemoryCache(max_entries=10)
+    cache.put("a", 1, 5.0, "MatchDto", 10)
+    assert cache.get("a", 4.0) == 1
+    assert cache.get("a", 6.0) is None and len(cache) == 0
+
+
+def test_a_size_is_required():
+    with pytest.raises(ValueError):
+        MemoryCache()
+
+
+def test_the_store_serves_repeated_reads_from_memory(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), memory={"max_entries": 10})
+    try:
+        store.put(MatchDto, match(1))
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 1001
+        # With the record deleted behind the store's back, the cached copy is still served.
+        store._by_store()[0]._store.delete("MatchDto.NA1.1")
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 1001
+        # Callers may modify what they get without changing the cached copy.
+        store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] = 0
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 1001
+        # A put replaces the cached copy.
+        updated = match(1)
+        updated["gameDuration"] = 5
+        store.put(MatchDto, updated)
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 5
+    finally:
+        store.close()
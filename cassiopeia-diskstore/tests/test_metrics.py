@@ -0,0 +1,38 @@
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+@pytest.mark.parametrize("memory", [None, {"max_entries": 100}])
+def test_reads_are_counted_by_outcome(tmp_path, memory):
+    # Without a background collector the cleared record stays on disk, so reading it counts as invalidated.
+    store = SimpleKVDiskStore(str(tmp_path), metrics={}, memory=memory, expirations={SummonerDto: 0.05}, invalidation={"refresh_interval": None})
+    try:
+        store.put(MatchDto, match(1))
+        store.put(SummonerDto, summoner(1))
+        for _ in range(2):
+            assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 1001
+        with pytest.raises(NotFoundError):
+            store.get(MatchDto, {"platform": "NA1", "id": 2})
+        store.clear(MatchDto)
+        with pytest.raises(NotFoundError):
+            store.get(MatchDto, {"platform": "NA1", "id": 1})
+        time.sleep(0.1)
+        with pytest.raises(NotFoundError):
+            store.get(SummonerDto, {"platform": "NA1", "id": "sid1"})
+
+        matches = store.stats()["types"]["MatchDto"]
+        assert matches["disk_hits"] + matches["memory_hits"] == 2
+        assert matches["memory_hits"] == (1 if memory else 0)
+        assert matches["misses"] == 1 and matches["invalidated"] == 1
+        assert matches["get_seconds"]["count"] == 4
+        assert store.stats()["types"]["SummonerDto"]["expired"] == 1
+    finally:
+        store.close()
@@ -0,0 +1,130 @@
+import multiprocessing
+
+from cassiopeia.dto.match import MatchDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.segments import SegmentStore
+
+
+def _write(root, name, count):
+    store = SegmentStore(root, segment_size=2048, shared=True)
+    for i in range(count):
+        store.put("{}{}".format(name, i), "{}-{}".format(name, i).encode() * 5)
+        if i % 3 == 0:
+            store.delete("{}{}".format(name, i))
+    store.close()
+
+
+def _read(root, queue):
+    store = SegmentStore(root, segment_size=2048, shared=True)
+    queue.put(sorted(store.keys()))
+    store.close()
+
+
+def _run(target, *args):
+    process = multiprocessing.get_context("fork").Process(target=target, args=args)
+    process.start()
+    return process
+
+
+def test_shared_segments_see_each_others_writes(tmp_path):
+    root = str(tmp_path)
+    processes = [_run(_write, root, name, 200) for name in ("a", "b", "c")]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    expected = sorted("{}{}".format(name, i) for name in ("a", "b", "c") for i in range(200) if i % 3)
+
+    store = SegmentStore(root, segment_size=2048, shared=True)
+    # Separate open files lock each other out just like separate processes do.
+    already_open = SegmentStore(root, segment_size=2048, shared=True)
+    try:
+        assert sorted(store.keys()) == expected
+        assert store.get("b5") == b"b-5" * 5
+        store.compact(0.1)
+        assert already_open.get("a199") == b"a-199" * 5 and sorted(already_open.keys()) == expected
+        # A process opening the store after another compacted it still sees the same keys.
+        queue = multiprocessing.get_context("fork").Queue()
+        process = _run(_read, root, queue)
+        assert queue.get(timeout=30) == expected
+        process.join()
+        store.put("late", b"1")
+    finally:
+        already_open.close()
+        store.close()
+    other = SegmentStore(root, segment_size=2048, shared=True)
+    try:
+        assert other.get("late") == b"1" and other.get("c199") == b"c-199" * 5
+    finally:
+        other.close()
+
+
+def _put_matches(root, worker):
+    store = SimpleKVDiskStore(root, engine="segments", multiprocess={})
+    for i in range(100):
+        store.put(MatchDto, MatchDto({"platformId": "NA1", "gameId": i, "gameDuration": worker, "participants": [], "participantIdentities": []}))
+    store.close()
+
+
+def test_stores_in_several_processes_write_the_same_keys(tmp_path):
+    root = str(tmp_path)
+    processes = [_run(_put_matches, root, worker) for worker in range(4)]
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    store = SimpleKVDiskStore(root, engine="segments", multiprocess={})
+    try:
+        for i in range(100):
+            assert store.get(MatchDto, {"platform": "NA1", "id": i})["gameDuration"] in range(4)
+    finally:
+        store.close()
+
+
+def _try_lock(root, stripe, queue):
+    import fcntl
+    import os
+
+    fd = os.open(os.path.join(root, ".locks"), os.O_RDWR)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+        queue.put(True)
+    except OSError:
+        queue.put(False)
+    finally:
+        os.close(fd)
+
+
+def test_two_stores_in_one_process_exclude_each_other(tmp_path):
+    import threading
+
+    root = str(tmp_path)
+    first = SimpleKVDiskStore(root, multiprocess={})
+    second = SimpleKVDiskStore(root, multiprocess={})
+    first_locks, second_locks = first._by_store()[0]._locks, second._by_store()[0]._locks
+    assert first_locks is not second_locks
+    try:
+        entered = threading.Event()
+
+        def hold_in_second():
+            with second_locks.hold("key"):
+                entered.set()
+
+        with first_locks.hold("key"):
+            thread = threading.Thread(target=hold_in_second)
+            thread.start()
+            assert not entered.wait(0.2)
+        thread.join(5)
+        assert entered.is_set()
+
+        # Closing one store doesn't release the locks the other still holds.
+        first.close()
+        first = None
+        queue = multiprocessing.get_context("fork").Queue()
+        with second_locks.hold("key"):
+            process = _run(_try_lock, root, second_locks.stripe("key"), queue)
+            assert queue.get(timeout=30) is False
+            process.join()
+    finally:
+        if first is not None:
+            first.close()
+        second.close()
@@ -0,0 +1,29 @@
+import time
+
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+def test_records_dropped_by_compaction_leave_the_quota(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), engine="segments", engine_options={"segment_size": 4096}, quota={"max_bytes": 10 ** 9},
+                              expirations={SummonerDto: 0.05})
+    try:
+        for i in range(20):
+            store.put(SummonerDto, summoner(i))
+        for i in range(40):
+            store.put(MatchDto, match(i))
+        segments = store._by_store()[0]._store
+        # Only sealed segments are compacted.
+        assert all(segments._index[key][0] != segments._active for key in segments.keys("SummonerDto."))
+        assert store.quota_stats()["bytes_by_type"]["SummonerDto"] > 0
+        time.sleep(0.1)
+        segments.compact(0.0)
+        stats = store.quota_stats()
+        assert stats["bytes_by_type"]["SummonerDto"] == 0
+        assert stats["bytes"] == stats["bytes_by_type"]["MatchDto"] == sum(segments.size(key) for key in segments.keys())
+    finally:
+        store.close()
@@ -0,0 +1,54 @@
+import datetime
+import pickle
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.common import _HEADER, _decode_record, _encode_record, _parse_header, _read_header
+
+from conftest import match
+
+
+def test_the_header_is_readable_without_the_payload():
+    before = datetime.datetime.now().timestamp()
+    record = _encode_record(match(1), "MatchDto", 60)
+    header = _parse_header(record[:_HEADER.size])
+    assert header.type_name == "MatchDto" and before <= header.entered <= header.expires_at - 60 + 1e-6
+    assert _decode_record(record) == (header, match(1))
+    assert _parse_header(_encode_record(match(1), "MatchDto", -1)).expires_at == float("inf")
+
+
+def test_expiry_checks_do_not_decode_the_payload(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={MatchDto: 0.05})
+    try:
+        inner = store._by_store()[0]._store
+        # A payload that can't be unpickled, behind a valid header.
+        inner.put("MatchDto.NA1.1", _encode_record(match(1), "MatchDto", 0.05)[:_HEADER.size] + b"not a pickle")
+        assert _read_header(inner, "MatchDto.NA1.1").type_name == "MatchDto"
+        time.sleep(0.1)
+        store.expire()
+        assert list(inner.iter_keys()) == []
+    finally:
+        store.close()
+
+
+def test_records_written_before_the_header_are_still_read(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 60})
+    try:
+        inner = store._by_store()[0]._store
+        now = datetime.datetime.now().timestamp()
+        inner.put("MatchDto.NA1.1", pickle.dumps((match(1), "forever", now - 10 ** 6)))
+        inner.put("MatchDto.NA1.2", pickle.dumps((match(2), datetime.timedelta(seconds=60), now - 120)))
+        inner.put("MatchDto.NA1.3", pickle.dumps((match(3), 60, now)))
+        assert store.get(MatchDto, {"platform": "NA1", "id": 1})["gameDuration"] == 1001
+        assert store.get(MatchDto, {"platform": "NA1", "id": 3})["gameDuration"] == 1003
+        with pytest.raises(NotFoundError):
+            store.get(MatchDto, {"platform": "NA1", "id": 2})
+        store.expire()
+        assert sorted(inner.iter_keys()) == ["MatchDto.NA1.1", "MatchDto.NA1.3"]
+    finally:
+        store.close()
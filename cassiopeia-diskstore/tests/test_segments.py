@@ -0,0 +1,114 @@
+import os
+
+from cassiopeia_diskstore.segments import SegmentStore, _INDEX_FILENAME
+
+
+def _reopen_without_index(store, root, **kwargs):
+    store.close()
+    os.unlink(os.path.join(root, _INDEX_FILENAME))
+    return SegmentStore(root, **kwargs)
+
+
+def test_compaction_keeps_deleted_keys_deleted_after_an_index_rebuild(tmp_path):
+    root = str(tmp_path)
+    store = SegmentStore(root, segment_size=1024)
+    # Segment 0 is all live, so compaction leaves it alone; "k" is deleted in segment 1, which is mostly dead.
+    store.put("k", b"v" * 10)
+    for i in range(8):
+        store.put("live{}".format(i), b"l" * 100)
+    store.put("churn", b"c" * 100)
+    assert store._active == 1
+    store.delete("k")
+    for i in range(8):
+        store.put("churn", b"c" * 100)
+    store.put("tail", b"t" * 1000)
+    assert store._index["live0"][0] == 0 and store._active > 1
+    store.compact(0.5)
+    assert 0 in store._sizes and 1 not in store._sizes
+
+    store = _reopen_without_index(store, root, segment_size=1024)
+    try:
+        assert "k" not in store
+        assert store.get("live3") == b"l" * 100
+        assert store.get("churn") == b"c" * 100
+    finally:
+        store.close()
+
+
+def test_rebuild_from_segments_after_compaction(tmp_path):
+    root = str(tmp_path)
+    store = SegmentStore(root, segment_size=512)
+    for i in range(50):
+        store.put("key{}".format(i % 10), "value{}".format(i).encode() * 10)
+    for i in range(0, 10, 2):
+        store.delete("key{}".format(i))
+    store.compact(0.1)
+
+    store = _reopen_without_index(store, root, segment_size=512)
+    try:
+        assert sorted(store.keys()) == ["key{}".format(i) for i in range(1, 10, 2)]
+        assert store.get("key9") == b"value49" * 10
+    finally:
+        store.close()
+
+
+def test_sealed_segments_are_complete_on_reopen(tmp_path):
+    root = str(tmp_path)
+    store = SegmentStore(root, segment_size=256)
+    for i in range(20):
+        store.put("key{}".format(i), b"x" * 100)
+    store.close()
+
+    store = SegmentStore(root, segment_size=256)
+    try:
+        assert len(store.keys()) == 20
+        assert store.get("key0") == b"x" * 100
+    finally:
+        store.close()
+
+
+def test_a_torn_write_is_dropped_on_reopen(tmp_path):
+    root = str(tmp_path)
+    store = SegmentStore(root)
+    store.put("a", b"1")
+    store.put("b", b"2")
+    store.close()
+    filename = store._segment_filename(0)
+    os.truncate(filename, os.path.getsize(filename) - 1)
+    os.unlink(os.path.join(root, _INDEX_FILENAME))
+
+    store = SegmentStore(root)
+    try:
+        assert store.keys() == ["a"]
+        store.put("c", b"3")
+        assert store.get("c") == b"3"
+    finally:
+        store.close()
+
+
+def test_an_open_value_stays_readable_while_its_segment_is_compacted(tmp_path):
+    store = SegmentStore(str(tmp_path), segment_size=256)
+    try:
+        # Once compacted, "a" moves to the start of a segment, and its old descriptor's number may be reused for that.
+        store.put("z", b"z" * 50)
+        store.put("a", b"a" * 100)
+        store.delete("z")
+        store.put("b", b"b" * 200)
+        reader = store.open("a")
+        assert reader.read(10) == b"a" * 10
+        store.compact(0.0)
+        # Compacting again retires more descriptors, which used to close the reader's.
+        store.put("c", b"c" * 300)
+        store.put("d", b"d" * 10)
+        store.compact(0.0)
+        assert reader.read() == b"a" * 90
+        fd = reader._fd
+        reader.close()
+        try:
+            os.fstat(fd)
+            closed = False
+        except OSError:
+            closed = True
+        assert closed and store.get("a") == b"a" * 100 and store.get("c") == b"c" * 300
+    finally:
+        store.close()
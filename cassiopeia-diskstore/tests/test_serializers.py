@@ -0,0 +1,52 @@
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.staticdata import ChampionListDto
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.serializers import get_serializer
+
+from conftest import match, summoner
+
+
+def _serializer(name):
+    try:
+        return get_serializer(name)
+    except ImportError as error:
+        pytest.skip(str(error))
+
+
+@pytest.mark.parametrize("name", ["pickle", "msgpack", "json"])
+def test_dtos_round_trip_through_each_serializer(tmp_path, name):
+    _serializer(name)
+    store = SimpleKVDiskStore(str(tmp_path), serializer=name)
+    try:
+        store.put(MatchDto, match(1))
+        store.put(SummonerDto, summoner(1))
+        store.put(ChampionListDto, ChampionListDto({"region": "NA", "version": "10.1.1", "locale": "en_US", "includedData": {"all"},
+                                                    "data": {"Annie": {"id": 1, "name": "Annie", "tags": ["Mage"]}}}))
+    finally:
+        store.close()
+    # Records name their serializer, so they're read back whatever the store is configured with now.
+    store = SimpleKVDiskStore(str(tmp_path), serializer="pickle" if name != "pickle" else "json")
+    try:
+        dto = store.get(MatchDto, {"platform": "NA1", "id": 1})
+        assert isinstance(dto, MatchDto) and dto == match(1)
+        assert store.get(SummonerDto, {"platform": "NA1", "name": "Name 1"})["puuid"] == "puuid1"
+        champions = store.get(ChampionListDto, {"platform": "NA1", "version": "10.1.1", "locale": "en_US", "includedData": {"all"}})
+        assert champions["data"]["Annie"]["tags"] == ["Mage"]
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("name", ["msgpack", "json"])
+def test_plain_data_serializers_store_sets_as_sorted_lists(name):
+    serializer = _serializer(name)
+    dto = serializer.loads(serializer.dumps(ChampionListDto({"includedData": {"tags", "all"}, "data": {}})), "ChampionListDto")
+    assert isinstance(dto, ChampionListDto) and dto["includedData"] == ["all", "tags"]
+    assert serializer.loads_value(serializer.dumps({"a": 1})) == {"a": 1}
+
+
+def test_unknown_serializers_are_refused():
+    with pytest.raises(ValueError):
+        get_serializer("yaml")
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+def _files(root):
+    return sorted(os.path.relpath(os.path.join(dirpath, filename), root) for dirpath, dirnames, filenames in os.walk(root)
+                  for filename in filenames if not dirpath.endswith(".incoming") and not filename.startswith("."))
+
+
+@pytest.mark.parametrize("layout, directories", [("type", ["MatchDto"]), ("type-platform", ["MatchDto", "KR"])])
+def test_records_are_filed_under_their_type(tmp_path, layout, directories):
+    store = SimpleKVDiskStore(str(tmp_path), layout=layout)
+    try:
+        store.put(MatchDto, match(1, "KR"))
+        path, = _files(str(tmp_path))
+        parts = path.split(os.sep)
+        # Then a two-level hash fan-out, then the key itself.
+        assert parts[:len(directories)] == directories and len(parts) == len(directories) + 3 and parts[-1] == "MatchDto.KR.1"
+        assert store.get(MatchDto, {"platform": "KR", "id": 1})["gameDuration"] == 1001
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("layout", ["type", "type-platform"])
+def test_listing_keys_by_prefix(tmp_path, layout):
+    store = SimpleKVDiskStore(str(tmp_path), layout=layout)
+    try:
+        for i in range(20):
+            store.put(MatchDto, match(i, "NA1" if i % 2 else "KR"))
+        store.put(SummonerDto, summoner(1))
+        inner = store._by_store()[0]._store
+        assert len(list(inner.iter_keys())) == 24
+        assert sorted(inner.iter_keys("MatchDto.KR.")) == sorted("MatchDto.KR.{}".format(i) for i in range(0, 20, 2))
+        assert len(list(inner.iter_keys("MatchDto."))) == 20
+        assert len(list(inner.iter_keys("Summoner"))) == 4
+        store.clear(MatchDto, "KR")
+        store.collect()
+        assert len(list(inner.iter_keys("MatchDto."))) == 10
+        # Deleting leaves the shard directories in place to be reused.
+        assert os.path.isdir(os.path.join(str(tmp_path), "MatchDto"))
+    finally:
+        store.close()
+
+
+def test_unknown_layouts_are_refused(tmp_path):
+    with pytest.raises(ValueError):
+        SimpleKVDiskStore(str(tmp_path), layout="by-date")
+    with pytest.raises(ValueError):
+        SimpleKVDiskStore(str(tmp_path), engine="segments", layout="type")
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.snapshot import main
+
+from conftest import match, summoner
+
+
+def _fill(path, **options):
+    store = SimpleKVDiskStore(path, **options)
+    try:
+        store.put_many(MatchDto, [match(i) for i in range(20)])
+        # A summoner is stored under each of its 4 ids, so this is 24 records.
+        store.put(SummonerDto, summoner(1))
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_snapshots_round_trip(tmp_path, compression):
+    _fill(str(tmp_path / "a"), compression={SummonerDto: "zlib"})
+    filename = str(tmp_path / "snapshot")
+    store = SimpleKVDiskStore(str(tmp_path / "a"))
+    try:
+        assert store.export_snapshot(filename, compression=compression) == 24
+    finally:
+        store.close()
+    store = SimpleKVDiskStore(str(tmp_path / "b"), engine="segments")
+    try:
+        assert store.import_snapshot(filename) == 24
+        assert store.get(MatchDto, {"platform": "NA1", "id": 7})["gameDuration"] == 1007
+        assert store.get(SummonerDto, {"platform": "NA1", "puuid": "puuid1"})["summonerLevel"] == 1
+    finally:
+        store.close()
+
+
+def test_snapshots_can_hold_one_type(tmp_path):
+    _fill(str(tmp_path))
+    filename = str(tmp_path / "snapshot")
+    store = SimpleKVDiskStore(str(tmp_path))
+    try:
+        assert store.export_snapshot(filename, type=SummonerDto) == 4
+    finally:
+        store.close()
+
+
+def test_expired_records_are_left_out(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path / "a"), expirations={SummonerDto: 0.1})
+    try:
+        store.put(SummonerDto, summoner(1))
+        store.put(MatchDto, match(1))
+        filename = str(tmp_path / "snapshot")
+        assert store.export_snapshot(filename) == 5
+        time.sleep(0.2)
+        assert store.export_snapshot(filename) == 1
+    finally:
+        store.close()
+
+
+def test_reads_are_served_straight_from_a_snapshot(tmp_path):
+    _fill(str(tmp_path / "a"))
+    filename = str(tmp_path / "snapshot")
+    main(["export", str(tmp_path / "a"), filename])
+    store = SimpleKVDiskStore(filename, engine="snapshot")
+    try:
+        assert store.get(MatchDto, {"platform": "NA1", "id": 19})["gameDuration"] == 1019
+        # Puts are ignored, since the snapshot is read-only.
+        store.put(MatchDto, match(20))
+        with pytest.raises(NotFoundError):
+            store.get(MatchDto, {"platform": "NA1", "id": 20})
+    finally:
+        store.close()
+
+
+def test_files_that_are_not_snapshots_are_refused(tmp_path):
+    filename = tmp_path / "snapshot"
+    filename.write_bytes(b"not a snapshot at all, just some bytes")
+    with pytest.raises(ValueError):
+        SimpleKVDiskStore(str(filename), engine="snapshot")
@@ -0,0 +1,79 @@
+import pytest
+from cassiopeia.dto.staticdata import ChampionDto, ChampionListDto, MapDto, MapListDto
+from datapipelines import NotFoundError, PipelineContext
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+_STATIC = {"platform": "NA1", "version": "10.1.1", "locale": "en_US"}
+
+
+def _champions(*names):
+    return ChampionListDto({"region": "NA", "version": "10.1.1", "locale": "en_US", "includedData": {"all"},
+                            "data": {name: {"id": i, "name": name} for i, name in enumerate(names, 1)}})
+
+
+class _Pipeline(object):
+    """Stands in for the rest of the pipeline, counting the lists it's asked for."""
+
+    def __init__(self, items):
+        self.items = items
+        self.gets = 0
+
+    def get(self, type, query):
+        self.gets += 1
+        try:
+            return self.items[type]
+        except KeyError:
+            raise NotFoundError
+
+
+def _context(pipeline):
+    context = PipelineContext()
+    context[PipelineContext.Keys.PIPELINE] = pipeline
+    return context
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+def test_champions_are_found_by_id_and_name_without_the_list(store):
+    store.put(ChampionListDto, _champions("Annie", "Ahri"))
+    pipeline = _Pipeline({})
+    champion = store.get(ChampionDto, dict(_STATIC, id=2), _context(pipeline))
+    assert champion["name"] == "Ahri" and champion["region"] == "NA" and champion["version"] == "10.1.1"
+    assert store.get(ChampionDto, dict(_STATIC, name="Annie"), _context(pipeline))["id"] == 1
+    assert pipeline.gets == 0
+
+
+def test_a_list_from_the_pipeline_is_searched_and_indexed(store):
+    pipeline = _Pipeline({ChampionListDto: _champions("Annie", "Ahri")})
+    assert store.get(ChampionDto, dict(_STATIC, name="Ahri"), _context(pipeline))["id"] == 2
+    assert store.get(ChampionDto, dict(_STATIC, id=1), _context(pipeline))["name"] == "Annie"
+    assert pipeline.gets == 1
+    with pytest.raises(NotFoundError):
+        store.get(ChampionDto, dict(_STATIC, name="Zed"), _context(pipeline))
+
+
+def test_entities_dropped_from_a_list_are_dropped_from_the_index(store):
+    store.put(ChampionListDto, _champions("Annie", "Ahri", "Zed"))
+    # Zed is gone and Ahri was renamed.
+    store.put(ChampionListDto, _champions("Annie", "Ahri the Fox"))
+    pipeline = _Pipeline({})
+    for query in ({"id": 3}, {"name": "Zed"}, {"name": "Ahri"}):
+        with pytest.raises(NotFoundError):
+            store.get(ChampionDto, dict(_STATIC, **query), _context(pipeline))
+    assert store.get(ChampionDto, dict(_STATIC, name="Ahri the Fox"), _context(pipeline))["id"] == 2
+    assert pipeline.gets == 3
+
+
+def test_maps_are_indexed_by_their_own_attributes(store):
+    store.put(MapListDto, MapListDto({"region": "NA", "version": "10.1.1", "locale": "en_US",
+                                      "data": {"11": {"mapId": "11", "mapName": "Summoner's Rift"}}}))
+    pipeline = _Pipeline({})
+    assert store.get(MapDto, dict(_STATIC, id=11), _context(pipeline))["mapName"] == "Summoner's Rift"
+    assert store.get(MapDto, dict(_STATIC, name="Summoner's Rift"), _context(pipeline))["mapId"] == "11"
+    assert pipeline.gets == 0
@@ -0,0 +1,31 @@
+import pytest
+
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import summoner
+
+
+def test_closing_one_store_leaves_the_other_open(tmp_path):
+    first = SimpleKVDiskStore(str(tmp_path), engine="segments")
+    second = SimpleKVDiskStore(str(tmp_path), engine="segments")
+    first.put(SummonerDto, summoner(1))
+    first.close()
+    second.put(SummonerDto, summoner(2))
+    assert second.get(SummonerDto, {"platform": "NA1", "id": "sid1"})["summonerLevel"] == 1
+    assert second.get(SummonerDto, {"platform": "NA1", "id": "sid2"})["summonerLevel"] == 2
+    second.close()
+
+
+def test_conflicting_engine_options_are_refused(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), engine="segments")
+    try:
+        with pytest.raises(ValueError):
+            SimpleKVDiskStore(str(tmp_path), engine="segments", multiprocess={})
+        with pytest.raises(ValueError):
+            SimpleKVDiskStore(str(tmp_path), engine="segments", engine_options={"segment_size": 1024})
+    finally:
+        store.close()
+    # Once it's closed, the directory can be opened with other options.
+    SimpleKVDiskStore(str(tmp_path), engine="segments", engine_options={"segment_size": 1024}).close()
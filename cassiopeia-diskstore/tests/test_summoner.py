@@ -0,0 +1,56 @@
+import pytest
+from cassiopeia.dto.summoner import SummonerDto
+from datapipelines import NotFoundError
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.summoner import SummonerDiskService
+
+from conftest import summoner
+
+
+def _keys(store):
+    return sorted(store._by_store()[0]._store.iter_keys())
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("identifier, value", [("id", "sid1"), ("accountId", "acc1"), ("puuid", "puuid1"), ("name", "Name 1"), ("name", "name1")])
+def test_summoners_are_found_by_each_identifier(store, identifier, value):
+    store.put(SummonerDto, summoner(1))
+    store.put(SummonerDto, summoner(2))
+    assert store.get(SummonerDto, {"platform": "NA1", identifier: value})["puuid"] == "puuid1"
+
+
+def test_a_renamed_summoner_is_not_found_by_the_old_name(store):
+    store.put(SummonerDto, summoner(1))
+    renamed = summoner(1)
+    renamed["name"] = "Someone Else"
+    store.put(SummonerDto, renamed)
+    old_name = SummonerDiskService._summoner_key("NA1", "name", "Name 1")
+    assert old_name in _keys(store)
+    with pytest.raises(NotFoundError):
+        store.get(SummonerDto, {"platform": "NA1", "name": "Name 1"})
+    # The stale index record is cleaned up on the way.
+    assert old_name not in _keys(store)
+    assert store.get(SummonerDto, {"platform": "NA1", "name": "someone else"})["id"] == "sid1"
+
+
+def test_index_records_of_a_deleted_summoner_are_cleaned_up(store):
+    store.put(SummonerDto, summoner(1))
+    store._by_store()[0]._delete(SummonerDiskService._summoner_key("NA1", "id", "sid1"))
+    with pytest.raises(NotFoundError):
+        store.get(SummonerDto, {"platform": "NA1", "puuid": "puuid1"})
+    assert SummonerDiskService._summoner_key("NA1", "puuid", "puuid1") not in _keys(store)
+
+
+def test_many_summoners_are_returned_in_order_or_not_at_all(store):
+    for i in range(5):
+        store.put(SummonerDto, summoner(i))
+    assert [dto["id"] for dto in store.get_many(SummonerDto, {"platform": "NA1", "puuids": ["puuid3", "puuid0", "puuid4"]})] == ["sid3", "sid0", "sid4"]
+    with pytest.raises(NotFoundError):
+        store.get_many(SummonerDto, {"platform": "NA1", "names": ["Name 1", "Name 9"]})
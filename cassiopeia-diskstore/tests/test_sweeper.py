@@ -0,0 +1,61 @@
+import time
+
+import pytest
+from cassiopeia.dto.match import MatchDto
+from cassiopeia.dto.summoner import SummonerDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+
+from conftest import match, summoner
+
+
+def _keys(store):
+    return sorted(store._by_store()[0]._store.iter_keys())
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.mark.parametrize("max_deletes_per_second", [100.0, 0, None])
+def test_expired_records_are_swept_without_being_read(tmp_path, max_deletes_per_second):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 0.1}, sweeper={"max_deletes_per_second": max_deletes_per_second})
+    try:
+        for i in range(20):
+            store.put(SummonerDto, summoner(i))
+        store.put(MatchDto, match(1))
+        assert _wait_for(lambda: _keys(store) == ["MatchDto.NA1.1"])
+    finally:
+        store.close()
+
+
+def test_records_already_on_disk_are_swept_after_a_restart(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 0.1})
+    try:
+        store.put(SummonerDto, summoner(1))
+        store.put(MatchDto, match(1))
+    finally:
+        store.close()
+    store = SimpleKVDiskStore(str(tmp_path), sweeper={})
+    try:
+        assert _wait_for(lambda: _keys(store) == ["MatchDto.NA1.1"])
+    finally:
+        store.close()
+
+
+def test_rewritten_records_are_not_swept_early(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), expirations={SummonerDto: 0.5}, sweeper={"max_deletes_per_second": None})
+    try:
+        store.put(SummonerDto, summoner(1))
+        time.sleep(0.3)
+        store.put(SummonerDto, summoner(1))
+        time.sleep(0.3)
+        # The first write's expiry has passed, but not the second's.
+        assert store.get(SummonerDto, {"platform": "NA1", "id": "sid1"})["summonerLevel"] == 1
+    finally:
+        store.close()
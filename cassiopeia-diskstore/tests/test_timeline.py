@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+from cassiopeia.dto.match import TimelineDto
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.timeline import LazyTimelineDto, decode_timeline, encode_timeline
+
+
+def _timeline(i, frames=3):
+    return TimelineDto({
+        "region": "NA",
+        "matchId": i,
+        "frameInterval": 60000,
+        "frames": [{
+            "timestamp": 60000 * frame,
+            "participantFrames": {
+                str(participant): {
+                    "participantId": participant,
+                    "totalGold": 500 + 300 * frame + participant,
+                    "xp": 10 ** 10 * frame,
+                    "position": {"x": 100 * participant, "y": 200 * frame}
+                } for participant in (1, 2)
+            },
+            "events": [{"type": "ITEM_PURCHASED", "timestamp": 60000 * frame + 1, "itemId": 1055}] +
+                      ([{"type": "CHAMPION_KILL", "timestamp": 60000 * frame + 2.5, "killerId": 1, "assistingParticipantIds": [2]}] if frame else [])
+        } for frame in range(frames)]
+    })
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), columnar_timelines=True)
+    yield store
+    store.close()
+
+
+def test_columnar_timelines_round_trip(store):
+    store.put(TimelineDto, _timeline(1))
+    timeline = store.get(TimelineDto, {"platform": "NA1", "id": 1})
+    assert isinstance(timeline, LazyTimelineDto)
+    assert timeline == _timeline(1)
+    # Pickling one gives back a plain timeline.
+    copy = pickle.loads(pickle.dumps(timeline))
+    assert type(copy) is TimelineDto
+    assert copy == _timeline(1)
+
+
+def test_columns_are_read_without_rebuilding_the_frames(store):
+    store.put(TimelineDto, _timeline(1))
+    timeline = store.get(TimelineDto, {"platform": "NA1", "id": 1})
+    assert timeline.participants == ["1", "2"]
+    assert list(timeline.column("participantFrames", "totalGold")) == [501, 502, 801, 802, 1101, 1102]
+    assert list(timeline.column("participantFrames", "position", "y")) == [0, 0, 200, 200, 400, 400]
+    assert list(timeline.event_counts) == [1, 2, 2]
+    # Only the kills have a killer.
+    assert list(timeline.rows("events", "killerId")) == [2, 4]
+    assert timeline.rows("events", "timestamp") is None
+    assert not timeline._built
+
+
+def test_irregular_timelines_are_stored_as_they_are(store):
+    timeline = _timeline(2)
+    del timeline["frames"][1]["participantFrames"]["2"]
+    assert encode_timeline(timeline) is timeline
+    store.put(TimelineDto, timeline)
+    assert type(store.get(TimelineDto, {"platform": "NA1", "id": 2})) is TimelineDto
+    assert store.get(TimelineDto, {"platform": "NA1", "id": 2}) == timeline
+
+
+def test_timelines_without_frames_are_stored_as_they_are():
+    timeline = _timeline(3, frames=0)
+    assert encode_timeline(timeline) is timeline
+    assert type(decode_timeline(timeline)) is TimelineDto
@@ -0,0 +1,85 @@
+import threading
+import time
+
+from cassiopeia.dto.match import MatchDto
+from simplekv.memory import DictStore
+
+from cassiopeia_diskstore import SimpleKVDiskStore
+from cassiopeia_diskstore.writer import WriteBehindQueue
+
+from conftest import match
+
+
+class _GatedStore(DictStore):
+    """Records every write and holds the writer until `gate` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.writes = []
+
+    def _put(self, key, data):
+        self.gate.wait()
+        self.writes.append(key)
+        return super()._put(key, data)
+
+
+def _wait_until_writing(queue, key):
+    while key not in queue._writing:
+        time.sleep(0.001)
+
+
+def test_a_key_put_again_before_it_is_written_is_written_once():
+    store = _GatedStore()
+    queue = WriteBehindQueue(batch_size=1)
+    queue.start(store)
+    try:
+        queue.put("a", b"1")
+        # Wait until "a" is being written, so the next puts all queue up behind it.
+        _wait_until_writing(queue, "a")
+        for record in (b"1", b"2", b"3"):
+            queue.put("b", record)
+        assert queue.get("b") == b"3"
+        store.gate.set()
+        queue.flush()
+        assert store.writes == ["a", "b"]
+        assert store.get("b") == b"3"
+    finally:
+        store.gate.set()
+        queue.stop()
+
+
+def test_deleting_a_queued_key_drops_its_record():
+    store = _GatedStore()
+    queue = WriteBehindQueue(batch_size=1)
+    queue.start(store)
+    try:
+        queue.put("a", b"1")
+        _wait_until_writing(queue, "a")
+        queue.put("b", b"1")
+        queue.delete("b")
+        assert queue.get("b") is None
+        store.gate.set()
+        queue.flush()
+        assert store.writes == ["a"]
+    finally:
+        store.gate.set()
+        queue.stop()
+
+
+def test_queued_records_are_read_back_before_they_are_written(tmp_path):
+    store = SimpleKVDiskStore(str(tmp_path), write_behind={})
+    try:
+        for i in range(100):
+            store.put(MatchDto, match(i))
+        for i in range(100):
+            assert store.get(MatchDto, {"platform": "NA1", "id": i})["gameDuration"] == 1000 + i
+    finally:
+        store.close()
+    # Closing writes out whatever was still queued.
+    store = SimpleKVDiskStore(str(tmp_path))
+    try:
+        for i in range(100):
+            assert store.get(MatchDto, {"platform": "NA1", "id": i})["gameDuration"] == 1000 + i
+    finally:
+        store.close()